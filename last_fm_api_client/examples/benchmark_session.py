@@ -0,0 +1,71 @@
+"""benchmark_session.py
+Benchmarks the overhead per API call when opening a new connection for every request
+(like the client did before v0.3.0) compared to reusing the connections of the client's session.
+Runs against a local stub server, so no API key is needed. Note that the stub server does not use HTTPS,
+so the difference against the real Last.FM API (where every new connection also needs a TLS handshake) is bigger."""
+from last_fm_api_client.last_fm_api_client.client import Client
+from last_fm_api_client.last_fm_api_client.models import GetAlbumDetailsResponse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+import json, logging, time
+import requests
+
+# Constants for testing: set if needed
+REQUEST_COUNT = 500
+STUB_RESPONSE = json.dumps(
+    {
+        "album": {
+            "artist": "Mitski",
+            "name": "Bug Like an Angel",
+            "listeners": 1,
+            "playcount": 1,
+            "tags": "",
+        }
+    }
+).encode("UTF-8")
+# Initialize logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+logging.getLogger("last_fm_api_client").setLevel(logging.INFO)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Responds to every request with the same album."""
+
+    protocol_version = "HTTP/1.1"  # (allows keep-alive)
+    disable_nagle_algorithm = True  # (the headers and the body are sent separately)
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(STUB_RESPONSE)))
+        self.end_headers()
+        self.wfile.write(STUB_RESPONSE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+Thread(target=server.serve_forever, daemon=True).start()
+client = Client("api_key", "benchmark", base_url=f"http://127.0.0.1:{server.server_port}")
+
+
+def new_connection_per_request():
+    request_kwargs = client.generate_request_kwargs("album.getInfo", {"artist": "Mitski", "album": "Bug Like an Angel"})
+    GetAlbumDetailsResponse.parse_obj(requests.request(**request_kwargs).json())
+
+
+def reused_connection():
+    client.get_album("Mitski", "Bug Like an Angel")
+
+
+for name, function in [("New connection per request", new_connection_per_request), ("Reused connection", reused_connection)]:
+    function()  # (warm up)
+    start_time = time.perf_counter()
+    for i in range(REQUEST_COUNT):
+        function()
+    seconds_per_call = (time.perf_counter() - start_time) / REQUEST_COUNT
+    logger.info(f"{name}: {seconds_per_call * 1000:.3f} ms per call.")
+client.close()
+server.shutdown()
@@ -0,0 +1,204 @@
+"""async_client.py
+An asyncio version of the client, which makes it possible to send many requests concurrently.
+Requires aiohttp to be installed."""
+import asyncio
+from typing import Set, Tuple, Union
+from .client import *
+from .rate_limiter import TokenBucket
+
+import aiohttp
+
+
+class AsyncClient(BaseClient):
+    def __init__(self, api_key: str, user_agent: str, base_url: Optional[str] = None,
+                 pool_size: Optional[int] = None, timeout: Optional[Union[float, Tuple[float, float]]] = None,
+                 max_retries: Optional[int] = None, backoff_factor: Optional[float] = None,
+                 rate_limiter: Optional[TokenBucket] = None, cache: Optional[ResponseCache] = None):
+        """initializes an asyncio API client. Requests are rate limited to stay within the limits of
+        the Last.FM API, so any number of requests can be sent at the same time (for example using asyncio.gather).
+        Use the client as an async context manager or call close() when you are done with it.
+        See BaseClient for the parameters that are not listed here.
+
+        :param pool_size: Optional. The maximum number of connections to keep open. Default is 10.
+
+        :param rate_limiter: Optional. A rate limiter that requests have to wait for. Default is a new TokenBucket
+        (see rate_limiter.py) with the limits of the Last.FM API. Share the same rate limiter between all clients that
+        use the same API key."""
+        if rate_limiter is None:
+            rate_limiter = TokenBucket()
+        super().__init__(api_key, user_agent, base_url, timeout, max_retries, backoff_factor, rate_limiter, cache)
+        # Tasks that refresh stale cached responses
+        self.revalidation_tasks: Set[asyncio.Task] = set()
+        self.pool_size = pool_size if pool_size is not None else DEFAULT_POOL_SIZE
+        # (aiohttp sessions have to be created inside the event loop, so this is created when the first request is sent)
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """Returns the session that is used to send requests, which reuses connections."""
+        if self.session is None:
+            if isinstance(self.timeout, tuple):
+                connect_timeout, read_timeout = self.timeout
+            else:
+                connect_timeout = read_timeout = self.timeout
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout),
+            )
+        return self.session
+
+    async def close(self) -> None:
+        """Closes all connections of the client."""
+        if len(self.revalidation_tasks) > 0:  # Wait for stale cached responses to be refreshed
+            await asyncio.gather(*self.revalidation_tasks, return_exceptions=True)
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def send_request(
+        self,
+        api_method: str,
+        request_parameters: Optional[Dict] = None,
+        request_method: Optional[str] = None,
+    ) -> Union[
+        GetAlbumDetailsResponse,
+        GetArtistResponse,
+        GetTagInfoResponse,
+        GetRecentTracksResponse,
+    ]:
+        """Sends a Last.FM request and handles the response. See Client.send_request."""
+        cache_key = self.get_cache_key(api_method, request_parameters, request_method)
+        if cache_key is not None:
+            cached_response = self.cache.get(cache_key)
+            if cached_response is not None:
+                self.logger.debug(f"Using a cached response for the request to {api_method}.")
+                if not self.cache.is_fresh(cache_key, cached_response) and self.start_revalidation(cache_key):
+                    self.logger.debug(f"Refreshing the stale cached response to {api_method}...")
+                    task = asyncio.create_task(self.revalidate(cache_key, api_method, dict(request_parameters or {}),
+                                                               request_method))
+                    self.revalidation_tasks.add(task)
+                    task.add_done_callback(self.revalidation_tasks.discard)
+                return self.handle_response(api_method, cached_response.status_code, cached_response.response_json)
+        return await self.send_uncached_request(api_method, request_parameters, request_method, cache_key)
+
+    async def revalidate(self, cache_key: str, api_method: str, request_parameters: Optional[Dict] = None,
+                         request_method: Optional[str] = None) -> None:
+        """Refreshes a stale cached response. See Client.revalidate."""
+        try:
+            await self.send_uncached_request(api_method, request_parameters, request_method, cache_key)
+        except LastFMDataNotFound:
+            pass  # (the response is cached as not found)
+        except Exception as e:
+            self.logger.warning(f"Failed to refresh a stale cached response to {api_method}: {e}", exc_info=True)
+        finally:
+            self.finish_revalidation(cache_key)
+
+    async def send_uncached_request(
+        self,
+        api_method: str,
+        request_parameters: Optional[Dict] = None,
+        request_method: Optional[str] = None,
+        cache_key: Optional[str] = None,
+    ) -> Union[
+        GetAlbumDetailsResponse,
+        GetArtistResponse,
+        GetTagInfoResponse,
+        GetRecentTracksResponse,
+    ]:
+        """Sends a Last.FM request without checking the cache. Connection errors, server errors (5xx) and
+        temporary Last.FM errors (such as rate limiting) are retried.
+
+        :param api_method The Last.FM method to access, for example user.getRecentTracks.
+
+        :param request_parameters: The parameters to include in the request (URL parameters). (This function adds format, method (api_method)
+        and API key methods automagically)
+
+        :param request_method: Optional argument to send any other request than a GET request. At least most endpoints in the API use GET
+        request methods.
+
+        :param cache_key: The cache key of the request (see BaseClient.get_cache_key). None to not cache the response.
+        """
+        self.logger.debug(f"Sending a Last.FM request to {api_method}...")
+        # Prepare request
+        request_kwargs = self.generate_request_kwargs(
+            api_method, request_parameters, request_method
+        )
+        # (aiohttp only accepts strings and numbers as URL parameters)
+        request_kwargs["params"] = {key: str(value) for key, value in request_kwargs["params"].items()}
+        retry_number = 0
+        while True:
+            await self.rate_limiter.acquire_async()
+            self.logger.debug("Sending a request...")
+            try:
+                async with self.get_session().request(request_kwargs["method"], request_kwargs["url"],
+                                                      params=request_kwargs["params"],
+                                                      headers=request_kwargs["headers"]) as response:
+                    status_code = response.status
+                    try:
+                        response_json = await response.json(content_type=None)
+                    except ValueError:  # (the response is not JSON)
+                        response_json = None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if retry_number < self.max_retries:
+                    retry_number += 1
+                    backoff = self.get_backoff(retry_number)
+                    self.logger.warning(f"Failed to send a request to the Last.FM API: {e}. Retrying in {backoff} second(s) (retry {retry_number}/{self.max_retries})...")
+                    await asyncio.sleep(backoff)
+                    continue
+                error_message = f"Failed to send a request to the Last.FM API: {e}"
+                self.logger.critical(error_message, exc_info=True)
+                raise LastFMClientError(error_message)
+            if self.should_retry(status_code, response_json, retry_number):
+                retry_number += 1
+                backoff = self.get_backoff(retry_number)
+                self.logger.warning(f"Last.FM responded with status code {status_code} (error code {self.get_error_code(response_json)}). Retrying in {backoff} second(s) (retry {retry_number}/{self.max_retries})...")
+                await asyncio.sleep(backoff)
+                continue
+            return self.handle_and_cache_response(api_method, status_code, response_json, cache_key)
+
+    async def get_album(
+        self, artist: str, album: str, autocorrect: Optional[bool] = None
+    ) -> GetAlbumDetailsResponse:
+        """Retrieves information for an album. See Client.get_album."""
+        return await self.send_request("album.getInfo", self.generate_album_request_parameters(artist, album, autocorrect))
+
+    async def get_artist(
+        self,
+        artist: str,
+        autocorrect: Optional[bool] = None,
+        language: Optional[str] = None,
+    ) -> GetArtistResponse:
+        """Retrieves information for an artist. See Client.get_artist."""
+        return await self.send_request("artist.getInfo", self.generate_artist_request_parameters(artist, autocorrect, language))
+
+    async def get_tag(self, tag_name: str) -> GetTagInfoResponse:
+        """Retrieves information about a tag. See Client.get_tag."""
+        return self.check_tag_response(await self.send_request("tag.getInfo", {"tag": tag_name}))
+
+    async def get_scrobbles(
+        self,
+        user,
+        from_time: Optional[datetime.datetime] = None,
+        to_time: Optional[datetime.datetime] = None,
+        limit: Optional[int] = None,
+    ) -> GetRecentTracksResponse:
+        """Gets scrobbles for a certain user. The first page is retrieved first, which tells how many pages
+        there are, and then all other pages are retrieved at the same time. See Client.get_scrobbles."""
+        # Fill out limit if not set
+        if limit is None:
+            limit = 200
+        first_page = await self.send_request("user.getRecentTracks",
+                                             self.generate_scrobble_request_parameters(user, 1, limit, from_time, to_time))
+        total_page_number = get_scrobble_total_page_number(first_page)
+        self.logger.debug(f"Getting {total_page_number} page(s) of scrobbles...")
+        other_pages = await asyncio.gather(*[
+            self.send_request("user.getRecentTracks",
+                              self.generate_scrobble_request_parameters(user, page_number, limit, from_time, to_time))
+            for page_number in range(2, total_page_number + 1)
+        ])
+        return combine_scrobble_pages([first_page, *other_pages])
@@ -0,0 +1,207 @@
+"""cache.py
+A cache for Last.FM responses that rarely change, such as album, artist and tag information.
+Responses are stored in a cache store: in memory (MemoryCacheStore), in an SQLite database (SQLiteCacheStore)
+that can be shared by several processes, or in any other store that implements BaseCacheStore."""
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+
+# How long responses are fresh for (in seconds) per API method. Methods that are not listed are never cached.
+DEFAULT_TTLS = {
+    "album.getInfo": 7 * 24 * 60 * 60,
+    "artist.getInfo": 7 * 24 * 60 * 60,
+    "tag.getInfo": 30 * 24 * 60 * 60,
+}
+# How long "not found" responses are fresh for, so that data that is added to Last.FM is found eventually
+DEFAULT_NOT_FOUND_TTL = 24 * 60 * 60
+# How long after a response stops being fresh it may still be returned while it is being refreshed
+DEFAULT_STALE_TTL = 30 * 24 * 60 * 60
+# Request parameters that do not affect the response, and that should therefore not be a part of cache keys
+IGNORED_PARAMETERS = ["api_key", "format"]
+
+
+class CachedResponse(NamedTuple):
+    """A cached Last.FM response."""
+
+    status_code: int
+    response_json: Optional[Dict]
+    cached_at: float  # A UNIX timestamp
+    not_found: bool  # True if the response says that the requested data does not exist
+
+
+class BaseCacheStore:
+    """Stores cached responses by their cache keys. Stores have to be thread-safe."""
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Gets a cached response.
+
+        :param key: The cache key of the response.
+
+        :returns The cached response, or None if there is no cached response for the key."""
+        raise NotImplementedError
+
+    def set(self, key: str, cached_response: CachedResponse) -> None:
+        """Stores a cached response, replacing any previous response with the same key.
+
+        :param key: The cache key of the response.
+
+        :param cached_response: The response to store."""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Removes all cached responses."""
+        raise NotImplementedError
+
+
+class MemoryCacheStore(BaseCacheStore):
+    """Stores cached responses in memory. The cache is lost when the process exits and is not shared with other processes."""
+
+    def __init__(self):
+        self.responses: Dict[str, CachedResponse] = {}
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self.lock:
+            return self.responses.get(key)
+
+    def set(self, key: str, cached_response: CachedResponse) -> None:
+        with self.lock:
+            self.responses[key] = cached_response
+
+    def clear(self) -> None:
+        with self.lock:
+            self.responses.clear()
+
+
+class SQLiteCacheStore(BaseCacheStore):
+    def __init__(self, path: str):
+        """Stores cached responses in an SQLite database file. The same file can be used by several processes
+        at the same time, so that they share the cache.
+
+        :param path: The path to the database file. It is created if it does not exist."""
+        self.path = path
+        # (SQLite connections can only be used by the thread that created them)
+        self.local = threading.local()
+        with self.get_connection() as connection:
+            connection.execute("""CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                status_code INTEGER NOT NULL,
+                response_json TEXT,
+                cached_at REAL NOT NULL,
+                not_found INTEGER NOT NULL
+            )""")
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Returns the database connection of the current thread."""
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            # (lets processes read the cache while another process is writing to it)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self.local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        row = self.get_connection().execute(
+            "SELECT status_code, response_json, cached_at, not_found FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        status_code, response_json, cached_at, not_found = row
+        return CachedResponse(status_code, json.loads(response_json) if response_json is not None else None,
+                              cached_at, bool(not_found))
+
+    def set(self, key: str, cached_response: CachedResponse) -> None:
+        with self.get_connection() as connection:  # (commits the change)
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, status_code, response_json, cached_at, not_found) VALUES (?, ?, ?, ?, ?)",
+                (key, cached_response.status_code,
+                 json.dumps(cached_response.response_json) if cached_response.response_json is not None else None,
+                 cached_response.cached_at, int(cached_response.not_found))
+            )
+
+    def clear(self) -> None:
+        with self.get_connection() as connection:
+            connection.execute("DELETE FROM responses")
+
+
+class ResponseCache:
+    def __init__(self, store: Optional[BaseCacheStore] = None, ttls: Optional[Dict[str, float]] = None,
+                 not_found_ttl: Optional[float] = None, stale_ttl: Optional[float] = None):
+        """Initializes a response cache, which can be passed to clients (Client or AsyncClient) to cache
+        their responses. Responses that are fresh are returned without sending a request. Responses that are stale
+        are returned too, but are refreshed in the background (stale-while-revalidate). Responses that
+        say that the requested data does not exist (which raise LastFMDataNotFound) are cached as well.
+        Share the same cache between all clients.
+
+        :param store: Optional. Where to store cached responses. Default is a new MemoryCacheStore. Use an SQLiteCacheStore
+        to keep the cache when the process exits or to share it between processes.
+
+        :param ttls: Optional. How long responses are fresh for, in seconds, per API method. Responses to methods that
+        are not included are not cached. Default is DEFAULT_TTLS (album.getInfo, artist.getInfo and tag.getInfo).
+
+        :param not_found_ttl: Optional. How long "not found" responses are fresh for, in seconds. Default is 1 day.
+
+        :param stale_ttl: Optional. How long responses may be returned for after they stop being fresh while they are
+        refreshed, in seconds. Default is 30 days."""
+        self.store = store if store is not None else MemoryCacheStore()
+        self.ttls = ttls if ttls is not None else DEFAULT_TTLS
+        self.not_found_ttl = not_found_ttl if not_found_ttl is not None else DEFAULT_NOT_FOUND_TTL
+        self.stale_ttl = stale_ttl if stale_ttl is not None else DEFAULT_STALE_TTL
+
+    def get_key(self, api_method: str, request_parameters: Optional[Dict] = None) -> Optional[str]:
+        """Gets the cache key of a request.
+
+        :param api_method: The Last.FM method that is requested, for example album.getInfo.
+
+        :param request_parameters: The parameters of the request.
+
+        :returns The cache key, or None if responses to the method should not be cached."""
+        if api_method not in self.ttls:
+            return None
+        if request_parameters is None:
+            request_parameters = {}
+        key_parameters = {
+            parameter: str(value) for parameter, value in request_parameters.items()
+            if parameter not in IGNORED_PARAMETERS
+        }
+        return f"{api_method}:{json.dumps(key_parameters, sort_keys=True)}"
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Gets a cached response that is fresh or stale.
+
+        :param key: The cache key, see get_key.
+
+        :returns The cached response, or None if there is no cached response or if it is too old to be used."""
+        cached_response = self.store.get(key)
+        if cached_response is None or self.get_age(cached_response) > self.get_ttl(key, cached_response) + self.stale_ttl:
+            return None
+        return cached_response
+
+    def set(self, key: str, status_code: int, response_json: Optional[Dict], not_found: bool) -> None:
+        """Caches a response.
+
+        :param key: The cache key, see get_key.
+
+        :param status_code: The status code of the response.
+
+        :param response_json: The JSON of the response.
+
+        :param not_found: True if the response says that the requested data does not exist."""
+        self.store.set(key, CachedResponse(status_code, response_json, time.time(), not_found))
+
+    def get_ttl(self, key: str, cached_response: CachedResponse) -> float:
+        """Returns how long a cached response is fresh for, in seconds."""
+        if cached_response.not_found:
+            return self.not_found_ttl
+        return self.ttls.get(key.split(":", 1)[0], 0)
+
+    def get_age(self, cached_response: CachedResponse) -> float:
+        """Returns how old a cached response is, in seconds."""
+        return time.time() - cached_response.cached_at
+
+    def is_fresh(self, key: str, cached_response: CachedResponse) -> bool:
+        """Checks if a cached response is fresh. Cached responses that are not fresh should be refreshed."""
+        return self.get_age(cached_response) <= self.get_ttl(key, cached_response)
@@ -1,8 +1,33 @@
 import logging
-from typing import Callable, Union
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Tuple, Union
 from .models import *
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from .rate_limiter import TokenBucket
+from .cache import ResponseCache
+
+# Default settings for the connection pool, timeouts (connect timeout, read timeout) and retries
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = (5, 30)
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+# How many pages to request at the same time when retrieving paginated data
+DEFAULT_PAGE_WORKERS = 4
+# How many stale cached responses to refresh at the same time (see cache.py)
+DEFAULT_REVALIDATION_WORKERS = 2
+# Status codes to retry requests on
+RETRY_STATUS_CODES = [500, 502, 503, 504]
+# Last.FM error codes (see https://www.last.fm/api/errorcodes) that are temporary and that requests should be retried on:
+# 8: Operation failed, 11: Service offline, 16: Temporarily unavailable, 29: Rate limit exceeded
+RETRY_ERROR_CODES = [8, 11, 16, 29]
+# Last.FM error codes that mean that the requested data does not exist. 6: Invalid parameters
+# (returned when an album, artist etc. can not be found)
+NOT_FOUND_ERROR_CODES = [6]
 
 logging.basicConfig(level=logging.DEBUG)
 # Define a custom exception class for API-related errors
@@ -15,14 +40,55 @@ class LastFMDataNotFound(Exception):
     pass
 
 
-class Client:
-    def __init__(self, api_key: str, user_agent: str, base_url: Optional[str] = None):
+def get_scrobble_total_page_number(response: GetRecentTracksResponse) -> int:
+    """Gets the total page number of scrobbles."""
+    return response.recenttracks.attr.total_pages
+
+
+def combine_scrobble_pages(pages: Iterable[GetRecentTracksResponse]) -> GetRecentTracksResponse:
+    """'Adds together' pages of scrobbles into one response. The scrobbles are sorted by when they were
+    scrobbled, newest first (like Last.FM returns them), in case new scrobbles moved scrobbles between pages.
+
+    :param pages: The pages to add together, starting with the first page."""
+    combined_response = None
+    for page in pages:
+        if combined_response is None:
+            combined_response = page  # Use the first page as the base
+        else:
+            combined_response.recenttracks.track.extend(page.recenttracks.track)
+            combined_response.recenttracks.attr = page.recenttracks.attr  # Update the attribute
+    combined_response.recenttracks.track.sort(key=lambda track: track.date.timestamp, reverse=True)
+    return combined_response
+
+
+class BaseClient:
+    """Functionality that is shared by the client (Client) and the asyncio client (AsyncClient, see async_client.py):
+    generating requests and handling responses."""
+
+    def __init__(self, api_key: str, user_agent: str, base_url: Optional[str] = None,
+                 timeout: Optional[Union[float, Tuple[float, float]]] = None, max_retries: Optional[int] = None,
+                 backoff_factor: Optional[float] = None, rate_limiter: Optional[TokenBucket] = None,
+                 cache: Optional[ResponseCache] = None):
         """initializes an API client.
 
         :param api_key The Last.FM API key to use.
 
         :param user_agent An identificable user agent. Wanted by the Last.FM API:
-        "Please use an identifiable User-Agent header on all requests. This helps our logging and reduces the risk of you getting banned."."""
+        "Please use an identifiable User-Agent header on all requests. This helps our logging and reduces the risk of you getting banned.".
+
+        :param timeout: Optional. The timeout of requests in seconds, or a tuple of (connect timeout, read timeout).
+        Default is (5, 30).
+
+        :param max_retries: Optional. How many times to retry requests that fail because of connection errors, server
+        errors (5xx) or temporary Last.FM errors (like rate limiting). Default is 3.
+
+        :param backoff_factor: Optional. Retries wait for backoff_factor * 2^(retry number - 1) seconds. Default is 0.5.
+
+        :param rate_limiter: Optional. A rate limiter (see rate_limiter.py) that requests have to wait for. Share the same
+        rate limiter between all clients that use the same API key. By default, requests are not rate limited.
+
+        :param cache: Optional. A response cache (see cache.py) for responses that rarely change, such as album
+        information. Share the same cache between all clients. By default, responses are not cached."""
         self.api_key = api_key
         self.user_agent = user_agent
         self.logger = logging.getLogger(__name__)
@@ -31,6 +97,14 @@ class Client:
         else:
             base_url = base_url.strip("/")
         self.base_url = base_url
+        self.timeout = timeout if timeout is not None else DEFAULT_TIMEOUT
+        self.max_retries = max_retries if max_retries is not None else DEFAULT_MAX_RETRIES
+        self.backoff_factor = backoff_factor if backoff_factor is not None else DEFAULT_BACKOFF_FACTOR
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        # The cache keys of stale cached responses that are being refreshed
+        self.revalidating_keys = set()
+        self.revalidating_keys_lock = threading.Lock()
 
     def generate_request_kwargs(
         self,
@@ -68,6 +142,203 @@ class Client:
         )
         return request_kwargs
 
+    def get_error_code(self, response_json: Optional[Dict]) -> Optional[int]:
+        """Gets the Last.FM error code of a response, if any. Last.FM returns errors like
+        {"error": 6, "message": "Album not found"}.
+
+        :param response_json: The JSON of the response to check. None if the response is not JSON."""
+        if isinstance(response_json, dict) and isinstance(response_json.get("error"), int):
+            return response_json["error"]
+        return None
+
+    def should_retry(self, status_code: int, response_json: Optional[Dict], retry_number: int) -> bool:
+        """Checks if a request should be retried because of a temporary error, such as rate limiting.
+
+        :param status_code: The status code of the response.
+
+        :param response_json: The JSON of the response. None if the response is not JSON.
+
+        :param retry_number: How many times the request has been retried."""
+        return retry_number < self.max_retries and (status_code in RETRY_STATUS_CODES or
+                                                   self.get_error_code(response_json) in RETRY_ERROR_CODES)
+
+    def get_backoff(self, retry_number: int) -> float:
+        """Returns how many seconds to wait before retrying a request.
+
+        :param retry_number: The number of the retry, starting at 1."""
+        return self.backoff_factor * 2 ** (retry_number - 1)
+
+    def handle_response(
+        self, api_method: str, status_code: int, response_json: Optional[Dict]
+    ) -> Union[
+        GetAlbumDetailsResponse,
+        GetArtistResponse,
+        GetTagInfoResponse,
+        GetRecentTracksResponse,
+    ]:
+        """Parses a Last.FM response, or raises an exception if the request failed.
+
+        :param api_method The Last.FM method that was accessed, for example user.getRecentTracks.
+
+        :param status_code: The status code of the response.
+
+        :param response_json: The JSON of the response. None if the response is not JSON."""
+        error_code = self.get_error_code(response_json)
+        if status_code == 200 and error_code is None:
+            try:
+                self.logger.debug(f"Last.FM responsed with JSON: {response_json}")
+                return METHOD_TO_MODEL[api_method].parse_obj(
+                    response_json
+                )  # Return the response
+            except Exception as e:
+                error_message = (
+                    f"Failed to decode response JSON. Original exception: {e}"
+                )
+                self.logger.critical(error_message, exc_info=True)
+                raise LastFMClientError(error_message)
+        elif status_code == 404 or error_code in NOT_FOUND_ERROR_CODES:
+            raise LastFMDataNotFound("The Last.FM server responded with 404.")
+        else:
+            error_message = f"Unexpected status code returned from the Last.FM API: {status_code} (error code: {error_code}). Please look into changing request parameters etc."
+            self.logger.critical(error_message)
+            raise LastFMClientError(error_message)
+
+    def get_cache_key(self, api_method: str, request_parameters: Optional[Dict] = None,
+                      request_method: Optional[str] = None) -> Optional[str]:
+        """Gets the cache key of a request. See send_request for the parameters.
+
+        :returns The cache key, or None if the response to the request should not be cached."""
+        if self.cache is None or request_method not in [None, "GET"]:
+            return None
+        return self.cache.get_key(api_method, request_parameters)
+
+    def start_revalidation(self, cache_key: str) -> bool:
+        """Marks a stale cached response as being refreshed.
+
+        :param cache_key: The cache key of the response.
+
+        :returns False if the response is already being refreshed, True otherwise."""
+        with self.revalidating_keys_lock:
+            if cache_key in self.revalidating_keys:
+                return False
+            self.revalidating_keys.add(cache_key)
+            return True
+
+    def finish_revalidation(self, cache_key: str) -> None:
+        """Marks a stale cached response as refreshed. See start_revalidation."""
+        with self.revalidating_keys_lock:
+            self.revalidating_keys.discard(cache_key)
+
+    def handle_and_cache_response(
+        self, api_method: str, status_code: int, response_json: Optional[Dict], cache_key: Optional[str] = None
+    ) -> Union[
+        GetAlbumDetailsResponse,
+        GetArtistResponse,
+        GetTagInfoResponse,
+        GetRecentTracksResponse,
+    ]:
+        """Parses a Last.FM response like handle_response does, and caches it if it was successful
+        or if it says that the requested data does not exist.
+
+        :param cache_key: The cache key of the request (see get_cache_key). None to not cache the response."""
+        try:
+            response = self.handle_response(api_method, status_code, response_json)
+        except LastFMDataNotFound:
+            if cache_key is not None:
+                self.cache.set(cache_key, status_code, response_json, not_found=True)
+            raise
+        if cache_key is not None:
+            self.cache.set(cache_key, status_code, response_json, not_found=False)
+        return response
+
+    def generate_album_request_parameters(self, artist: str, album: str, autocorrect: Optional[bool] = None) -> Dict:
+        """Generates the request parameters for album.getInfo. See get_album for the parameters."""
+        request_parameters = {
+            "artist": artist,
+            "album": album,
+        }
+        if autocorrect is None:
+            autocorrect = True
+        # Translate True or False into 1 or 0.
+        request_parameters["autocorrect"]: str = "1" if autocorrect else "0"
+        return request_parameters
+
+    def generate_artist_request_parameters(self, artist: str, autocorrect: Optional[bool] = None,
+                                           language: Optional[str] = None) -> Dict:
+        """Generates the request parameters for artist.getInfo. See get_artist for the parameters."""
+        request_parameters = {
+            "artist": artist,
+        }
+        if autocorrect is None:
+            autocorrect = True
+        # Translate True or False into 1 or 0.
+        request_parameters["autocorrect"]: str = "1" if autocorrect else "0"
+        # Add language if set
+        if language is not None:
+            request_parameters["language"] = language
+        return request_parameters
+
+    def check_tag_response(self, response: GetTagInfoResponse) -> GetTagInfoResponse:
+        """Checks that a tag.getInfo response is not for an empty tag, which is how Last.FM responds to tags that do not exist."""
+        # Detect empty tags
+        if response.tag.total == 0 and response.tag.reach == 0:
+            raise LastFMDataNotFound("The tag you requested was not found.")
+        return response
+
+    def generate_scrobble_request_parameters(self, user: str, page_number: int, limit: int,
+                                             from_time: Optional[datetime.datetime] = None,
+                                             to_time: Optional[datetime.datetime] = None) -> Dict:
+        """Generates the request parameters for a page of user.getRecentTracks. See get_scrobbles for the parameters.
+
+        :param page_number: The page number"""
+        request_parameters = {"user": user, "limit": limit, "page": page_number}
+        # The from time and to time should be unix timestamps. Perform the conversion
+        if from_time is not None:
+            request_parameters["from"]: int = round(from_time.timestamp())
+        if to_time is not None:
+            request_parameters["to"]: int = round(to_time.timestamp())
+        return request_parameters
+
+
+class Client(BaseClient):
+    def __init__(self, api_key: str, user_agent: str, base_url: Optional[str] = None,
+                 pool_size: Optional[int] = None, timeout: Optional[Union[float, Tuple[float, float]]] = None,
+                 max_retries: Optional[int] = None, backoff_factor: Optional[float] = None,
+                 rate_limiter: Optional[TokenBucket] = None, cache: Optional[ResponseCache] = None):
+        """initializes an API client. The client keeps its connections to Last.FM open between requests,
+        so create one client and reuse it rather than creating one per request.
+        See BaseClient for the parameters that are not listed here.
+
+        :param pool_size: Optional. The maximum number of connections to keep open, which should be at least the number
+        of threads that use the client. Default is 10."""
+        super().__init__(api_key, user_agent, base_url, timeout, max_retries, backoff_factor, rate_limiter, cache)
+        # Stale cached responses are refreshed in threads (which are only started when they are needed)
+        self.revalidation_executor = ThreadPoolExecutor(max_workers=DEFAULT_REVALIDATION_WORKERS)
+        # Create a session that reuses connections. Connection errors and server errors are retried by urllib3.
+        retry = Retry(
+            total=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=None,  # (retry all request methods, since Last.FM requests are not destructive)
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size if pool_size is not None else DEFAULT_POOL_SIZE,
+                              max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def close(self) -> None:
+        """Closes all connections of the client."""
+        self.revalidation_executor.shutdown()  # (waits for stale cached responses to be refreshed)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
     def send_request(
         self,
         api_method: str,
@@ -79,7 +350,8 @@ class Client:
         GetTagInfoResponse,
         GetRecentTracksResponse,
     ]:
-        """Sends a Last.FM request and handles the response.
+        """Sends a Last.FM request and handles the response. If the client has a cache, a cached response
+        is returned if there is one, and stale cached responses are refreshed in the background.
 
         :param api_method The Last.FM method to access, for example user.getRecentTracks.
 
@@ -89,32 +361,75 @@ class Client:
         :param request_method: Optional argument to send any other request than a GET request. At least most endpoints in the API use GET
         request methods.
         """
+        cache_key = self.get_cache_key(api_method, request_parameters, request_method)
+        if cache_key is not None:
+            cached_response = self.cache.get(cache_key)
+            if cached_response is not None:
+                self.logger.debug(f"Using a cached response for the request to {api_method}.")
+                if not self.cache.is_fresh(cache_key, cached_response) and self.start_revalidation(cache_key):
+                    self.logger.debug(f"Refreshing the stale cached response to {api_method}...")
+                    self.revalidation_executor.submit(self.revalidate, cache_key, api_method,
+                                                      dict(request_parameters or {}), request_method)
+                return self.handle_response(api_method, cached_response.status_code, cached_response.response_json)
+        return self.send_uncached_request(api_method, request_parameters, request_method, cache_key)
+
+    def revalidate(self, cache_key: str, api_method: str, request_parameters: Optional[Dict] = None,
+                   request_method: Optional[str] = None) -> None:
+        """Refreshes a stale cached response. See send_request for the parameters.
+
+        :param cache_key: The cache key of the response."""
+        try:
+            self.send_uncached_request(api_method, request_parameters, request_method, cache_key)
+        except LastFMDataNotFound:
+            pass  # (the response is cached as not found)
+        except Exception as e:
+            self.logger.warning(f"Failed to refresh a stale cached response to {api_method}: {e}", exc_info=True)
+        finally:
+            self.finish_revalidation(cache_key)
+
+    def send_uncached_request(
+        self,
+        api_method: str,
+        request_parameters: Optional[Dict] = None,
+        request_method: Optional[str] = None,
+        cache_key: Optional[str] = None,
+    ) -> Union[
+        GetAlbumDetailsResponse,
+        GetArtistResponse,
+        GetTagInfoResponse,
+        GetRecentTracksResponse,
+    ]:
+        """Sends a Last.FM request without checking the cache. See send_request for the parameters.
+
+        :param cache_key: The cache key of the request (see get_cache_key). None to not cache the response."""
         self.logger.debug(f"Sending a Last.FM request to {api_method}...")
         # Prepare request
         request_kwargs = self.generate_request_kwargs(
             api_method, request_parameters, request_method
         )
-        self.logger.debug("Sending a request...")
-        response = requests.request(**request_kwargs)
-        if response.status_code == 200:
+        retry_number = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            self.logger.debug("Sending a request...")
             try:
-                response_json = response.json()
-                self.logger.debug(f"Last.FM responsed with JSON: {response_json}")
-                return METHOD_TO_MODEL[api_method].parse_obj(
-                    response_json
-                )  # Return the response
-            except Exception as e:
-                error_message = (
-                    f"Failed to decode response JSON. Original exception: {e}"
-                )
+                response = self.session.request(**request_kwargs, timeout=self.timeout)
+            except requests.RequestException as e:
+                error_message = f"Failed to send a request to the Last.FM API: {e}"
                 self.logger.critical(error_message, exc_info=True)
                 raise LastFMClientError(error_message)
-        elif response.status_code == 404:
-            raise LastFMDataNotFound("The Last.FM server responded with 404.")
-        else:
-            error_message = f"Unexpected status code returned from the Last.FM API: {response.status_code}. Please look into changing request parameters etc."
-            self.logger.critical(error_message)
-            raise LastFMClientError(error_message)
+            try:
+                response_json = response.json()
+            except ValueError:  # (the response is not JSON)
+                response_json = None
+            # Retry temporary Last.FM errors (such as rate limiting). Server errors are retried by urllib3 (see __init__).
+            if self.get_error_code(response_json) in RETRY_ERROR_CODES and retry_number < self.max_retries:
+                retry_number += 1
+                backoff = self.get_backoff(retry_number)
+                self.logger.warning(f"Last.FM responded with error code {self.get_error_code(response_json)}. Retrying in {backoff} second(s) (retry {retry_number}/{self.max_retries})...")
+                time.sleep(backoff)
+                continue
+            return self.handle_and_cache_response(api_method, response.status_code, response_json, cache_key)
 
     def handle_pagination(
         self,
@@ -125,8 +440,9 @@ class Client:
         previous_content=None,
     ):
         """A pagination handler. Will request an API method and keep adding data if there is more to it.
+        Pages are requested one after another, see iterate_pages to request them at the same time.
 
-        :param page_number: The page number to retrieve.
+        :param page_number: The page number to start at.
 
         :param request_next: A function that will re-run the same request but with a new page number.
         This function receives a parameter: foo(new_page_number) and should return the response in the applicable model.
@@ -139,27 +455,52 @@ class Client:
         baz(<previous content>, <new_content>). NOTE: will receive None on the first call!
 
         :param previous_content: None on the first call, <data model with list inside> on subsequent calls"""
-        self.logger.debug(f"Getting page: {page_number}...")
-        response = request_next(page_number)
-        self.logger.debug(f"Content for page {page_number} retrieved.")
-        previous_content = expand_response(previous_content, response)
-        total_page_number = get_total_page_number(response)
-        if (
-            total_page_number == page_number or total_page_number == 0
-        ):  # Last.FM returns 0 if there is nothing.
-            self.logger.debug(
-                f"Done handling pagination: {page_number} is the last page."
-            )
-            return previous_content
-        else:
+        while True:
+            self.logger.debug(f"Getting page: {page_number}...")
+            response = request_next(page_number)
+            self.logger.debug(f"Content for page {page_number} retrieved.")
+            previous_content = expand_response(previous_content, response)
+            total_page_number = get_total_page_number(response)
+            if (
+                page_number >= total_page_number
+            ):  # (Last.FM returns 0 if there is nothing)
+                self.logger.debug(
+                    f"Done handling pagination: {page_number} is the last page."
+                )
+                return previous_content
             self.logger.debug("Getting the next page...")
-            self.handle_pagination(
-                page_number + 1,
-                request_next,
-                get_total_page_number,
-                expand_response,
-                previous_content,
-            )
+            page_number += 1
+
+    def iterate_pages(
+        self,
+        request_page: Callable,
+        get_total_page_number: Callable,
+        max_workers: Optional[int] = None,
+    ) -> Iterator:
+        """Iterates over all pages of a paginated API method. The first page tells how many pages there are,
+        and then the other pages are requested at the same time (still limited by the client's rate limiter, if any).
+        Pages are yielded in page order as soon as they are available.
+
+        :param request_page: A function that requests a page. It receives foo(page_number) and should return
+        the response in the applicable model.
+
+        :param get_total_page_number: A function to return the biggest page number based on a response. It receives
+        bar(response) and should return the biggest page number
+
+        :param max_workers: Optional. How many pages to request at the same time. Default is 4."""
+        self.logger.debug("Getting the first page...")
+        first_page = request_page(1)
+        yield first_page
+        total_page_number = get_total_page_number(first_page)
+        if total_page_number <= 1:  # (Last.FM returns 0 if there is nothing)
+            return
+        self.logger.debug(f"Getting {total_page_number - 1} more page(s)...")
+        executor = ThreadPoolExecutor(max_workers=max_workers if max_workers is not None else DEFAULT_PAGE_WORKERS)
+        try:
+            yield from executor.map(request_page, range(2, total_page_number + 1))
+        finally:
+            # (don't request the remaining pages if the iteration is stopped)
+            executor.shutdown(wait=False, cancel_futures=True)
 
     def get_album(
         self, artist: str, album: str, autocorrect: Optional[bool] = None
@@ -173,15 +514,7 @@ class Client:
         :param autocorrect From the Last.FM API docs:
         Transform misspelled artist names into correct artist names, returning the correct version instead.
         The corrected artist name will be returned in the response."""
-        request_parameters = {
-            "artist": artist,
-            "album": album,
-        }
-        if autocorrect is None:
-            autocorrect = True
-        # Translate True or False into 1 or 0.
-        request_parameters["autocorrect"]: str = "1" if autocorrect else "0"
-        return self.send_request("album.getInfo", request_parameters)
+        return self.send_request("album.getInfo", self.generate_album_request_parameters(artist, album, autocorrect))
 
     def get_artist(
         self,
@@ -199,44 +532,35 @@ class Client:
 
         :param language: Optional parameter to control biography language.
         """
-        request_parameters = {
-            "artist": artist,
-        }
-        if autocorrect is None:
-            autocorrect = True
-        # Translate True or False into 1 or 0.
-        request_parameters["autocorrect"]: str = "1" if autocorrect else "0"
-        # Add language if set
-        if language is not None:
-            request_parameters["language"] = language
-        return self.send_request("artist.getInfo", request_parameters)
+        return self.send_request("artist.getInfo", self.generate_artist_request_parameters(artist, autocorrect, language))
 
     def get_tag(self, tag_name: str) -> GetTagInfoResponse:
         """Retrieves information about a tag.
 
         :param tag_name: The tag name to retrieve."""
-        request_parameters = {"tag": tag_name}
-        response = self.send_request("tag.getInfo", request_parameters)
-        # Detect empty tags
-        if response.tag.total == 0 and response.tag.reach == 0:
-            raise LastFMDataNotFound("The tag you requested was not found.")
-        return response
+        return self.check_tag_response(self.send_request("tag.getInfo", {"tag": tag_name}))
 
-    def get_scrobbles(
+    def iterate_scrobble_pages(
         self,
         user,
         from_time: Optional[datetime.datetime] = None,
         to_time: Optional[datetime.datetime] = None,
         limit: Optional[int] = None,
-    ) -> GetRecentTracksResponse:
-        """Gets scrobbles for a certain user.
+        max_workers: Optional[int] = None,
+    ) -> Iterator[GetRecentTracksResponse]:
+        """Iterates over the pages of scrobbles for a certain user, newest scrobbles first.
+        See iterate_pages for how the pages are requested.
 
         :param user: The user to retrieve scrobbles for.
 
         :param from_time: A time interval (start time) to get scrobbles within
 
-        :param to_time A time interval (end time) to get scrobbles within"""
-        # Fill out limit and page if not set
+        :param to_time A time interval (end time) to get scrobbles within
+
+        :param limit: How many scrobbles to get per page. Default (and maximum) is 200.
+
+        :param max_workers: Optional. How many pages to request at the same time. Default is 4."""
+        # Fill out limit if not set
         if limit is None:
             limit = 200
 
@@ -244,39 +568,33 @@ class Client:
             """Retrieves the scrobbles on a certain page number.
 
             :param page_number: The page number"""
-            request_parameters = {"user": user, "limit": limit, "page": page_number}
-            # The from time and to time should be unix timestamps. Perform the conversion
-            if from_time is not None:
-                request_parameters["from"]: int = round(from_time.timestamp())
-            if to_time is not None:
-                request_parameters["to"]: int = round(to_time.timestamp())
-            return self.send_request("user.getRecentTracks", request_parameters)
-
-        def get_total_page_number(response: GetRecentTracksResponse) -> int:
-            """Gets the total page number of scrobbles."""
-            return response.recenttracks.attr.total_pages
-
-        def expand_response(
-            previous_content: Optional[GetRecentTracksResponse],
-            new_content: Optional[GetRecentTracksResponse],
-        ) -> GetRecentTracksResponse:
-            """'Adds together' two different responses: one that is has data from the previous page(s)
-            and one that is the current response
-
-            :param previous_content: The previous response that contains data from the previous pages.
-
-            :param new_content: A response that contains data from the current page to be added on to previous data."""
-            if previous_content is not None:
-                previous_content.recenttracks.track.extend(
-                    new_content.recenttracks.track
-                )
-                previous_content.recenttracks.attr = (
-                    new_content.recenttracks.attr
-                )  # Update the attribute
-                return previous_content  # Return the updated content
-            else:
-                return new_content  # Return the new content on first response
-
-        return self.handle_pagination(
-            1, get_scrobble_page, get_total_page_number, expand_response
-        )
+            return self.send_request("user.getRecentTracks",
+                                     self.generate_scrobble_request_parameters(user, page_number, limit, from_time, to_time))
+
+        return self.iterate_pages(get_scrobble_page, get_scrobble_total_page_number, max_workers)
+
+    def iterate_scrobbles(
+        self,
+        user,
+        from_time: Optional[datetime.datetime] = None,
+        to_time: Optional[datetime.datetime] = None,
+        limit: Optional[int] = None,
+        max_workers: Optional[int] = None,
+    ) -> Iterator[RecentTrack]:
+        """Iterates over the scrobbles for a certain user, newest scrobbles first. Scrobbles are yielded as soon
+        as the page that they are on has been retrieved, so this can be used for large amounts of scrobbles.
+        See iterate_scrobble_pages for the parameters."""
+        for page in self.iterate_scrobble_pages(user, from_time, to_time, limit, max_workers):
+            yield from page.recenttracks.track
+
+    def get_scrobbles(
+        self,
+        user,
+        from_time: Optional[datetime.datetime] = None,
+        to_time: Optional[datetime.datetime] = None,
+        limit: Optional[int] = None,
+        max_workers: Optional[int] = None,
+    ) -> GetRecentTracksResponse:
+        """Gets scrobbles for a certain user. All pages are added together into one response, newest scrobbles first.
+        See iterate_scrobble_pages for the parameters."""
+        return combine_scrobble_pages(self.iterate_scrobble_pages(user, from_time, to_time, limit, max_workers))
@@ -0,0 +1,48 @@
+"""rate_limiter.py
+A token bucket rate limiter that keeps requests to the Last.FM API within its limits.
+The same limiter can be shared by several clients, threads and asyncio tasks."""
+import asyncio
+import threading
+import time
+from typing import Optional
+
+# Last.FM allows up to 5 requests per second (averaged over 5 minutes) per IP address:
+# "Your account may be suspended if your application is continuously making several calls per second"
+DEFAULT_RATE = 5
+DEFAULT_CAPACITY = 5
+
+
+class TokenBucket:
+    def __init__(self, rate: Optional[float] = None, capacity: Optional[float] = None):
+        """Initializes a token bucket. Every request takes a token from the bucket, and the bucket is refilled
+        with rate tokens per second. When the bucket is empty, requests wait until there is a token for them.
+
+        :param rate: Optional. How many requests to allow per second on average. Default is 5.
+
+        :param capacity: Optional. How many requests to allow at once after a period without requests. Default is 5."""
+        self.rate = rate if rate is not None else DEFAULT_RATE
+        self.capacity = capacity if capacity is not None else DEFAULT_CAPACITY
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        # (only held while counting tokens, never while waiting, so it can be used from asyncio code too)
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Takes a token from the bucket.
+
+        :returns The number of seconds to wait before the token may be used."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            # Tokens are taken even if the bucket is empty, so that waiting requests are let through in order
+            self.tokens -= 1
+            return max(0, -self.tokens / self.rate)
+
+    def acquire(self) -> None:
+        """Waits until a request may be sent."""
+        time.sleep(self.reserve())
+
+    async def acquire_async(self) -> None:
+        """Waits until a request may be sent without blocking the event loop."""
+        await asyncio.sleep(self.reserve())
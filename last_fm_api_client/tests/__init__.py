@@ -0,0 +1,2 @@
+"""Tests for the Last.FM API client. Run them with python -m unittest discover tests (from the directory of this package).
+Requests are sent to stubs, so no API key or network access is needed."""
@@ -0,0 +1,104 @@
+"""test_cache.py
+Tests caching responses."""
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from last_fm_api_client.cache import CachedResponse, ResponseCache, SQLiteCacheStore
+from last_fm_api_client.client import Client, LastFMDataNotFound
+from .utils import StubResponse, generate_album_json
+
+TTL = 60
+
+
+class CacheTests(unittest.TestCase):
+    def setUp(self):
+        self.cache = ResponseCache(ttls={"album.getInfo": TTL}, not_found_ttl=TTL, stale_ttl=TTL)
+        self.client = Client("key", "user agent", cache=self.cache)
+        self.addCleanup(self.client.close)
+        self.cache_key = self.cache.get_key("album.getInfo",
+                                            self.client.generate_album_request_parameters("Pavement", "Wowee Zowee"))
+
+    def cache_response(self, response_json, age: float, status_code: int = 200, not_found: bool = False):
+        """Caches an album.getInfo response that is a certain number of seconds old."""
+        self.cache.store.set(self.cache_key, CachedResponse(status_code, response_json, time.time() - age, not_found))
+
+    def test_fresh_response(self):
+        with patch.object(self.client.session, "request", return_value=StubResponse(generate_album_json())) as request:
+            for _ in range(2):
+                self.assertEqual(self.client.get_album("Pavement", "Wowee Zowee").album.name, "Wowee Zowee")
+        self.assertEqual(request.call_count, 1)
+
+    def test_stale_response(self):
+        self.cache_response(generate_album_json("Stale"), age=TTL + 1)
+        refresh_started = threading.Event()
+        finish_refresh = threading.Event()
+
+        def refresh(**request_kwargs):
+            refresh_started.set()
+            finish_refresh.wait(5)
+            return StubResponse(generate_album_json("Refreshed"))
+
+        with patch.object(self.client.session, "request", side_effect=refresh) as request:
+            # The stale response is returned while it is refreshed in the background, which only happens once
+            for _ in range(3):
+                self.assertEqual(self.client.get_album("Pavement", "Wowee Zowee").album.name, "Stale")
+            self.assertTrue(refresh_started.wait(5))
+            finish_refresh.set()
+            self.client.revalidation_executor.shutdown()  # (waits for the refresh)
+        self.assertEqual(request.call_count, 1)
+        self.assertTrue(self.cache.is_fresh(self.cache_key, self.cache.get(self.cache_key)))
+        with patch.object(self.client.session, "request") as request:
+            self.assertEqual(self.client.get_album("Pavement", "Wowee Zowee").album.name, "Refreshed")
+        request.assert_not_called()
+
+    def test_expired_response(self):
+        self.cache_response(generate_album_json("Expired"), age=2 * TTL + 1)
+        with patch.object(self.client.session, "request", return_value=StubResponse(generate_album_json())) as request:
+            self.assertEqual(self.client.get_album("Pavement", "Wowee Zowee").album.name, "Wowee Zowee")
+        self.assertEqual(request.call_count, 1)
+
+    def test_not_found_response(self):
+        with patch.object(self.client.session, "request",
+                          return_value=StubResponse({"error": 6, "message": "Album not found"})) as request:
+            for _ in range(2):
+                with self.assertRaises(LastFMDataNotFound):
+                    self.client.get_album("Pavement", "Wowee Zowee")
+        self.assertEqual(request.call_count, 1)
+
+    def test_uncached_methods(self):
+        self.assertIsNone(self.cache.get_key("user.getRecentTracks", {"user": "user"}))
+        self.assertEqual(self.cache.get_key("album.getInfo", {"album": "Wowee Zowee", "api_key": "key"}),
+                         self.cache.get_key("album.getInfo", {"album": "Wowee Zowee", "api_key": "other key"}))
+
+
+class SQLiteCacheStoreTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "cache.db")
+
+    def test_shared_between_stores(self):
+        SQLiteCacheStore(self.path).set("key", CachedResponse(200, generate_album_json(), 1.5, False))
+        SQLiteCacheStore(self.path).set("not found", CachedResponse(404, None, 2.5, True))
+        store = SQLiteCacheStore(self.path)
+        self.assertEqual(store.get("key"), CachedResponse(200, generate_album_json(), 1.5, False))
+        self.assertEqual(store.get("not found"), CachedResponse(404, None, 2.5, True))
+        self.assertIsNone(store.get("missing"))
+        store.clear()
+        self.assertIsNone(store.get("key"))
+
+    def test_client(self):
+        cache = ResponseCache(SQLiteCacheStore(self.path))
+        with Client("key", "user agent", cache=cache) as client, \
+                patch.object(client.session, "request", return_value=StubResponse(generate_album_json())) as request:
+            for _ in range(2):
+                self.assertEqual(client.get_album("Pavement", "Wowee Zowee").album.name, "Wowee Zowee")
+        self.assertEqual(request.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
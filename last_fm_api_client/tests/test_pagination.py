@@ -0,0 +1,74 @@
+"""test_pagination.py
+Tests retrieving scrobbles that are on several pages."""
+import threading
+import time
+import unittest
+from typing import List
+from unittest.mock import patch
+
+from last_fm_api_client.client import Client
+from .utils import StubResponse, generate_scrobble_page_json
+
+# The timestamps of the scrobbles on each page. A scrobble on page 2 is newer than one on page 1,
+# like when a new scrobble moves scrobbles between pages while they are retrieved.
+PAGE_TIMESTAMPS = {
+    1: [1000, 900, 700],
+    2: [800, 600, 500],
+    3: [400, 300],
+}
+# How long to wait before responding with each page, so that the pages are retrieved out of order
+PAGE_DELAYS = {1: 0, 2: 0.2, 3: 0}
+
+
+class PaginationTests(unittest.TestCase):
+    def setUp(self):
+        self.client = Client("key", "user agent")
+        self.addCleanup(self.client.close)
+        self.requested_pages: List[int] = []
+        self.responded_pages: List[int] = []
+        self.lock = threading.Lock()
+
+    def request_page(self, **request_kwargs) -> StubResponse:
+        """Stands in for session.request and responds with a page of user.getRecentTracks."""
+        page_number = request_kwargs["params"]["page"]
+        with self.lock:
+            self.requested_pages.append(page_number)
+        time.sleep(PAGE_DELAYS[page_number])
+        with self.lock:
+            self.responded_pages.append(page_number)
+        return StubResponse(generate_scrobble_page_json(page_number, len(PAGE_TIMESTAMPS), PAGE_TIMESTAMPS[page_number]))
+
+    def get_timestamps(self, tracks) -> List[int]:
+        return [round(track.date.timestamp.timestamp()) for track in tracks]
+
+    def test_get_scrobbles(self):
+        with patch.object(self.client.session, "request", side_effect=self.request_page):
+            response = self.client.get_scrobbles("user", max_workers=2)
+        self.assertEqual(self.responded_pages, [1, 3, 2])  # (page 2 is delayed)
+        self.assertEqual(self.get_timestamps(response.recenttracks.track), [1000, 900, 800, 700, 600, 500, 400, 300])
+        self.assertEqual(response.recenttracks.attr.total_pages, 3)
+
+    def test_iterate_scrobbles(self):
+        with patch.object(self.client.session, "request", side_effect=self.request_page):
+            tracks = list(self.client.iterate_scrobbles("user", max_workers=2))
+        # Scrobbles are yielded in page order, even if the pages were retrieved out of order
+        self.assertEqual(self.get_timestamps(tracks), [1000, 900, 700, 800, 600, 500, 400, 300])
+
+    def test_single_page(self):
+        with patch.object(self.client.session, "request",
+                          return_value=StubResponse(generate_scrobble_page_json(1, 1, [1000, 900]))) as request:
+            response = self.client.get_scrobbles("user")
+        self.assertEqual(self.get_timestamps(response.recenttracks.track), [1000, 900])
+        self.assertEqual(request.call_count, 1)
+
+    def test_stop_iterating(self):
+        with patch.object(self.client.session, "request", side_effect=self.request_page):
+            scrobbles = self.client.iterate_scrobbles("user")
+            self.assertEqual(round(next(scrobbles).date.timestamp.timestamp()), 1000)
+            scrobbles.close()
+        # The other pages are not requested if the iteration is stopped on the first page
+        self.assertEqual(self.requested_pages, [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+"""test_retries.py
+Tests how the client retries requests and how it handles errors."""
+import unittest
+from unittest.mock import patch
+
+import requests
+
+from last_fm_api_client.client import Client, LastFMClientError, LastFMDataNotFound
+from .utils import StubResponse, StubServer, generate_album_json
+
+
+class RetryTests(unittest.TestCase):
+    def setUp(self):
+        self.client = Client("key", "user agent", max_retries=2, backoff_factor=0)
+        self.addCleanup(self.client.close)
+
+    def test_error_codes_are_retried(self):
+        with patch.object(self.client.session, "request", side_effect=[
+            StubResponse({"error": 29, "message": "Rate limit exceeded"}),
+            StubResponse({"error": 16, "message": "Temporarily unavailable"}),
+            StubResponse(generate_album_json()),
+        ]) as request:
+            self.assertEqual(self.client.get_album("Pavement", "Wowee Zowee").album.name, "Wowee Zowee")
+        self.assertEqual(request.call_count, 3)
+
+    def test_error_codes_give_up(self):
+        with patch.object(self.client.session, "request",
+                          return_value=StubResponse({"error": 29, "message": "Rate limit exceeded"})) as request:
+            with self.assertRaises(LastFMClientError):
+                self.client.get_album("Pavement", "Wowee Zowee")
+        self.assertEqual(request.call_count, 3)  # (the request and max_retries retries)
+
+    def test_server_errors_are_retried(self):
+        with StubServer([(503, {}), (500, {}), (200, generate_album_json())]) as server:
+            client = Client("key", "user agent", base_url=server.base_url, max_retries=2, backoff_factor=0)
+            with client:
+                self.assertEqual(client.get_album("Pavement", "Wowee Zowee").album.name, "Wowee Zowee")
+        self.assertEqual(server.requests, 3)
+
+    def test_server_errors_give_up(self):
+        with StubServer([(503, {})]) as server:
+            client = Client("key", "user agent", base_url=server.base_url, max_retries=2, backoff_factor=0)
+            with client, self.assertRaises(LastFMClientError):
+                client.get_album("Pavement", "Wowee Zowee")
+        self.assertEqual(server.requests, 3)
+
+    def test_connection_errors(self):
+        with patch.object(self.client.session, "request", side_effect=requests.ConnectionError("Connection refused")):
+            with self.assertRaises(LastFMClientError):
+                self.client.get_album("Pavement", "Wowee Zowee")
+
+    def test_not_found(self):
+        for response in [StubResponse({"error": 6, "message": "Album not found"}), StubResponse({}, status_code=404)]:
+            with self.subTest(response=response.response_json), \
+                    patch.object(self.client.session, "request", return_value=response) as request:
+                with self.assertRaises(LastFMDataNotFound):
+                    self.client.get_album("Pavement", "Wowee Zowee")
+                self.assertEqual(request.call_count, 1)  # (not retried)
+
+    def test_empty_tags_are_not_found(self):
+        with patch.object(self.client.session, "request", return_value=StubResponse({
+            "tag": {"name": "nothing", "total": 0, "reach": 0, "wiki": {"summary": "", "content": ""}}
+        })):
+            with self.assertRaises(LastFMDataNotFound):
+                self.client.get_tag("nothing")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+"""utils.py
+Stub responses and Last.FM response JSON that the tests use."""
+import http.server
+import json
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+class StubResponse:
+    """Stands in for a requests.Response."""
+
+    def __init__(self, response_json: Optional[Dict], status_code: int = 200):
+        self.response_json = response_json
+        self.status_code = status_code
+
+    def json(self) -> Dict:
+        if self.response_json is None:
+            raise ValueError("The response is not JSON.")
+        return self.response_json
+
+
+def generate_album_json(name: str = "Wowee Zowee") -> Dict:
+    """Generates an album.getInfo response."""
+    return {"album": {"artist": "Pavement", "name": name, "listeners": "1", "playcount": "2", "tags": ""}}
+
+
+def generate_scrobble_json(timestamp: int) -> Dict:
+    """Generates a scrobble that was scrobbled at a UNIX timestamp."""
+    return {
+        "artist": {"#text": "Pavement", "mbid": ""},
+        "album": {"#text": "Wowee Zowee", "mbid": ""},
+        "mbid": "",
+        "date": {"uts": str(timestamp), "#text": ""},
+        "name": f"Track scrobbled at {timestamp}",
+    }
+
+
+def generate_scrobble_page_json(page_number: int, total_pages: int, timestamps: List[int]) -> Dict:
+    """Generates a page of user.getRecentTracks."""
+    return {
+        "recenttracks": {
+            "track": [generate_scrobble_json(timestamp) for timestamp in timestamps],
+            "@attr": {"user": "user", "page": str(page_number), "total": str(total_pages * len(timestamps)),
+                      "totalPages": str(total_pages), "perPage": str(len(timestamps))},
+        }
+    }
+
+
+class StubServer:
+    """A local HTTP server that responds with a list of (status code, JSON) responses in order, and repeats the last
+    one when it runs out. Used to test the retries of the requests session. Use it as a context manager."""
+
+    def __init__(self, responses: List[Tuple[int, Dict]]):
+        self.responses = list(responses)
+        self.requests = 0
+        stub_server = self
+
+        class RequestHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                status_code, response_json = stub_server.responses[min(stub_server.requests, len(stub_server.responses) - 1)]
+                stub_server.requests += 1
+                body = json.dumps(response_json).encode("UTF-8")
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.HTTPServer(("127.0.0.1", 0), RequestHandler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
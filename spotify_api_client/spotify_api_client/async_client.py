@@ -0,0 +1,296 @@
+"""async_client.py
+An asyncio version of the client, which makes it possible to send many requests concurrently.
+Requires aiohttp to be installed."""
+import asyncio
+import weakref
+from typing import Tuple
+from .client import *
+
+import aiohttp
+
+# The maximum number of items that can be requested at once from the playlist items endpoint
+MAX_PLAYLIST_ITEMS_PER_REQUEST = 50
+
+
+class AsyncSpotifyClient(SpotifyClient):
+    def __init__(self, client_id:str, client_secret:str, user_agent:str):
+        """Initializes an asyncio Spotify API client. Users and client credentials are the same as
+        for SpotifyClient, but their access tokens are refreshed asynchronously (see refresh_authorization).
+        Use the client as an async context manager or call close() when you are done with it.
+        See SpotifyClient for the parameters."""
+        super().__init__(client_id, client_secret, user_agent)
+        self.logger = logging.getLogger(f"{__name__}:AsyncSpotifyClient")
+        # (aiohttp sessions have to be created inside the event loop, so this is created when the first request is sent)
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.session_loop: Optional[asyncio.AbstractEventLoop] = None
+        # Mapping: user or client credentials --> lock that is held while their access token is refreshed.
+        # (like the session, the locks can only be used in one event loop)
+        self.refresh_locks: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self.refresh_locks_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def get_session(self)->aiohttp.ClientSession:
+        """Returns the session that is used to send requests, which reuses connections.
+        A session can only be used in the event loop that it was created in, so a new one is created if the client
+        is used from another event loop."""
+        loop = asyncio.get_running_loop()
+        if self.session is None or self.session_loop is not loop:
+            if self.session is not None:
+                self.logger.info("The client is used from a new event loop. Creating a new session...")
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=POOL_SIZE),
+                timeout=aiohttp.ClientTimeout(sock_connect=TIMEOUT[0], sock_read=TIMEOUT[1])
+            )
+            self.session_loop = loop
+        return self.session
+
+    async def close(self)->None:
+        """Closes all connections of the client."""
+        if self.session is not None and self.session_loop is asyncio.get_running_loop():
+            await self.session.close()
+        self.session = None
+        self.session_loop = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def get_refresh_lock(self, authorization:Union[SpotifyUser, ClientCredentials])->asyncio.Lock:
+        """Returns the lock that is held while the access token of a user or client credentials is refreshed.
+
+        :param authorization: The user or client credentials."""
+        loop = asyncio.get_running_loop()
+        if self.refresh_locks_loop is not loop:
+            self.refresh_locks = weakref.WeakKeyDictionary()
+            self.refresh_locks_loop = loop
+        if authorization not in self.refresh_locks:
+            self.refresh_locks[authorization] = asyncio.Lock()
+        return self.refresh_locks[authorization]
+
+    async def get_access_token(self, authorization:Union[SpotifyUser, ClientCredentials])->str:
+        """Gets a valid access token from a user or client credentials, and refreshes it if needed.
+
+        :param authorization: The user or client credentials to get an access token for."""
+        access_token = authorization.access_token
+        if check_token_needs_refresh(authorization.expires_datetime):
+            await self.refresh_authorization(authorization, access_token)
+        return authorization.access_token
+
+    async def refresh_authorization(self, authorization:Union[SpotifyUser, ClientCredentials], expired_access_token:Optional[str])->None:
+        """Refreshes the access token of a user or client credentials, unless it has already been refreshed. If several
+        requests refresh the token at the same time, only one request is sent, and the others wait for it and use the new token.
+        For users, on_token_refresh_async is awaited afterwards. If the user does not have one, on_token_refresh is run in another thread.
+
+        :param authorization: The user or client credentials to refresh the access token for.
+
+        :param expired_access_token: The access token that needs to be refreshed."""
+        async with self.get_refresh_lock(authorization):
+            if authorization.access_token != expired_access_token:
+                self.logger.info("The access token has already been refreshed.")
+                return
+            self.logger.info("Refreshing access token...")
+            response_json = await self.send_unauthorized_request("https://accounts.spotify.com/api/token", "POST",
+                                                                 authorization.generate_refresh_request_kwargs())
+            authorization.handle_refresh_response(response_json)
+            if isinstance(authorization, SpotifyUser):
+                if authorization.on_token_refresh_async is not None:
+                    await authorization.on_token_refresh_async(authorization)
+                elif authorization.on_token_refresh is not None:
+                    await asyncio.to_thread(authorization.on_token_refresh, authorization)
+
+    async def get_me(self, user:SpotifyUser)->Dict:
+        """Gets details about a user. See SpotifyUser.get_me.
+
+        :param user: The user to get details about."""
+        self.logger.info("Returning details about the current user...")
+        return await self.send_request("https://api.spotify.com/v1/me", "GET", {}, authorization=user)
+
+    async def create_user(self, access_token:str, expires_in:int, refresh_token:str, on_token_refresh:Optional[Callable]=None,
+                          on_token_refresh_async:Optional[Callable]=None, linked_database_id:Optional[int]=None)->SpotifyUser:
+        """Creates a SpotifyUser of this client and retrieves the details about the user asynchronously.
+        See SpotifyUser for the parameters."""
+        user = SpotifyUser(
+            access_token=access_token,
+            expires_in=expires_in,
+            refresh_token=refresh_token,
+            client_id=self.client_id,
+            authorization_header=self.authorization_header,
+            user_agent=self.user_agent,
+            on_token_refresh=on_token_refresh,
+            linked_database_id=linked_database_id,
+            on_token_refresh_async=on_token_refresh_async,
+            retrieve_user_information=False
+        )
+        user.set_user_information(await self.get_me(user))
+        return user
+
+    async def get_user_from_redirect(self, response_parameters:Dict, redirect_uri:str, state:Optional[str]=None)->SpotifyUser:
+        """Retrieves an access token and creates a Spotify user from a redirect to the redirect_uri.
+        See SpotifyClient.get_user_from_redirect."""
+        request_body = self.generate_user_token_request_body(response_parameters, redirect_uri, state)
+        response_json = await self.send_request("https://accounts.spotify.com/api/token", "POST", {"data": request_body})
+        user = self.create_user_from_token_response(response_json, retrieve_user_information=False)
+        user.set_user_information(await self.get_me(user))
+        return user
+
+    async def send_request(self, url:str, method:str, request_kwargs:Dict, authorization:Optional[Union[SpotifyUser, ClientCredentials]]=None)->Dict:
+        """Sends an authorized request to Spotify and parses and returns the result. See SpotifyClient.send_request.
+
+        :param request_kwargs Any optional arguments to pass to aiohttp.ClientSession.request."""
+        if "headers" not in request_kwargs:
+            request_kwargs["headers"] = {}
+        access_token = None
+        if authorization is not None:
+            access_token = await self.get_access_token(authorization)
+            request_kwargs["headers"]["Authorization"] = f"Bearer {access_token}"
+        else:
+            request_kwargs["headers"]["Authorization"] = self.authorization_header
+        request_kwargs["headers"]["User-Agent"] = self.user_agent
+        try:
+            return await self.send_unauthorized_request(url, method, request_kwargs)
+        except SpotifyTokenNeedsRefresh as e:
+            logger.warning("Redoing request - my tokens are old...")
+            if authorization is None:
+                raise e
+            await self.refresh_authorization(authorization, access_token)
+            # (the request is only redone once)
+            request_kwargs["headers"]["Authorization"] = f"Bearer {authorization.access_token}"
+            return await self.send_unauthorized_request(url, method, request_kwargs)
+
+    async def send_unauthorized_request(self, url:str, method:str, request_kwargs:Dict)->Dict:
+        """Sends a request to the Spotify API and returns the response JSON. Failed requests are retried, see get_retry_delay.
+        This is the asyncio version of the global send_request function. The authorization header is not added.
+
+        :param url: The URL to request.
+
+        :param method: The method to use.
+
+        :param request_kwargs: Kwargs to pass to aiohttp.ClientSession.request."""
+        if "params" in request_kwargs:  # (aiohttp only accepts strings and numbers as URL parameters)
+            request_kwargs["params"] = {key: str(value).lower() if isinstance(value, bool) else value
+                                        for key, value in request_kwargs["params"].items() if value is not None}
+        self.logger.info(f"Sending request to Spotify API with kwargs: {request_kwargs}...")
+        retry_number = 0
+        while True:
+            try:
+                async with self.get_session().request(method, url, **request_kwargs) as response:
+                    status_code = response.status
+                    headers = response.headers
+                    response_text = await response.text()
+                    try:
+                        response_json = await response.json(content_type=None)
+                    except ValueError:
+                        response_json = None  # (handled by handle_response)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                retry_delay = get_retry_delay(method, retry_number)
+                if retry_delay is None:
+                    raise SpotifyAPIException(f"Failed to send a request to the Spotify API: {e}")
+                retry_number += 1
+                self.logger.warning(f"Failed to send a request to Spotify: {e}. Retrying in {retry_delay:.2f} second(s) (retry {retry_number}/{MAX_RETRIES})...")
+                await asyncio.sleep(retry_delay)
+                continue
+            retry_delay = get_retry_delay(method, retry_number, status_code, headers) if status_code >= 400 else None
+            if retry_delay is None:
+                return handle_response(url, method, status_code, response_json, f"Response text: {response_text}")
+            retry_number += 1
+            self.logger.warning(f"Spotify responded with status code {status_code}. Retrying in {retry_delay:.2f} second(s) (retry {retry_number}/{MAX_RETRIES})...")
+            await asyncio.sleep(retry_delay)
+
+    async def get_user_playlist(self, user:SpotifyUser, playlist_id:str, fields:Optional[str]=None)->Dict:
+        """Gets a user's playlist. See SpotifyClient.get_user_playlist."""
+        self.logger.info(f"Getting playlist {playlist_id}...")
+        request_kwargs = {}
+        if fields is not None:
+            request_kwargs["params"] = {"fields": fields}
+        return await self.send_request(f"https://api.spotify.com/v1/playlists/{playlist_id}", "GET", request_kwargs, authorization=user)
+
+    async def get_user_playlist_item_pages(self, user:SpotifyUser, playlist_id:str, offsets:List[int], fields:Optional[str]=None)->List[Dict]:
+        """Gets pages of items in a user playlist at the same time.
+
+        :param user: The user that owns the playlist.
+
+        :param playlist_id: The ID of the playlist.
+
+        :param offsets: The index of the first item of each page to get.
+
+        :param fields: Optional. Only return some fields of the pages, for example "items(track(uri))"."""
+        return await asyncio.gather(*[
+            self.send_request(f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks", "GET", {
+                "params": {"offset": offset, "limit": MAX_PLAYLIST_ITEMS_PER_REQUEST, "fields": fields}
+            }, authorization=user)
+            for offset in offsets
+        ])
+
+    async def get_user_playlist_items(self, user:SpotifyUser, playlist_id:str)->List[Dict]:
+        """Gets the items in a user playlist. The first page is retrieved first, which tells how many items
+        there are, and then all other pages are retrieved at the same time.
+
+        :param user: The user that owns the playlist.
+
+        :param playlist_id: The ID of the playlist."""
+        self.logger.info(f"Getting items for playlist {playlist_id}...")
+        first_page = await self.send_request(f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks", "GET", {
+            "params": {"limit": MAX_PLAYLIST_ITEMS_PER_REQUEST}
+        }, authorization=user)
+        other_pages = await self.get_user_playlist_item_pages(user, playlist_id,
+                                                              get_remaining_offsets(first_page))
+        return [item for page in [first_page, *other_pages] for item in page["items"]]
+
+    async def get_user_playlist_with_items(self, user:SpotifyUser, playlist_id:str, fields:Optional[str]=None, item_fields:Optional[str]=None,
+                                           only_if_changed_from:Optional[str]=None)->Tuple[Dict, Optional[List[Dict]]]:
+        """Gets a user's playlist and all its items. The playlist and its first page of items are retrieved in one request,
+        and then all other pages are retrieved at the same time.
+
+        :param user: The user that owns the playlist.
+
+        :param playlist_id: The ID of the playlist.
+
+        :param fields: Optional. Only return some fields of the playlist, for example "id,snapshot_id".
+        (The fields of the first page of items are added automatically)
+
+        :param item_fields: Optional. Only return some fields of the items, for example "track(uri)".
+
+        :param only_if_changed_from: Optional. A snapshot ID of the playlist. If the playlist still has that snapshot ID,
+        the other pages of items are not retrieved.
+
+        :returns A tuple of the playlist and its items. The items are None if the playlist had not changed (see only_if_changed_from).
+        The "tracks" key of the playlist only contains the first page of items."""
+        self.logger.info(f"Getting playlist {playlist_id} with its items...")
+        if fields is not None:
+            item_fields_filter = f"items({item_fields})" if item_fields is not None else "items"
+            fields = f"{fields},tracks(total,limit,offset,{item_fields_filter})"
+        playlist = await self.get_user_playlist(user, playlist_id, fields)
+        if only_if_changed_from is not None and playlist.get("snapshot_id") == only_if_changed_from:
+            self.logger.info(f"Playlist {playlist_id} has not changed.")
+            return playlist, None
+        other_pages = await self.get_user_playlist_item_pages(user, playlist_id,
+                                                              get_remaining_offsets(playlist["tracks"]),
+                                                              f"items({item_fields})" if item_fields is not None else None)
+        return playlist, [item for page in [playlist["tracks"], *other_pages] for item in page["items"]]
+
+    async def create_playlist(self, user:SpotifyUser, name:str, public:Optional[bool]=None, collaborative:Optional[bool]=None, description:Optional[str]=None)->Dict:
+        """Creates a playlist for a user. See SpotifyClient.create_playlist."""
+        self.logger.info("Creating playlist...")
+        return await self.send_request(f"https://api.spotify.com/v1/users/{user.id}/playlists", "POST", {
+            "json": self.generate_create_playlist_request_body(name, public, collaborative, description)}, authorization=user)
+
+    async def add_items_to_playlist(self, user:SpotifyUser, playlist_id:str, uris_to_insert:List[str], position:Optional[int]=None)->Dict:
+        """Adds items to a playlist. See SpotifyClient.add_items_to_playlist."""
+        self.logger.info(f"Adding items to a playlist {playlist_id}...")
+        return await self.send_request(f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks", "POST",
+                                       {"json": self.generate_add_items_request_body(uris_to_insert, position)}, authorization=user)
+
+    async def remove_items_from_playlist(self, user:SpotifyUser, playlist_id:str, uris_to_remove:List[str])->Dict:
+        """Removes items from a playlist. See SpotifyClient.remove_items_from_playlist."""
+        self.logger.info(f"Removing items from a playlist {playlist_id}...")
+        return await self.send_request(f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks", "DELETE",
+                                       {"json": self.generate_remove_items_request_body(uris_to_remove)}, authorization=user)
+
+
+def get_remaining_offsets(first_page:Dict)->List[int]:
+    """Gets the offsets of the pages that come after the first page of a paginated response.
+
+    :param first_page: The first page. Must include the "total" and "limit" keys, and optionally "offset"."""
+    start = first_page.get("offset", 0) + first_page["limit"]
+    return list(range(start, first_page["total"], MAX_PLAYLIST_ITEMS_PER_REQUEST))
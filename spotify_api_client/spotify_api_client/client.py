@@ -2,16 +2,38 @@
 Implements a Spotify API client."""
 import base64
 import datetime
+import itertools
+import random
+import threading
 import time
 import urllib.parse, logging
 from enum import Enum
-from typing import Optional, Dict, List, Union, Callable
+from typing import Optional, Dict, Iterator, List, Union, Callable
 
 import requests
+from requests.adapters import HTTPAdapter
 
 # Create global logger
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG)
+# The maximum number of albums that can be requested at once using the "get several albums" endpoint
+MAX_ALBUMS_PER_REQUEST = 20
+# Settings for the connection pool, timeouts (connect timeout, read timeout) and retries
+POOL_SIZE = 10
+TIMEOUT = (5, 30)
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+# The longest time (in seconds) to wait if Spotify rate limits a request. If Spotify asks us to wait longer, the request fails.
+MAX_RETRY_AFTER = 30
+# Status codes to retry requests on
+RETRY_STATUS_CODES = [500, 502, 503, 504]
+# Request methods that are safe to retry on connection errors and server errors, since sending them twice does not
+# change the result. (Rate limited requests are always retried, since Spotify did not handle them)
+IDEMPOTENT_METHODS = ["GET", "PUT", "DELETE"]
+
+# All requests are sent using one session, which keeps connections to Spotify open between requests
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=POOL_SIZE))
 
 class SpotifyAPIException(Exception):
     """Generic API exception that is raised during unhandled errors."""
@@ -60,22 +82,105 @@ class SpotifyScope(Enum):
     CREATE_PARTNER = "user-create-partner"
 
 
+def get_backoff(retry_number:int)->float:
+    """Returns how many seconds to wait before retrying a request. The back-off is exponential and
+    randomized ("full jitter"), so that requests that failed at the same time are not retried at the same time.
+
+    :param retry_number: The number of the retry, starting at 1."""
+    return random.uniform(0, BACKOFF_FACTOR * 2 ** retry_number)
+
+
+def get_retry_delay(method:str, retry_number:int, status_code:Optional[int]=None, headers:Optional[Dict]=None)->Optional[float]:
+    """Decides if a request should be retried. Rate limited requests are retried, and so are
+    connection errors and server errors (5xx) for requests that are safe to send again (see IDEMPOTENT_METHODS).
+    Requests are retried at most MAX_RETRIES times.
+
+    :param method: The method of the request.
+
+    :param retry_number: The number of times that the request has been retried.
+
+    :param status_code: The status code of the response. None if the request failed without a response.
+
+    :param headers: The headers of the response.
+
+    :returns How many seconds to wait before retrying the request, or None if it should not be retried."""
+    if retry_number >= MAX_RETRIES:
+        return None
+    if status_code == 429:  # Handle rate limits
+        if headers is not None and "Retry-After" in headers:
+            retry_after = int(headers["Retry-After"])
+            if retry_after > MAX_RETRY_AFTER:
+                raise SpotifyAPIException(f"Rate limited by Spotify for {retry_after} seconds, which is longer than the maximum of {MAX_RETRY_AFTER} seconds.")
+            return retry_after + random.uniform(0, 1)
+        return get_backoff(retry_number + 1)
+    if (status_code is None or status_code in RETRY_STATUS_CODES) and method in IDEMPOTENT_METHODS:
+        return get_backoff(retry_number + 1)
+    return None
+
+
+def handle_response(url:str, method:str, status_code:int, response_json:Optional[Dict], response_text:str)->Dict:
+    """Handles a response from the Spotify API and returns its JSON, or raises an exception for unsuccessful responses.
+
+    :param url: The URL that was requested.
+
+    :param method: The method that was used.
+
+    :param status_code: The status code of the response.
+
+    :param response_json: The JSON of the response, or None if it could not be parsed.
+
+    :param response_text: The text of the response, for logging."""
+    if response_json is None:
+        raise SpotifyAPIException(f"Failed to parse response to JSON. {response_text}")
+    logger.info(f"Spotify responded with JSON: {response_json} for a {method} request to {url}.")
+    if str(status_code).startswith("2"):
+            return response_json
+    elif status_code == 404: # Handle 404
+        raise SpotifyDataNotFound(f"Got a 404 from Spotify API: {response_text}")
+    elif status_code == 400 and response_json.get("error_description", None) == "Refresh token revoked":
+        raise SpotifyAuthenticationRevoked("The user has revoked your authentication.")
+    elif status_code == 401 and ("error" in response_json and response_json["error"].get("message", None) == "The access token expired"):
+        # Note: this might happen if the database contains an old key
+        raise SpotifyTokenNeedsRefresh("You need to refresh the access token.")
+    else:  # All status code not starting with 2xx are considered unexpected
+        raise SpotifyAPIException(f"Unexpected status code from Spotify API: {status_code} {response_text}")
+
+
 def send_request(url:str, method:str, request_kwargs:Dict, token_refresh_function:Optional[Callable]=None)->Dict:
     """Global function for sending a request to the Spotify API.
-    Handles rate limiting and returns the response JSON.
+    Handles rate limiting and returns the response JSON. Failed requests are retried, see get_retry_delay.
 
     :param url: The URL to request.
 
     :param method: The method to use.
 
-    :param request_kwargs: Kwargs to pass to request.request function.
+    :param request_kwargs: Kwargs to pass to request.request function. A timeout is added if it is not set.
 
     :param token_refresh_function: Optional function to run if Spotify returns that the old token needs to be refreshed.
     Should be handled by other code but is a safeguard in extreme cases."""
     request_kwargs["url"] = url
     request_kwargs["method"] = method
+    if "timeout" not in request_kwargs:
+        request_kwargs["timeout"] = TIMEOUT
     logger.info(f"Sending request to Spotify API with kwargs: {request_kwargs}...")
-    response = requests.request(**request_kwargs)
+    retry_number = 0
+    while True:
+        try:
+            response = session.request(**request_kwargs)
+        except requests.RequestException as e:
+            retry_delay = get_retry_delay(method, retry_number)
+            if retry_delay is None:
+                raise SpotifyAPIException(f"Failed to send a request to the Spotify API: {e}")
+            retry_number += 1
+            logger.warning(f"Failed to send a request to Spotify: {e}. Retrying in {retry_delay:.2f} second(s) (retry {retry_number}/{MAX_RETRIES})...")
+            time.sleep(retry_delay)
+            continue
+        retry_delay = get_retry_delay(method, retry_number, response.status_code, response.headers) if not response.ok else None
+        if retry_delay is None:
+            break
+        retry_number += 1
+        logger.warning(f"Spotify responded with status code {response.status_code}. Retrying in {retry_delay:.2f} second(s) (retry {retry_number}/{MAX_RETRIES})...")
+        time.sleep(retry_delay)
     try:
         response_text = f"Response text: {response.text}"
     except Exception as e:
@@ -83,27 +188,9 @@ def send_request(url:str, method:str, request_kwargs:Dict, token_refresh_functio
     response_json = None
     try:
         response_json = response.json()
-        logger.info(f"Spotify responded with JSON: {response_json} for a {method} request to {url}.")
     except Exception as e:
-            raise SpotifyAPIException(f"Failed to parse response to JSON. {response_text}")
-    if str(response.status_code).startswith("2"):
-            return response_json
-    elif response.status_code == 429:  # Handle rate limits
-        if "Retry-After" not in response.headers:
-            raise KeyError("Received rate limit error, but no Retry-After header from Spotify.")
-        retry_after = int(response.headers["Retry-After"])
-        logger.info(f"We were rate limited from Spotify... trying again in {retry_after}...")
-        time.sleep(retry_after)
-        return send_request(url=url, method=method, request_kwargs=request_kwargs, token_refresh_function=token_refresh_function)
-    elif response.status_code == 404: # Handle 404
-        raise SpotifyDataNotFound(f"Got a 404 from Spotify API: {response_text}")
-    elif response.status_code == 400 and (response_json is not None and response_json.get("error_description", None) == "Refresh token revoked"):
-        raise SpotifyAuthenticationRevoked("The user has revoked your authentication.")
-    elif response.status_code == 401 and (response_json is not None and "error" in response_json and response_json["error"].get("message", None) == "The access token expired"):
-        # Note: this might happen if the database contains an old key
-        raise SpotifyTokenNeedsRefresh("You need to refresh the access token.")
-    else:  # All status code not starting with 2xx are considered unexpected
-        raise SpotifyAPIException(f"Unexpected status code from Spotify API: {response.status_code} {response_text}")
+        pass  # (handled by handle_response)
+    return handle_response(url, method, response.status_code, response_json, response_text)
 
 # Time-related utilities
 def calculate_expires_in(seconds:int)->datetime.datetime:
@@ -123,7 +210,8 @@ def check_token_needs_refresh(expires_at: Optional[datetime.datetime], timestamp
 
 class SpotifyUser:
     """Allows access to user-related API views."""
-    def __init__(self, access_token:str, expires_in:int, refresh_token:str, client_id:str, authorization_header:str, user_agent:str, on_token_refresh:Optional[Callable]=None, linked_database_id:Optional[int]=None):
+    def __init__(self, access_token:str, expires_in:int, refresh_token:str, client_id:str, authorization_header:str, user_agent:str, on_token_refresh:Optional[Callable]=None, linked_database_id:Optional[int]=None,
+                 on_token_refresh_async:Optional[Callable]=None, retrieve_user_information:bool=True):
         """Initializes a new, authenticated user.
 
         :param access_token: The access token that the user was authenticated with.
@@ -143,6 +231,12 @@ class SpotifyUser:
 
         :param linked_database_id: Optional parameter to store a database entry that this Spotify user is linked to. Made specifically
         for my "Album of the day" project.
+
+        :param on_token_refresh_async: Optional async function that runs instead of on_token_refresh when AsyncSpotifyClient has refreshed
+        the access tokens. It receives the current self state. If it is not set, on_token_refresh is run in another thread.
+
+        :param retrieve_user_information: Optional. Set to False to not retrieve the user's details (see get_me) on initialization.
+        Set them with set_user_information instead, for example using AsyncSpotifyClient.get_me.
         """
         # Create an internal logger
         self.logger = logging.getLogger(f"{__name__}:SpotifyUser")
@@ -155,44 +249,84 @@ class SpotifyUser:
         self.authorization_header = authorization_header
         self.user_agent = user_agent
         self.on_token_refresh = on_token_refresh
+        self.on_token_refresh_async = on_token_refresh_async
         self.linked_database_id = linked_database_id
+        # (only one thread refreshes the access token at a time, see refresh_access_token)
+        self.refresh_lock = threading.Lock()
+        self._user_information = None
+        self.username = None
+        self.id = None
         # Get user information and add: it's so useful we do this on initialization
-        self._user_information = self.get_me()
+        if retrieve_user_information:
+            self.set_user_information(self.get_me())
+
+    def set_user_information(self, user_information:Dict):
+        """Sets the details about the user.
+
+        :param user_information: The response from the /me endpoint (see get_me)."""
+        self._user_information = user_information
         self.username = self._user_information["display_name"]
         self.id = self._user_information["id"]
 
-    def refresh_access_token(self):
-        """Refreshes the user's access token."""
+    def refresh_access_token(self, expired_access_token:Optional[str]=None):
+        """Refreshes the user's access token. If several threads refresh the token at the same time, only one
+        request is sent, and the other threads wait for it and use the new token.
+
+        :param expired_access_token: Optional. The access token that needs to be refreshed. Default is the current access token.
+        The token is not refreshed if it has already been replaced."""
+        if expired_access_token is None:
+            expired_access_token = self.access_token
+        with self.refresh_lock:
+            if self.access_token != expired_access_token:
+                self.logger.info("The access token has already been refreshed.")
+                return
+            self.send_refresh_access_token_request()
+
+    def send_refresh_access_token_request(self):
+        """Refreshes the user's access token without checking if another thread is doing it. Use refresh_access_token instead."""
         self.logger.info("Sending request to refresh user access token...")
-        response_json = send_request("https://accounts.spotify.com/api/token", "POST", {
+        response_json = send_request("https://accounts.spotify.com/api/token", "POST", self.generate_refresh_request_kwargs(),
+                                     token_refresh_function=self.refresh_access_token)
+        self.handle_refresh_response(response_json)
+        if self.on_token_refresh is not None:
+            self.logger.info("Calling on_token_refresh callback function...")
+            self.on_token_refresh(self)
+            self.logger.info("on_token_refresh function called.")
+
+    def generate_refresh_request_kwargs(self)->Dict:
+        """Generates the request to refresh the user's access token (kwargs for send_request)."""
+        return {
             "data": {
-        "grant_type": "refresh_token",
-        "refresh_token": self.refresh_token,
-        "client_id": self.client_id
-        },
-                "headers": {
-            "Authorization": self.authorization_header,
-            "User-Agent": self.user_agent
+                "grant_type": "refresh_token",
+                "refresh_token": self.refresh_token,
+                "client_id": self.client_id
+            },
+            "headers": {
+                "Authorization": self.authorization_header,
+                "User-Agent": self.user_agent
+            }
         }
 
-            }, token_refresh_function=self.refresh_access_token)
+    def handle_refresh_response(self, response_json:Dict):
+        """Sets the new access token from a response to the request to refresh it (see generate_refresh_request_kwargs).
+
+        :param response_json: The JSON of the response."""
         self.logger.info("Received new tokens for user.")
         if response_json["token_type"].lower() != "bearer":
             raise Exception(f"Unexpected token type returned from Spotify: {response_json['token_type'].lower()}")
-        self.access_token = response_json["access_token"]
+        # (the expiry time is set before the token, so that a thread that reads the new token never sees the old expiry time)
         self.expires_in = response_json["expires_in"]
         self.expires_datetime = calculate_expires_in(self.expires_in)
+        self.access_token = response_json["access_token"]
         self.logger.info("New token set and accessible.")
-        if self.on_token_refresh is not None:
-            self.logger.info("Calling on_token_refresh callback function...")
-            self.on_token_refresh(self)
-            self.logger.info("on_token_refresh function called.")
+
     def get_access_token(self)->str:
         """Gets a valid, refreshed access token to use for the user.
         If it needs refresh, we'll handle that!"""
+        access_token = self.access_token
         if check_token_needs_refresh(self.expires_datetime):
             self.logger.info("Refreshing access token for user...")
-            self.refresh_access_token()
+            self.refresh_access_token(access_token)
         return self.access_token # (if a refresh was needed, we would have gotten the token by now)
 
     def get_authorization_header(self)->str:
@@ -236,13 +370,36 @@ class ClientCredentials:
         # Save under client_authorization_header to avoid confusion with self.get_authorization_header()
         self.client_authorization_header = authorization_header
         self.user_agent = user_agent
+        self.access_token = None
         self.expires_datetime = None
         self.logger = logging.getLogger(f"{__name__}:ClientCredentials")
-
-    def refresh_client_credentials(self):
-        """Refreshes the client credentials for the user."""
+        # (only one thread refreshes the credentials at a time, see refresh_client_credentials)
+        self.refresh_lock = threading.Lock()
+
+    def refresh_client_credentials(self, expired_access_token:Optional[str]=None):
+        """Refreshes the client credentials. If several threads refresh them at the same time, only one
+        request is sent, and the other threads wait for it and use the new token.
+
+        :param expired_access_token: Optional. The access token that needs to be refreshed. Default is the current access token.
+        The token is not refreshed if it has already been replaced."""
+        if expired_access_token is None:
+            expired_access_token = self.access_token
+        with self.refresh_lock:
+            if self.access_token != expired_access_token:
+                self.logger.info("The client credentials have already been refreshed.")
+                return
+            self.send_refresh_client_credentials_request()
+
+    def send_refresh_client_credentials_request(self):
+        """Refreshes the client credentials without checking if another thread is doing it. Use refresh_client_credentials instead."""
         self.logger.info("Refreshing client credentials...")
-        response_json = send_request("https://accounts.spotify.com/api/token", "POST", {
+        response_json = send_request("https://accounts.spotify.com/api/token", "POST", self.generate_refresh_request_kwargs(),
+                                     token_refresh_function=self.refresh_client_credentials)
+        self.handle_refresh_response(response_json)
+
+    def generate_refresh_request_kwargs(self)->Dict:
+        """Generates the request to refresh the client credentials (kwargs for send_request)."""
+        return {
             "data": {
                 "grant_type": "client_credentials"
             },
@@ -250,18 +407,24 @@ class ClientCredentials:
                 "Authorization": self.client_authorization_header,
                 "User-Agent": self.user_agent
             }
-        }, token_refresh_function=self.refresh_client_credentials)
-        # Add access token and calculate when it expires.
-        self.access_token = response_json['access_token']
+        }
+
+    def handle_refresh_response(self, response_json:Dict):
+        """Sets the new access token from a response to the request to refresh it (see generate_refresh_request_kwargs).
+
+        :param response_json: The JSON of the response."""
+        # Add access token and calculate when it expires. (the expiry time is set first, see SpotifyUser.handle_refresh_response)
         self.expires_in = response_json["expires_in"]
         self.expires_datetime = calculate_expires_in(self.expires_in)
+        self.access_token = response_json['access_token']
 
     def get_access_token(self):
         """Uses the Client Credentials authentication method to get a Bearer token used for non-authorized requests.
         Ensure it is fresh and handles refreshes if needed!"""
+        access_token = self.access_token
         if check_token_needs_refresh(self.expires_datetime):
             self.logger.info("Refreshing client credentials...")
-            self.refresh_client_credentials()
+            self.refresh_client_credentials(access_token)
         return self.access_token
     
     def get_authorization_header(self)->str:
@@ -301,8 +464,10 @@ class SpotifyClient:
         # Decide what authorization token to use. If we should authenticate using a user,
         # we're using that access token. And if we're using client credentials flow,
         # we also want to use that!
+        access_token = None
         if authorization is not None:
-            authorization_header = authorization.get_authorization_header() # (both SpotifyUser and ClientCredentials has this attribute!)
+            access_token = authorization.get_access_token() # (both SpotifyUser and ClientCredentials has this attribute!)
+            authorization_header = f"Bearer {access_token}"
         else:
             authorization_header = self.authorization_header
         # Add what function to use when refreshing authorization.
@@ -323,10 +488,34 @@ class SpotifyClient:
             # This function will handle that.
             logger.warning("Redoing request - my tokens are old...")
             if authorization_refresh_function is not None:
-                authorization_refresh_function()  # Run the function to refresh tokens
-                return self.send_request(url, method, request_kwargs, authorization)
+                authorization_refresh_function(access_token)  # Run the function to refresh tokens (unless another thread already has)
+                # (the request is only redone once)
+                request_kwargs["headers"]["Authorization"] = authorization.get_authorization_header()
+                return send_request(url, method, request_kwargs, authorization_refresh_function)
             else:
                 raise e
+
+    def iterate_pages(self, url:str, request_kwargs:Dict, authorization:Optional[Union[SpotifyUser, ClientCredentials]]=None)->Iterator[Dict]:
+        """Iterates over the pages of a paginated GET endpoint. The next page is only requested
+        when the previous one has been handled, so stopping the iteration early saves requests.
+
+        :param url: The URL of the first page.
+
+        :param request_kwargs: Any optional arguments to pass to requests.request for the first page. (The URLs of
+        the next pages already include the parameters)
+
+        :param authorization: See send_request."""
+        next_url = url
+        while next_url is not None:
+            response = self.send_request(next_url, "GET", request_kwargs, authorization=authorization)
+            yield response
+            next_url = response.get("next")
+            request_kwargs = {}
+
+    def iterate_items(self, url:str, request_kwargs:Dict, authorization:Optional[Union[SpotifyUser, ClientCredentials]]=None)->Iterator[Dict]:
+        """Like iterate_pages, but iterates over the items of all pages."""
+        for page in self.iterate_pages(url, request_kwargs, authorization):
+            yield from page["items"]
     def generate_user_authentication_url(self, redirect_uri:str, state:Optional[str]=None, scopes:Optional[List[SpotifyScope]]=None, show_dialog:Optional[bool]=None)->str:
         """Requests user authentication using the authorization code flow from Spotify (where the user visits
         a URL and grants permissions)
@@ -361,72 +550,97 @@ class SpotifyClient:
         :param redirect_uri: The same redirect URI that was provided when constructing the authorization
 
         :param state: Can be used to protect against CSRF. If so, is provided in the initial token request."""
+        request_body = self.generate_user_token_request_body(response_parameters, redirect_uri, state)
+        response_json = self.send_request("https://accounts.spotify.com/api/token", "POST", {"data": request_body})
+        return self.create_user_from_token_response(response_json)
+
+    def generate_user_token_request_body(self, response_parameters:Dict, redirect_uri:str, state:Optional[str]=None)->Dict:
+        """Checks a redirect to the redirect_uri and generates the request body to retrieve an access token from it.
+        See get_user_from_redirect for the parameters."""
         if state is not None and response_parameters["state"] != state:
             raise SpotifyAPIException(f"State mismatch: {state}!={response_parameters['state']}")
         if "error" in response_parameters:
             raise SpotifyAPIException(f"Access token not available: the error {response_parameters['error']} occurred.")
+        self.logger.info("Redirect response seems valid. Retrieving access token from redirect.")
+        return {
+            "grant_type": "authorization_code",
+            "code": response_parameters["code"],
+            "redirect_uri": redirect_uri
+        }
+
+    def create_user_from_token_response(self, response_json:Dict, retrieve_user_information:bool=True)->SpotifyUser:
+        """Creates a Spotify user from a response to the request to retrieve an access token (see generate_user_token_request_body).
+
+        :param response_json: The JSON of the response.
+
+        :param retrieve_user_information: See SpotifyUser."""
+        if response_json["token_type"] != "bearer": # Value is always "Bearer"
+            return SpotifyUser(
+                access_token=response_json["access_token"],
+                expires_in=response_json["expires_in"],
+                refresh_token=response_json["refresh_token"],
+                client_id=self.client_id,
+                authorization_header=self.authorization_header,
+                user_agent=self.user_agent,
+                retrieve_user_information=retrieve_user_information
+            )
         else:
-            self.logger.info("Redirect response seems valid. Retrieving access token from redirect.")
-            request_body = {
-                "grant_type": "authorization_code",
-                "code": response_parameters["code"],
-                "redirect_uri": redirect_uri
+            raise SpotifyAPIException(f"Unexpected token type: {response_json['token_type']}")
+
+    def iterate_user_playlists(self, user:SpotifyUser)->Iterator[Dict]:
+        """Iterates over the playlists owned by a user. See get_user_playlists.
+
+        :param user: The user to retrieve all playlists for."""
+        self.logger.info("Retrieving user playlists...")
+        return self.iterate_items(f"https://api.spotify.com/v1/users/{user.id}/playlists", {
+            "params": {
+                "limit": 50
             }
-            response_json = self.send_request("https://accounts.spotify.com/api/token", "POST", {"data": request_body})
-            if response_json["token_type"] != "bearer": # Value is always "Bearer"
-                return SpotifyUser(
-                    access_token=response_json["access_token"],
-                    expires_in=response_json["expires_in"],
-                    refresh_token=response_json["refresh_token"],
-                    client_id=self.client_id,
-                    authorization_header=self.authorization_header,
-                    user_agent=self.user_agent
-                )
-            else:
-                raise SpotifyAPIException(f"Unexpected token type: {response_json['token_type']}")
+        }, authorization=user)
 
-    def get_user_playlists(self, user:SpotifyUser, previous_playlists:List=Optional[None], next_url:Optional[str]=None)->List[Dict]:
+    def get_user_playlists(self, user:SpotifyUser, previous_playlists:Optional[List]=None, next_url:Optional[str]=None)->List[Dict]:
         """Gets a list of playlists owned by a user.
 
         :param user: The user to retrieve all playlists for.
 
-        :param previous_playlists: Value used for recursion.
+        :param previous_playlists: Optional. Playlists to return before the retrieved ones.
 
-        :param next_url: Used for recursion. Sets the URL to use for retrieving the next page with items."""
-        self.logger.info("Retrieving user playlists...")
-        if previous_playlists is not None:
-            playlists = []
-        else:
-            playlists = previous_playlists
-        # Use next page URL if specified
+        :param next_url: Optional. The URL of the page to start at."""
+        playlists = previous_playlists if previous_playlists is not None else []
         if next_url is not None:
-            url_to_use = next_url
+            playlists.extend(self.iterate_items(next_url, {}, authorization=user))
         else:
-            url_to_use = f"https://api.spotify.com/v1/users/{user.id}/playlists"
-        response = self.send_request(url_to_use, "GET", {
-            "json": {
-                "limit": 50
-            }
-        }, authorization=user)
-        if "next" in response and response["next"]:
-            self.logger.info(f"Retrieved playlist page. Getting next...")
-            playlists.extend(response["items"])
-            return self.get_user_playlists(user, playlists,  response["next"])
+            playlists.extend(self.iterate_user_playlists(user))
         self.logger.info("No other playlist pages to retrieve. Returning playlists...")
         return playlists
 
-    def get_user_playlist(self, user:SpotifyUser, playlist_id:str):
+    def get_user_playlist(self, user:SpotifyUser, playlist_id:str, fields:Optional[str]=None):
         """Gets a user's playlist.
         NOTE: See get_user_playlist_items for a function to get the items in the playlists!
 
         :param user: The user that owns the playlist.
 
-        :param playlist_id: The owner of the playlist."""
+        :param playlist_id: The owner of the playlist.
+
+        :param fields: Optional. Only return some fields of the playlist, for example "id,snapshot_id".
+        See the Spotify documentation for the syntax."""
         self.logger.info(f"Getting playlist {playlist_id}...")
-        return self.send_request(f"https://api.spotify.com/v1/playlists/{playlist_id}", "GET", {}, authorization=user)
+        request_kwargs = {}
+        if fields is not None:
+            request_kwargs["params"] = {"fields": fields}
+        return self.send_request(f"https://api.spotify.com/v1/playlists/{playlist_id}", "GET", request_kwargs, authorization=user)
+
+    def iterate_user_playlist_items(self, user:SpotifyUser, playlist_id:str, limit:Optional[int]=None)->Iterator[Dict]:
+        """Iterates over the items in a user playlist. See get_user_playlist_items for the parameters."""
+        self.logger.info(f"Getting items for playlist {playlist_id}...")
+        if limit is None:
+            limit = 50 # Default, the biggest
+        return self.iterate_items(f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks", {
+            "params": {"limit": limit}
+        }, authorization=user)
 
     def get_user_playlist_items(self, user:SpotifyUser, playlist_id:str, limit:Optional[int]=None, previous_items:Optional[List[Dict]]=None, next_url:Optional[str]=None):
-        """Gets a user playlist.
+        """Gets the items in a user playlist.
 
         :param user: The user that owns the playlist.
 
@@ -434,28 +648,14 @@ class SpotifyClient:
 
         :param limit: (Optional) Pass a custom limit.
 
-        :param previous_items: Used for recursion. Do not provide, internal value.
+        :param previous_items: Optional. Items to return before the retrieved ones.
 
-        :param next_url: Used for recursion. Sets the URL to use for retrieving the next page with items."""
-        self.logger.info(f"Getting items for playlist {playlist_id}...")
-        if limit is None:
-            limit = 50 # Default, the biggest
-        if previous_items is None:
-            playlist_items = []
-        else:
-            playlist_items = previous_items
-        # Use next page URL if specified
+        :param next_url: Optional. The URL of the page to start at."""
+        playlist_items = previous_items if previous_items is not None else []
         if next_url is not None:
-            url_to_use = next_url
+            playlist_items.extend(self.iterate_items(next_url, {}, authorization=user))
         else:
-            url_to_use = f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks"
-        response_json = self.send_request(url_to_use, "GET", {
-            "params": {"limit": limit}
-        }, authorization=user)
-        playlist_items.extend(response_json["items"])
-        if response_json["next"] and response_json["next"] is not None:
-            logger.info(f"More tracks to retrieve from playlist {playlist_items}. Retrieving next page of tracks...")
-            self.get_user_playlist_items(user, playlist_id, limit, playlist_items, response_json["next"])
+            playlist_items.extend(self.iterate_user_playlist_items(user, playlist_id, limit))
         return playlist_items
 
     def create_playlist(self, user:SpotifyUser, name:str, public:Optional[bool]=None, collaborative:Optional[bool]=None, description:Optional[str]=None):
@@ -471,6 +671,12 @@ class SpotifyClient:
 
         :param description: (Optional) A description of the playlist."""
         self.logger.info("Creating playlist...")
+        return self.send_request(f"https://api.spotify.com/v1/users/{user.id}/playlists", "POST", {
+            "json": self.generate_create_playlist_request_body(name, public, collaborative, description)},
+                                 authorization=user) # The new playlist will be directly in the body
+
+    def generate_create_playlist_request_body(self, name:str, public:Optional[bool]=None, collaborative:Optional[bool]=None, description:Optional[str]=None)->Dict:
+        """Generates the request body for creating a playlist. See create_playlist for the parameters."""
         request_body = {
             "name": name
         }
@@ -481,8 +687,7 @@ class SpotifyClient:
             request_body["collaborative"] = collaborative
         if description is not None:
             request_body["description"] = description
-        return self.send_request(f"https://api.spotify.com/v1/users/{user.id}/playlists", "POST", {
-            "json": request_body}, authorization=user) # The new playlist will be directly in the body
+        return request_body
 
     def add_items_to_playlist(self, user:SpotifyUser, playlist_id:str, uris_to_insert:List[str],position:Optional[int]=None):
         """Allows you to add items to a playlist.
@@ -495,13 +700,18 @@ class SpotifyClient:
 
         :param position: (Optional) The position to insert the tracks on."""
         self.logger.info(f"Adding items to a playlist {playlist_id}...")
+        return self.send_request(f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks", "POST",
+                                 {"json": self.generate_add_items_request_body(uris_to_insert, position)}, authorization=user)
+
+    def generate_add_items_request_body(self, uris_to_insert:List[str], position:Optional[int]=None)->Dict:
+        """Generates the request body for adding items to a playlist. See add_items_to_playlist for the parameters."""
         request_body = {
             "uris": uris_to_insert
         }
         # Add additional parameters
         if position is not None:
             request_body["position"] = position
-        return self.send_request(f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks", "POST", {"json": request_body}, authorization=user)
+        return request_body
 
     def remove_items_from_playlist(self, user:SpotifyUser, playlist_id:str, uris_to_remove:List[str]):
         """Allows you to remove items to a playlist.
@@ -511,8 +721,13 @@ class SpotifyClient:
         :param playlist_id: The playlist ID to add items to.
 
         :param uris_to_insert: Any URIs to remove from the playlist."""
-        self.logger.info(f"Adding items to a playlist {playlist_id}...")
-        request_body = {
+        self.logger.info(f"Removing items from a playlist {playlist_id}...")
+        return self.send_request(f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks", "DELETE",
+                                 {"json": self.generate_remove_items_request_body(uris_to_remove)}, authorization=user)
+
+    def generate_remove_items_request_body(self, uris_to_remove:List[str])->Dict:
+        """Generates the request body for removing items from a playlist. See remove_items_from_playlist for the parameters."""
+        return {
             "tracks": [
                 {
                     "uri": uri_to_remove
@@ -520,7 +735,20 @@ class SpotifyClient:
                 for uri_to_remove in uris_to_remove
             ]
         }
-        return self.send_request(f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks", "DELETE", {"json": request_body}, authorization=user)
+
+    def iterate_album_tracklist(self, credentials:Union[ClientCredentials, SpotifyUser], album_uid:str, market:Optional[str]=None, limit:Optional[int]=None)->Iterator[Dict]:
+        """Iterates over the tracklist of an album. See get_album_tracklist for the parameters."""
+        if isinstance(credentials, ClientCredentials) and market is None:
+            raise ValueError("You have to provide a value for the \"market\" key if you're authenticating without a user credential. Otherwise, Spotify will consider the material as unavailable.")
+        if limit is None:
+            limit = 50 # This is the biggest allowed limit according to the Spotify documentation
+        request_body = {
+            "limit": limit
+        }
+        if market is not None: # Add market to request body if specified
+            request_body["market"] = market
+        return self.iterate_items(f"https://api.spotify.com/v1/albums/{album_uid}/tracks", {"params": request_body},
+                                  authorization=credentials)
 
     def get_album_tracklist(self, credentials:Union[ClientCredentials, SpotifyUser], album_uid:str, market:Optional[str]=None, limit:Optional[int]=None, previous_items:Optional[List[Dict]]=None, next_url:Optional[str]=None):
         """Allows you to get the tracklist for an album.
@@ -532,58 +760,61 @@ class SpotifyClient:
 
         :param market: Set the market that the API should check if the tracks are available in.
 
-        :param limit: Pass a custom limit.
+        :param limit: Pass a custom limit (the number of tracks per request).
 
-        :param previous_items: Used for recursion. Stores the items that previously has been retrieved from the server
-        in earlier requests (when more requests are used).
+        :param previous_items: Optional. Items to return before the retrieved ones.
 
-        :param next_url: Used for recursion. Sets the URL to use for retrieving the next page with items.
+        :param next_url: Optional. The URL of the page to start at.
         """
-        if isinstance(credentials, ClientCredentials) and market is None:
-            raise ValueError("You have to provide a value for the \"market\" key if you're authenticating without a user credential. Otherwise, Spotify will consider the material as unavailable.")
-        # Add defaults
-        if previous_items is None:
-            previous_items = []
-        if limit is None:
-            limit = 50 # This is the biggest allowed limit according to the Spotify documentation
-        request_body = {
-            "limit": 50
-        }
-        if market is not None: # Add market to request body if specified
-            request_body["market"] = market
-        # Use next page URL if specified
+        items = previous_items if previous_items is not None else []
         if next_url is not None:
-            url_to_use = next_url
+            items.extend(self.iterate_items(next_url, {}, authorization=credentials))
         else:
-            url_to_use = f"https://api.spotify.com/v1/albums/{album_uid}/tracks"
-        response = self.send_request(url_to_use, "GET", {"params": request_body}, authorization=credentials)
-        previous_items.extend(response["items"])
-        if response["next"] is not None: # Apply pagination if needed
-            logger.debug(f"Applying pagination for album {album_uid} tracks.")
-            return self.get_album_tracklist(
-                credentials=credentials, album_uid=album_uid, limit=limit,
-                previous_items=previous_items, next_url=next_url
-            )
-        return previous_items
+            items.extend(self.iterate_album_tracklist(credentials, album_uid, market, limit))
+        return items
 
-    def search(self, client_credentials:ClientCredentials, query:str, type:Optional[str]=None, market:Optional[str]=None, limit:Optional[int]=None, previous_items:Optional[List[Dict]]=None, next_url:Optional[str]=None):
-        """Allows you to search for items.
-
-        :param client_credentials: An instance of ClientCredentials to use for authentication.
-
-        :param query: The search query. For example, artist:Test
+    def get_albums(self, credentials:Union[ClientCredentials, SpotifyUser], album_uids:List[str], market:Optional[str]=None)->List[Optional[Dict]]:
+        """Gets several albums, including their tracklists. Albums are requested 20 at a time (the maximum that Spotify allows),
+        so any number of album UIDs can be passed.
 
-        :param type: Narrow down results by applying type filters such as "album" which will only return albums.
-
-        :param market: Filter by market.
+        :param credentials: An instance of ClientCredentials or SpotifyUser to use for authentication. Note: If you do not provide a user,
+        you have to provide a value for the market kwarg! Otherwise the material will be returned as unavailable.
 
-        :param limit: Pass a custom limit.
+        :param album_uids: The album UIDs.
 
-        :param previous_items: Used for recursion. Stores the items that previously has been retrieved from the server
-        in earlier requests (when more requests are used).
+        :param market: Set the market that the API should check if the tracks are available in.
 
-        :param next_url: Used for recursion. Sets the URL to use for retrieving the next page with items.
+        :returns The albums, in the same order as album_uids. Albums that were not found are None.
+        The whole tracklist of each album is in album["tracks"]["items"].
         """
+        if isinstance(credentials, ClientCredentials) and market is None:
+            raise ValueError("You have to provide a value for the \"market\" key if you're authenticating without a user credential. Otherwise, Spotify will consider the material as unavailable.")
+        albums = []
+        for chunk_start in range(0, len(album_uids), MAX_ALBUMS_PER_REQUEST):
+            request_body = {
+                "ids": ",".join(album_uids[chunk_start:chunk_start + MAX_ALBUMS_PER_REQUEST])
+            }
+            if market is not None: # Add market to request body if specified
+                request_body["market"] = market
+            self.logger.info(f"Getting albums {chunk_start + 1}-{chunk_start + len(request_body['ids'].split(','))} of {len(album_uids)}...")
+            response = self.send_request("https://api.spotify.com/v1/albums", "GET", {"params": request_body}, authorization=credentials)
+            albums.extend(response["albums"])
+        # Albums only include the first page of their tracks. Get the rest for albums with many tracks
+        for album in albums:
+            if album is None:
+                continue
+            if album["tracks"]["next"] is not None:
+                logger.debug(f"Applying pagination for album {album['id']} tracks.")
+                album["tracks"]["items"].extend(self.iterate_items(album["tracks"]["next"], {}, authorization=credentials))
+                album["tracks"]["next"] = None
+        return albums
+
+    def iterate_search(self, client_credentials:ClientCredentials, query:str, type:Optional[str]=None, market:Optional[str]=None, limit:Optional[int]=None)->Iterator[Dict]:
+        """Iterates over search results. Pages of results are only requested when they are needed,
+        so use this to get a certain number of results (for example using itertools.islice).
+        See search for the parameters.
+
+        :param limit: Pass a custom limit (the number of results per request)."""
         self.logger.info("Searching Spotify...")
         request_body = {
             "q": query
@@ -595,25 +826,42 @@ class SpotifyClient:
             request_body["market"] = market
         if limit is not None:
             request_body["limit"] = limit
-        # Use next page URL if specified
+        response = self.send_request("https://api.spotify.com/v1/search", "GET", {"params": request_body}, authorization=client_credentials)
+        # The response will contain keys like this: {"albums": ..., "playlists": ...}. Each of them is paginated
+        for result_type, result_type_data in response.items():
+            yield from result_type_data["items"]
+            if result_type_data.get("next") is not None:
+                self.logger.info("Applying pagination for a search...")
+                for page in self.iterate_pages(result_type_data["next"], {}, authorization=client_credentials):
+                    yield from page[result_type]["items"]
+
+    def search(self, client_credentials:ClientCredentials, query:str, type:Optional[str]=None, market:Optional[str]=None, limit:Optional[int]=None, previous_items:Optional[List[Dict]]=None, next_url:Optional[str]=None, max_results:Optional[int]=None):
+        """Allows you to search for items.
+
+        :param client_credentials: An instance of ClientCredentials to use for authentication.
+
+        :param query: The search query. For example, artist:Test
+
+        :param type: Narrow down results by applying type filters such as "album" which will only return albums.
+
+        :param market: Filter by market.
+
+        :param limit: Pass a custom limit (the number of results per request).
+
+        :param previous_items: Optional. Results to return before the retrieved ones.
+
+        :param next_url: Optional. The URL of the page of results to start at.
+
+        :param max_results: Optional. The maximum number of results to return. Pages of results after that are not
+        requested. By default, all results are returned.
+        """
+        results = previous_items if previous_items is not None else []
         if next_url is not None:
-            url_to_use = next_url
-        else:
-            url_to_use = f"https://api.spotify.com/v1/search"
-        response = self.send_request(url_to_use, "GET", {"params": request_body}, authorization=client_credentials)
-        # Handle pagination
-        if previous_items is None:
-            results = []
+            for page in self.iterate_pages(next_url, {}, authorization=client_credentials):
+                for result_type_data in page.values():
+                    results.extend(result_type_data["items"])
         else:
-            results = previous_items
-        # The response will contain keys like this: {"albums": ..., "playlists": ...}. Handle them
-        for result_type, result_type_data in response.items():
-            results.extend(result_type_data["items"])
-        if "next" in response and response["next"] is not None:
-            self.logger.info("Applying pagination for a search...")
-            return self.search(
-                client_credentials=client_credentials, query=query, type=type, market=market, limit=limit, previous_items=results, next_url=response["next"]
-            )
+            results.extend(itertools.islice(self.iterate_search(client_credentials, query, type, market, limit), max_results))
         if len(results) == 0:
             raise SpotifyDataNotFound(f"No results were found for search \"{query}\".")
-        return results
\ No newline at end of file
+        return results
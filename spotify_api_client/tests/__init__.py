@@ -0,0 +1,2 @@
+"""Tests for the Spotify API client. Run them with python -m unittest discover -s tests -t . (from the directory of this package).
+Requests are sent to stubs, so no Spotify app or network access is needed."""
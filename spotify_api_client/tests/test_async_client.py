@@ -0,0 +1,59 @@
+"""test_async_client.py
+Tests how the asyncio client refreshes access tokens."""
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from spotify_api_client import client
+from spotify_api_client.async_client import AsyncSpotifyClient
+from spotify_api_client.client import ClientCredentials, SpotifyUser
+
+TOKEN_RESPONSE = {"token_type": "Bearer", "access_token": "new access token", "expires_in": 3600}
+
+
+class TokenRefreshTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.client = AsyncSpotifyClient("client ID", "client secret", "user agent")
+        self.send_request = patch.object(self.client, "send_unauthorized_request",
+                                         AsyncMock(return_value=TOKEN_RESPONSE)).start()
+        # (nothing should be sent synchronously)
+        self.send_synchronous_request = patch.object(client, "send_request").start()
+        self.addCleanup(patch.stopall)
+
+    def create_user(self, **kwargs) -> SpotifyUser:
+        """Creates a user with an expired access token."""
+        return SpotifyUser("old access token", -1, "refresh token", self.client.client_id, self.client.authorization_header,
+                           self.client.user_agent, retrieve_user_information=False, **kwargs)
+
+    async def test_concurrent_refreshes(self):
+        on_token_refresh_async = AsyncMock()
+        user = self.create_user(on_token_refresh_async=on_token_refresh_async)
+        access_tokens = await asyncio.gather(*[self.client.get_access_token(user) for _ in range(3)])
+        self.assertEqual(access_tokens, ["new access token"] * 3)
+        self.send_request.assert_awaited_once()
+        self.assertEqual(self.send_request.call_args.args[2]["data"]["grant_type"], "refresh_token")
+        on_token_refresh_async.assert_awaited_once_with(user)
+        self.send_synchronous_request.assert_not_called()
+
+    async def test_synchronous_callback(self):
+        on_token_refresh = MagicMock()
+        user = self.create_user(on_token_refresh=on_token_refresh)
+        self.assertEqual(await self.client.get_access_token(user), "new access token")
+        on_token_refresh.assert_called_once_with(user)
+
+    async def test_client_credentials(self):
+        credentials = ClientCredentials(self.client.authorization_header, self.client.user_agent)
+        self.assertEqual(await self.client.get_access_token(credentials), "new access token")
+        self.assertEqual(self.send_request.call_args.args[2]["data"]["grant_type"], "client_credentials")
+        self.send_synchronous_request.assert_not_called()
+
+    async def test_create_user(self):
+        self.send_request.return_value = {"display_name": "User", "id": "user"}
+        user = await self.client.create_user("access token", 3600, "refresh token")
+        self.assertEqual((user.username, user.id), ("User", "user"))
+        self.assertEqual(self.send_request.call_args.args[:2], ("https://api.spotify.com/v1/me", "GET"))
+        self.send_synchronous_request.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+"""test_client.py
+Tests how the client paginates and retries requests."""
+import datetime
+import unittest
+from typing import Dict, List, Optional
+from unittest.mock import patch
+
+import requests
+
+from spotify_api_client import client
+from spotify_api_client.client import ClientCredentials, SpotifyAPIException, SpotifyClient
+
+ALBUM_TRACKS_URL = "https://api.spotify.com/v1/albums/album/tracks"
+
+
+class StubResponse:
+    """Stands in for a requests.Response."""
+
+    def __init__(self, response_json: Optional[Dict], status_code: int = 200, headers: Optional[Dict] = None):
+        self.response_json = response_json
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.headers = headers if headers is not None else {}
+        self.text = str(response_json)
+
+    def json(self) -> Dict:
+        if self.response_json is None:
+            raise ValueError("The response is not JSON.")
+        return self.response_json
+
+
+def generate_track_page(track_names: List[str], next_url: Optional[str]) -> Dict:
+    """Generates a page of the tracks of an album."""
+    return {"items": [{"name": track_name} for track_name in track_names], "next": next_url}
+
+
+class ClientTests(unittest.TestCase):
+    def setUp(self):
+        self.client = SpotifyClient("client ID", "client secret", "user agent")
+        # (credentials that do not need to be refreshed)
+        self.credentials = ClientCredentials(self.client.authorization_header, "user agent")
+        self.credentials.access_token = "access token"
+        self.credentials.expires_datetime = datetime.datetime.now() + datetime.timedelta(hours=1)
+        self.sleep = patch.object(client.time, "sleep").start()
+        self.addCleanup(patch.stopall)
+
+    def patch_request(self, **kwargs):
+        return patch.object(client.session, "request", **kwargs)
+
+    def test_album_tracklist_pagination(self):
+        pages = {
+            ALBUM_TRACKS_URL: generate_track_page(["1", "2"], f"{ALBUM_TRACKS_URL}?offset=2&limit=2"),
+            f"{ALBUM_TRACKS_URL}?offset=2&limit=2": generate_track_page(["3", "4"], f"{ALBUM_TRACKS_URL}?offset=4&limit=2"),
+            f"{ALBUM_TRACKS_URL}?offset=4&limit=2": generate_track_page(["5"], None),
+        }
+        with self.patch_request(side_effect=lambda **request_kwargs: StubResponse(pages[request_kwargs["url"]])) as request:
+            tracks = self.client.get_album_tracklist(self.credentials, "album", market="SE", limit=2)
+        self.assertEqual([track["name"] for track in tracks], ["1", "2", "3", "4", "5"])
+        self.assertEqual([call.kwargs["url"] for call in request.call_args_list], list(pages))
+        # Only the first page is requested with parameters, the next URLs already include them
+        self.assertEqual(request.call_args_list[0].kwargs["params"], {"limit": 2, "market": "SE"})
+        self.assertNotIn("params", request.call_args_list[1].kwargs)
+
+    def test_rate_limit(self):
+        with self.patch_request(side_effect=[
+            StubResponse({}, status_code=429, headers={"Retry-After": "2"}),
+            StubResponse(generate_track_page(["1"], None)),
+        ]) as request:
+            tracks = self.client.get_album_tracklist(self.credentials, "album", market="SE")
+        self.assertEqual([track["name"] for track in tracks], ["1"])
+        self.assertEqual(request.call_count, 2)
+        self.sleep.assert_called_once()
+        self.assertGreaterEqual(self.sleep.call_args.args[0], 2)
+
+    def test_long_rate_limit(self):
+        with self.patch_request(return_value=StubResponse(
+                {}, status_code=429, headers={"Retry-After": str(client.MAX_RETRY_AFTER + 1)})) as request:
+            with self.assertRaises(SpotifyAPIException):
+                self.client.get_album_tracklist(self.credentials, "album", market="SE")
+        self.assertEqual(request.call_count, 1)
+        self.sleep.assert_not_called()
+
+    def test_server_errors(self):
+        with self.patch_request(return_value=StubResponse({}, status_code=503)) as request:
+            with self.assertRaises(SpotifyAPIException):
+                self.client.get_album_tracklist(self.credentials, "album", market="SE")
+        self.assertEqual(request.call_count, client.MAX_RETRIES + 1)
+        self.assertEqual(self.sleep.call_count, client.MAX_RETRIES)
+
+    def test_server_errors_are_not_retried_for_post_requests(self):
+        with self.patch_request(return_value=StubResponse({}, status_code=503)) as request:
+            with self.assertRaises(SpotifyAPIException):
+                self.client.send_request("https://api.spotify.com/v1/users/user/playlists", "POST", {},
+                                         authorization=self.credentials)
+        self.assertEqual(request.call_count, 1)
+        self.sleep.assert_not_called()
+
+    def test_connection_errors(self):
+        with self.patch_request(side_effect=[
+            requests.ConnectionError("Connection reset"),
+            StubResponse(generate_track_page(["1"], None)),
+        ]) as request:
+            tracks = self.client.get_album_tracklist(self.credentials, "album", market="SE")
+        self.assertEqual([track["name"] for track in tracks], ["1"])
+        self.assertEqual(request.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
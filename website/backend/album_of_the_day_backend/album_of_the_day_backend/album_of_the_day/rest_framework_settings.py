@@ -1,9 +1,11 @@
 """rest_framework_settings.py
 Some overrides related to rest-framework."""
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 import os
 
 PAGE_SIZE = int(os.environ.get("API_PAGE_SIZE", 31))
+PAGE_SIZE_QUERY_PARAM = os.environ.get("API_PAGE_QUERY_PARAM", "limit")
+MAX_PAGE_SIZE = int(os.environ.get("API_MAX_PAGE_SIZE", 31))
 
 
 class PaginationSettings(PageNumberPagination):
@@ -11,5 +13,61 @@ class PaginationSettings(PageNumberPagination):
     we have to specify a custom class."""
 
     page_size = PAGE_SIZE
-    page_size_query_param = os.environ.get("API_PAGE_QUERY_PARAM", "limit")
-    max_page_size = int(os.environ.get("API_MAX_PAGE_SIZE", 31))
+    page_size_query_param = PAGE_SIZE_QUERY_PARAM
+    max_page_size = MAX_PAGE_SIZE
+
+
+class KeysetPagination(CursorPagination):
+    """Keyset pagination: pages are retrieved by filtering on the last entry of the previous page
+    (for example WHERE date < ...) instead of using OFFSET, and the entries are not counted.
+    This means that every page takes the same time to retrieve, no matter how deep it is.
+    The ordering is set by the view's keyset_ordering attribute, for example ("-date", "-id").
+    """
+
+    page_size = PAGE_SIZE
+    page_size_query_param = PAGE_SIZE_QUERY_PARAM
+    max_page_size = MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        # The ordering can not be changed using the ordering URL parameter, since
+        # the pagination depends on the ordering being indexed.
+        return view.keyset_ordering
+
+
+class OptionalKeysetPaginationSettings(PaginationSettings):
+    """Uses page numbers by default, like PaginationSettings. If the cursor URL parameter is passed
+    (leave it empty to get the first page), KeysetPagination is used instead. The "next" and "previous"
+    links of the response then contain cursors, and there is no "count"."""
+
+    keyset_pagination_class = KeysetPagination
+
+    def __init__(self):
+        self.keyset_pagination = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.keyset_pagination_class.cursor_query_param in request.query_params:
+            self.keyset_pagination = self.keyset_pagination_class()
+            page = self.keyset_pagination.paginate_queryset(queryset, request, view)
+            self.display_page_controls = self.keyset_pagination.display_page_controls
+            return page
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset_pagination is not None:
+            return self.keyset_pagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.keyset_pagination is not None:
+            return self.keyset_pagination.to_html()
+        return super().to_html()
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameter_names = [parameter["name"] for parameter in parameters]
+        for parameter in self.keyset_pagination_class().get_schema_operation_parameters(
+            view
+        ):
+            if parameter["name"] not in parameter_names:
+                parameters.append(parameter)
+        return parameters
@@ -147,6 +147,39 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Note: the default cache is local to each process. Set CACHE_BACKEND to a shared cache (for example
+# django.core.cache.backends.redis.RedisCache) if the website runs in multiple processes.
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "album-of-the-day"),
+    },
+    # Serialized API responses (see website/caching.py). Uses the default cache unless configured otherwise.
+    "responses": {
+        "BACKEND": os.environ.get(
+            "RESPONSE_CACHE_BACKEND",
+            os.environ.get(
+                "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+            ),
+        ),
+        "LOCATION": os.environ.get(
+            "RESPONSE_CACHE_LOCATION",
+            os.environ.get("CACHE_LOCATION", "album-of-the-day"),
+        ),
+        "KEY_PREFIX": "responses",
+        "TIMEOUT": int(os.environ.get("RESPONSE_CACHE_TIMEOUT", 24 * 60 * 60)),
+    },
+}
+# Cache for Last.FM responses such as album and genre information (see website/models.py). The SQLite file is
+# shared by all processes that use it, like the website, the tasks and the Discord bot. An empty value disables it.
+LAST_FM_CACHE_PATH = os.environ.get(
+    "LAST_FM_CACHE_PATH", f"{BASE_DIR}/last_fm_cache.sqlite3"
+)
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
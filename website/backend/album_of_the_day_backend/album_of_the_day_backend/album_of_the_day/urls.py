@@ -72,4 +72,5 @@ urlpatterns = [
     path("spotify/callback", spotify_callback_view),
     path("spotify/toggle", ToggleAlbumStatusInSpotifyView.as_view()),
     path("spotify/album/status", GetAlbumAddedToSpotifyView.as_view()),
+    path("spotify/albums/status", GetAlbumsAddedToSpotifyView.as_view()),
 ]
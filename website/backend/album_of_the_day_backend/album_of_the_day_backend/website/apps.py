@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class WebsiteConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "website"
+
+    def ready(self):
+        # Connect the signals that invalidate cached statistics, update search documents,
+        # update the versions used for conditional requests and queue background jobs
+        from . import caching, jobs, search, statistics
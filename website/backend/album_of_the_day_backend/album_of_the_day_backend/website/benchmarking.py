@@ -0,0 +1,229 @@
+"""benchmarking.py
+Utilities for measuring how the API performs. Can seed the database with a synthetic catalogue
+(albums, artists, genres, albums of the day, daily rotations and lists), measure how many SQL queries
+and how much time a request takes and show the query plans of frequently run queries.
+Used by the performance regression tests in tests.py and the explain_hot_queries command."""
+import datetime
+import random
+import time
+import logging
+from typing import Callable, Dict, List, Optional
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from .models import (
+    Album,
+    AlbumList,
+    AlbumListItem,
+    AlbumOfTheDay,
+    Artist,
+    DailyRotation,
+    Genre,
+    SavedSpotifyUser,
+    update_genre_album_counts,
+)
+from .search import rebuild_search_documents
+
+logger = logging.getLogger(__name__)
+
+# The default size of the synthetic catalogue.
+SYNTHETIC_CATALOGUE_SIZE = {
+    "artists": 1500,
+    "genres": 200,
+    "albums": 3000,
+    "album_of_the_days": 1000,
+    "daily_rotations": 700,
+    "lists": 40,
+    "list_items": 25,  # (per list)
+}
+# Where the synthetic catalogue starts in time.
+SYNTHETIC_CATALOGUE_START_DATE = datetime.date(2021, 1, 1)
+
+
+def seed_synthetic_catalogue(
+    size: Optional[Dict[str, int]] = None, seed: Optional[int] = None
+) -> Dict[str, List[int]]:
+    """Fills the database with a synthetic catalogue. Everything is created using bulk inserts,
+    which means that no model signals (such as retrieving album covers) are sent. Genre album counts
+    and search documents are generated afterwards.
+
+    :param size: Optional overrides for the number of entries to create. See SYNTHETIC_CATALOGUE_SIZE.
+
+    :param seed: Optional seed for the random generator, so that the catalogue is the same between runs.
+
+    :returns A mapping: name of model --> the IDs of the entries that were created."""
+    size = {**SYNTHETIC_CATALOGUE_SIZE, **(size if size is not None else {})}
+    generator = random.Random(seed if seed is not None else 0)
+    logger.info(f"Seeding synthetic catalogue with size {size}...")
+    artists = Artist.objects.bulk_create(
+        [Artist(name=f"Artist {i}") for i in range(size["artists"])]
+    )
+    genres = Genre.objects.bulk_create(
+        [Genre(name=f"genre {i}") for i in range(size["genres"])]
+    )
+    albums = Album.objects.bulk_create(
+        [Album(name=f"Album {i}") for i in range(size["albums"])]
+    )
+    # Link albums to one or two artists and a few genres
+    Album.artists.through.objects.bulk_create(
+        [
+            Album.artists.through(album_id=album.id, artist_id=artist.id)
+            for album in albums
+            for artist in generator.sample(artists, generator.randint(1, 2))
+        ]
+    )
+    Album.genres.through.objects.bulk_create(
+        [
+            Album.genres.through(album_id=album.id, genre_id=genre.id)
+            for album in albums
+            for genre in generator.sample(genres, generator.randint(1, 4))
+        ]
+    )
+    # Bulk inserts do not send any signals, so the album counts of genres have to be updated manually
+    update_genre_album_counts()
+    album_of_the_days = AlbumOfTheDay.objects.bulk_create(
+        [
+            AlbumOfTheDay(
+                album=generator.choice(albums),
+                date=SYNTHETIC_CATALOGUE_START_DATE + datetime.timedelta(days=i),
+                comments=f"Comments about album of the day {i}.",
+                comments_source="plain_text",
+            )
+            for i in range(size["album_of_the_days"])
+        ]
+    )
+    daily_rotations = DailyRotation.objects.bulk_create(
+        [
+            DailyRotation(
+                day=SYNTHETIC_CATALOGUE_START_DATE + datetime.timedelta(days=i),
+                description=f"Daily rotation {i}.",
+            )
+            for i in range(size["daily_rotations"])
+        ]
+    )
+    DailyRotation.albums.through.objects.bulk_create(
+        [
+            DailyRotation.albums.through(
+                dailyrotation_id=rotation.id, album_id=album.id
+            )
+            for rotation in daily_rotations
+            for album in generator.sample(albums, generator.randint(1, 6))
+        ]
+    )
+    DailyRotation.genres.through.objects.bulk_create(
+        [
+            DailyRotation.genres.through(
+                dailyrotation_id=rotation.id, genre_id=genre.id
+            )
+            for rotation in daily_rotations
+            for genre in generator.sample(genres, generator.randint(1, 5))
+        ]
+    )
+    album_lists = AlbumList.objects.bulk_create(
+        [
+            AlbumList(name=f"List {i}", description=f"Description of list {i}.")
+            for i in range(size["lists"])
+        ]
+    )
+    list_items = AlbumListItem.objects.bulk_create(
+        [
+            # Every fifth item is a text item, the rest are albums
+            AlbumListItem(heading=f"Heading {i}", body="Body.", index_in_list=i)
+            if i % 5 == 0
+            else AlbumListItem(
+                album=generator.choice(albums), comments="Comments.", index_in_list=i
+            )
+            for _ in album_lists
+            for i in range(size["list_items"])
+        ]
+    )
+    AlbumList.items.through.objects.bulk_create(
+        [
+            AlbumList.items.through(
+                albumlist_id=album_list.id, albumlistitem_id=list_item.id
+            )
+            for i, album_list in enumerate(album_lists)
+            for list_item in list_items[
+                i * size["list_items"] : (i + 1) * size["list_items"]
+            ]
+        ]
+    )
+    rebuild_search_documents()
+    logger.info("Synthetic catalogue seeded.")
+    return {
+        "artists": [artist.id for artist in artists],
+        "genres": [genre.id for genre in genres],
+        "albums": [album.id for album in albums],
+        "album_of_the_days": [entry.id for entry in album_of_the_days],
+        "daily_rotations": [rotation.id for rotation in daily_rotations],
+        "lists": [album_list.id for album_list in album_lists],
+    }
+
+
+def measure_request(client: Client, method: str, path: str, **request_kwargs) -> Dict:
+    """Sends a request using a Django test client and measures it.
+
+    :param client: The client to send the request with.
+
+    :param method: The HTTP method to use, for example "get".
+
+    :param path: The path to request, including any query string.
+
+    :param request_kwargs: Any additional arguments to pass to the client.
+
+    :returns A dictionary with the response ("response"), its status code ("status_code"),
+    the number of SQL queries that were run ("queries") and the wall time in seconds ("seconds").
+    """
+    with CaptureQueriesContext(connection) as captured_queries:
+        start_time = time.perf_counter()
+        response = getattr(client, method.lower())(path, **request_kwargs)
+        seconds = time.perf_counter() - start_time
+    return {
+        "response": response,
+        "status_code": response.status_code,
+        "queries": len(captured_queries.captured_queries),
+        "seconds": seconds,
+    }
+
+
+# Queries that are run often, by the API, the tasks or the Discord bot. Values are taken from the synthetic catalogue.
+# Mapping: name --> function that returns the queryset
+HOT_QUERIES: Dict[str, Callable[[], QuerySet]] = {
+    "daily_rotation_by_day": lambda: DailyRotation.objects.filter(
+        day=SYNTHETIC_CATALOGUE_START_DATE + datetime.timedelta(days=100)
+    ),
+    "album_of_the_days_in_month": lambda: AlbumOfTheDay.objects.filter(
+        date__gte=datetime.date(2021, 6, 1), date__lte=datetime.date(2021, 6, 30)
+    ).order_by("-date"),
+    "album_by_name": lambda: Album.objects.filter(name="Album 12"),
+    "artist_by_name": lambda: Artist.objects.filter(name="Artist 12"),
+    "genre_by_name": lambda: Genre.objects.filter(name="genre 12"),
+    "saved_spotify_user_by_cookie_token": lambda: SavedSpotifyUser.objects.filter(
+        cookie_token="unknown"
+    ),
+    "list_items_in_order": lambda: AlbumListItem.objects.order_by("index_in_list")[:25],
+}
+
+
+def explain_hot_queries(repeat: int = 10) -> List[Dict]:
+    """Retrieves the query plans of all queries in HOT_QUERIES and measures how long they take.
+
+    :param repeat: How many times to run each query when measuring.
+
+    :returns A list of dictionaries with the name of the query ("name"), its query plan ("plan")
+    and the average time in seconds that it took to run ("seconds")."""
+    results = []
+    for name, generate_queryset in HOT_QUERIES.items():
+        plan = generate_queryset().explain()
+        start_time = time.perf_counter()
+        for _ in range(repeat):
+            list(generate_queryset())
+        results.append(
+            {
+                "name": name,
+                "plan": plan,
+                "seconds": (time.perf_counter() - start_time) / repeat,
+            }
+        )
+    return results
@@ -0,0 +1,226 @@
+"""caching.py
+Keeps track of how many times and when the data of each model has been changed (its "version"), which makes it possible
+to answer conditional requests (If-None-Match and If-Modified-Since) and to cache serialized responses
+with a single SQL query. The versions are stored in the database (see ModelVersion) and updated by signals
+whenever an entry is saved or deleted, so they are the same for all processes and only change when the data changes."""
+import hashlib
+import logging
+import math
+from typing import Dict, Iterable, List, NamedTuple, Type
+from django.core.cache import caches
+from django.db.models import F, Max, Model, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.response import Response
+from .models import (
+    Album,
+    AlbumList,
+    AlbumListItem,
+    AlbumOfTheDay,
+    Artist,
+    DailyRotation,
+    Genre,
+    ModelVersion,
+)
+
+logger = logging.getLogger(__name__)
+
+# The models that the response of each model's views depend on (since related entries are serialized as well).
+ALBUM_DEPENDENCIES = [
+    Album,
+    Artist,
+    Genre,
+    Album.artists.through,
+    Album.genres.through,
+]
+MODEL_DEPENDENCIES: Dict[Type[Model], List[Type[Model]]] = {
+    Artist: [Artist],
+    Genre: [Genre, Album.genres.through],  # (genres include their album count)
+    Album: ALBUM_DEPENDENCIES,
+    AlbumOfTheDay: [AlbumOfTheDay, *ALBUM_DEPENDENCIES],
+    AlbumList: [
+        AlbumList,
+        AlbumListItem,
+        AlbumList.items.through,
+        *ALBUM_DEPENDENCIES,
+    ],
+    DailyRotation: [
+        DailyRotation,
+        DailyRotation.albums.through,
+        DailyRotation.genres.through,
+        *ALBUM_DEPENDENCIES,
+    ],
+}
+# All models that have versions
+VERSIONED_MODELS = list(
+    dict.fromkeys(
+        dependency
+        for dependencies in MODEL_DEPENDENCIES.values()
+        for dependency in dependencies
+    )
+)
+
+
+class DataVersion(NamedTuple):
+    """The version of data that depends on some models."""
+
+    changes: int  # The total number of changes to the models
+    changed_at: float  # When any of the models was last changed, as a UNIX timestamp
+
+
+def get_model_label(model: Type[Model]) -> str:
+    """Returns the label that the version of a model is saved with."""
+    return model._meta.label_lower
+
+
+def get_version(models: Iterable[Type[Model]]) -> DataVersion:
+    """Gets the version of data that depends on some models.
+
+    :param models: The models that the data depends on.
+
+    :returns The version of the data."""
+    model_labels = [get_model_label(model) for model in models]
+    # (models without a saved version have not been changed since versions were introduced)
+    versions = ModelVersion.objects.filter(model__in=model_labels).aggregate(
+        changes=Coalesce(Sum("changes"), 0), changed_at=Max("changed_at")
+    )
+    return DataVersion(
+        changes=versions["changes"],
+        changed_at=versions["changed_at"].timestamp()
+        if versions["changed_at"] is not None
+        else 0.0,
+    )
+
+
+def set_version(model: Type[Model]):
+    """Updates the version of a model after it has been changed."""
+    model_label = get_model_label(model)
+    # (the version is updated in the same transaction as the change, so they are visible at the same time)
+    if (
+        ModelVersion.objects.filter(model=model_label).update(
+            changes=F("changes") + 1, changed_at=timezone.now()
+        )
+        == 0
+    ):
+        _, created = ModelVersion.objects.get_or_create(
+            model=model_label, defaults={"changes": 1, "changed_at": timezone.now()}
+        )
+        if not created:  # (created by another process in the meantime)
+            set_version(model)
+
+
+def update_version(sender, **kwargs):
+    """Updates the version of a model. Used as a receiver for signals that change the model."""
+    # (m2m_changed is sent both before and after changes)
+    if kwargs.get("action", "").startswith("pre_"):
+        return
+    set_version(sender)
+
+
+def update_relationship_versions(sender, **kwargs):
+    """Updates the versions of the relationships (in both directions) of a deleted entry. They are removed
+    without any m2m_changed signal being sent, and for example the album counts of genres change when an album is deleted.
+    """
+    for field in sender._meta.get_fields():
+        if not field.many_to_many:
+            continue
+        # (reverse relationships have the through model directly)
+        through_model = getattr(field, "through", None) or field.remote_field.through
+        if through_model in VERSIONED_MODELS:
+            update_version(through_model)
+
+
+for versioned_model in VERSIONED_MODELS:
+    if versioned_model._meta.auto_created:  # (relationships between models)
+        m2m_changed.connect(update_version, sender=versioned_model)
+    else:
+        post_save.connect(update_version, sender=versioned_model)
+        post_delete.connect(update_version, sender=versioned_model)
+        post_delete.connect(update_relationship_versions, sender=versioned_model)
+
+
+class ConditionalResponseMixin:
+    """A mixin for views that answers conditional GET requests (If-None-Match and If-Modified-Since) with
+    304 Not Modified if the data has not changed, before anything is retrieved or serialized.
+    Responses include an ETag and a Last-Modified header, which only change when the data changes (see get_version),
+    so clients can revalidate responses however old they are. The data that the response depends on is set
+    using version_models, which defaults to the dependencies of the view's model (see MODEL_DEPENDENCIES).
+    """
+
+    version_models: List[Type[Model]] = None
+
+    def get_version_models(self) -> List[Type[Model]]:
+        if self.version_models is not None:
+            return self.version_models
+        return MODEL_DEPENDENCIES[self.queryset.model]
+
+    def get_etag(self, request, version: DataVersion) -> str:
+        """Generates an ETag for a version of the response. Responses differ by URL (including the host and the query string,
+        since pagination links are absolute), by which format they are in and by whether the user is logged in or not
+        (the browsable API shows forms to edit data).
+        """
+        response_key = "\n".join(
+            [
+                request.build_absolute_uri(),
+                request.headers.get("Accept", ""),
+                str(request.user.is_authenticated),
+                repr(version),
+            ]
+        )
+        return f'"{hashlib.md5(response_key.encode("UTF-8")).hexdigest()}"'
+
+    def get_response(self, request, version: DataVersion, *args, **kwargs):
+        """Creates the response if the data has been modified."""
+        return super().get(request, *args, **kwargs)
+
+    def get(self, request, *args, **kwargs):
+        version = get_version(self.get_version_models())
+        etag = self.get_etag(request, version)
+        last_modified = math.ceil(version.changed_at)
+        not_modified_response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if not_modified_response is not None:
+            logger.debug(
+                f"Data has not been modified, responding with {not_modified_response.status_code}."
+            )
+            response = not_modified_response
+        else:
+            response = self.get_response(request, version, *args, **kwargs)
+        if response.status_code in [200, 304]:
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+            # Allow browsers and CDNs to store the response, but always revalidate it
+            patch_cache_control(response, no_cache=True)
+        return response
+
+
+class CachedResponseMixin(ConditionalResponseMixin):
+    """A mixin for views that also caches the serialized data of JSON responses to anonymous users,
+    using the "responses" cache (see settings.py). Responses are cached per URL (including the host and the query string,
+    so every page is cached separately) and per version of the data, so a change to any model that the
+    response depends on makes the views stop using the cached data."""
+
+    def get_response_cache_key(self, request, version: DataVersion) -> str:
+        # (the host is included since pagination links are absolute)
+        response_key = "\n".join([request.build_absolute_uri(), repr(version)])
+        return f"response_{hashlib.md5(response_key.encode('UTF-8')).hexdigest()}"
+
+    def get_response(self, request, version: DataVersion, *args, **kwargs):
+        # Only cache responses to anonymous users. The browsable API is not cached since it
+        # shows more than the data, for example page controls.
+        if request.user.is_authenticated or request.accepted_renderer.format != "json":
+            return super().get_response(request, version, *args, **kwargs)
+        response_cache = caches["responses"]
+        cache_key = self.get_response_cache_key(request, version)
+        data = response_cache.get(cache_key)
+        if data is not None:
+            logger.debug("Responding with cached data.")
+            return Response(data)
+        response = super().get_response(request, version, *args, **kwargs)
+        if response.status_code == 200:
+            response_cache.set(cache_key, response.data)
+        return response
@@ -0,0 +1,146 @@
+"""jobs.py
+Runs work that should not block a request, like retrieving the cover and the Spotify UID of new albums,
+in a bounded pool of background threads. Jobs are stored in the database (see BackgroundJob in models.py)
+so that they survive restarts, and only one job of each kind can be queued per album."""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional
+from django.db import connections, transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+from .models import (
+    Album,
+    BackgroundJob,
+    retrieve_and_update_cover_url_for_instance,
+    retrieve_and_update_spotify_uid_for_instance,
+)
+
+logger = logging.getLogger(__name__)
+
+# Mapping: job name --> function that runs the job for an album
+JOB_FUNCTIONS: Dict[str, Callable[[Album], None]] = {
+    "retrieve_cover_url": retrieve_and_update_cover_url_for_instance,
+    "retrieve_spotify_uid": retrieve_and_update_spotify_uid_for_instance,
+}
+# Mapping: job name --> field of the album that the job fills out. Jobs are only queued for albums where it is empty.
+JOB_FIELDS: Dict[str, str] = {
+    "retrieve_cover_url": "cover_url",
+    "retrieve_spotify_uid": "spotify_uid",
+}
+# The maximum number of jobs to run at the same time.
+BACKGROUND_JOB_WORKERS = int(os.environ.get("BACKGROUND_JOB_WORKERS", 2))
+# (created when the first job is submitted)
+executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Returns the pool of threads that runs jobs."""
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=BACKGROUND_JOB_WORKERS, thread_name_prefix="background_job"
+        )
+    return executor
+
+
+def run_job(job_id: int) -> None:
+    """Runs a queued job. Does nothing if the job is not queued anymore, for example if
+    another worker has started it.
+
+    :param job_id: The ID of the job to run."""
+    try:
+        # Claim the job, so that it only runs once
+        if (
+            BackgroundJob.objects.filter(
+                pk=job_id, status=BackgroundJob.Status.QUEUED
+            ).update(status=BackgroundJob.Status.RUNNING, attempts=F("attempts") + 1)
+            == 0
+        ):
+            logger.info(f"Skipping job {job_id}: it is not queued anymore.")
+            return
+        job = BackgroundJob.objects.select_related("album").get(pk=job_id)
+        logger.info(f"Running {job}...")
+        try:
+            JOB_FUNCTIONS[job.name](job.album)
+        except Exception as e:
+            logger.warning(f"{job} failed: {e}", exc_info=True)
+            BackgroundJob.objects.filter(pk=job_id).update(
+                status=BackgroundJob.Status.FAILED, error=str(e)
+            )
+        else:
+            job.delete()
+            logger.info(f"Job {job_id} finished.")
+    except Exception as e:
+        logger.critical(f"Failed to run job {job_id}: {e}", exc_info=True)
+
+
+def run_job_in_thread(job_id: int) -> None:
+    """Runs a job in one of the threads of the pool.
+
+    :param job_id: The ID of the job to run."""
+    try:
+        run_job(job_id)
+    finally:
+        # Each thread has its own database connections, which are not closed automatically
+        connections.close_all()
+
+
+def submit_job(job_id: int) -> None:
+    """Submits a job to the pool of threads once the current transaction (if any) has been committed,
+    so that the job can see the data that it was queued for."""
+    transaction.on_commit(lambda: get_executor().submit(run_job_in_thread, job_id))
+
+
+def queue_jobs(albums: Iterable[Album]) -> int:
+    """Queues the jobs for albums that are missing the data that the jobs retrieve.
+    Jobs that have failed before are queued again.
+
+    :param albums: The albums to queue jobs for.
+
+    :returns The number of jobs that were queued."""
+    queued_jobs = 0
+    for album in albums:
+        for job_name, field in JOB_FIELDS.items():
+            if getattr(album, field) is not None:
+                continue
+            job, created = BackgroundJob.objects.get_or_create(
+                name=job_name, album=album
+            )
+            if not created:
+                if job.status != BackgroundJob.Status.FAILED:
+                    logger.debug(f"Not queueing {job}: it is already queued.")
+                    continue
+                job.status = BackgroundJob.Status.QUEUED
+                job.save()
+            logger.info(f"Queued {job}.")
+            submit_job(job.pk)
+            queued_jobs += 1
+    return queued_jobs
+
+
+def requeue_interrupted_jobs() -> int:
+    """Queues jobs that were running when the website was stopped again, so that they can be run by
+    the run_background_jobs command. Jobs that are running in another process are queued again as well,
+    so this should only be called when no other process is running jobs (for example before the website is started).
+
+    :returns The number of jobs that were queued again."""
+    requeued_jobs = BackgroundJob.objects.filter(
+        status=BackgroundJob.Status.RUNNING
+    ).update(status=BackgroundJob.Status.QUEUED)
+    logger.info(f"Queued {requeued_jobs} interrupted job(s) again.")
+    return requeued_jobs
+
+
+@receiver(m2m_changed, sender=Album.artists.through)
+def queue_jobs_on_artists_added(sender, instance, action, reverse, pk_set, **kwargs):
+    """Queues jobs for new albums once they have artists, since the jobs use the artist
+    names to look up the albums. Artists are added after the album has been saved."""
+    if action != "post_add":
+        return
+    if reverse:  # (albums were added to an artist)
+        albums = Album.objects.filter(pk__in=pk_set)
+    else:
+        albums = [instance]
+    queue_jobs(albums)
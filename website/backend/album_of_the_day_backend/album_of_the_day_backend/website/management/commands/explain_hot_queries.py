@@ -0,0 +1,27 @@
+"""explain_hot_queries.py
+Shows the query plans of frequently run queries (see HOT_QUERIES in benchmarking.py) and how long they take.
+Useful to check that the queries use indexes. Run it on a database that contains data, since the query planner
+might not use indexes for small tables."""
+from django.core.management.base import BaseCommand
+from website.benchmarking import explain_hot_queries
+
+
+class Command(BaseCommand):
+    help = "Shows the query plans of frequently run queries and how long they take."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=10,
+            help="How many times to run each query when measuring.",
+        )
+
+    def handle(self, *args, **options):
+        for result in explain_hot_queries(options["repeat"]):
+            self.stdout.write(
+                self.style.MIGRATE_HEADING(
+                    f"{result['name']} ({result['seconds'] * 1000:.3f} ms)"
+                )
+            )
+            self.stdout.write(result["plan"])
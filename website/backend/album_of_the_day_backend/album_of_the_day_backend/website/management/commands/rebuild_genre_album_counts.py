@@ -0,0 +1,16 @@
+"""rebuild_genre_album_counts.py
+Recounts the number of albums in every genre (Genre.album_count). The counts are kept up to date
+automatically when albums are changed, but have to be rebuilt after changes that do not send any signals,
+such as bulk inserts, raw SQL or database restores."""
+from django.core.management.base import BaseCommand
+from website.models import update_genre_album_counts
+
+
+class Command(BaseCommand):
+    help = "Recounts the number of albums in every genre."
+
+    def handle(self, *args, **options):
+        updated_genres = update_genre_album_counts()
+        self.stdout.write(
+            self.style.SUCCESS(f"Updated the album count of {updated_genres} genre(s).")
+        )
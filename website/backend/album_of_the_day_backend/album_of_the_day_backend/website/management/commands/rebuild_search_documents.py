@@ -0,0 +1,16 @@
+"""rebuild_search_documents.py
+Generates the search documents (see search.py) of all albums, albums of the day, lists and daily rotations.
+The documents are kept up to date automatically when entries are changed, but have to be rebuilt after changes
+that do not send any signals, such as bulk inserts, raw SQL or database restores."""
+from django.core.management.base import BaseCommand
+from website.search import rebuild_search_documents
+
+
+class Command(BaseCommand):
+    help = "Generates the search documents of all searchable entries."
+
+    def handle(self, *args, **options):
+        entry_count = rebuild_search_documents()
+        self.stdout.write(
+            self.style.SUCCESS(f"Generated search documents for {entry_count} entries.")
+        )
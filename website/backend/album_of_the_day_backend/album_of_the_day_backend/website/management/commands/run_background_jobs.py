@@ -0,0 +1,47 @@
+"""run_background_jobs.py
+Runs all queued background jobs (see jobs.py) right away, one at a time. Jobs are normally run
+by the website in the background, so this is mostly useful to finish jobs after importing albums
+without the website running, and to finish the jobs that were queued or running when the website
+was stopped (with --resume, before the website is started again)."""
+from django.core.management.base import BaseCommand
+from website.jobs import requeue_interrupted_jobs, run_job
+from website.models import BackgroundJob
+
+
+class Command(BaseCommand):
+    help = "Runs all queued background jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retry-failed",
+            action="store_true",
+            help="Also run jobs that have failed before.",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Also run jobs that were running when the website was stopped. Only use this when the website is not running.",
+        )
+
+    def handle(self, *args, **options):
+        if options["resume"]:
+            requeue_interrupted_jobs()
+        if options["retry_failed"]:
+            BackgroundJob.objects.filter(status=BackgroundJob.Status.FAILED).update(
+                status=BackgroundJob.Status.QUEUED
+            )
+        job_ids = list(
+            BackgroundJob.objects.filter(
+                status=BackgroundJob.Status.QUEUED
+            ).values_list("pk", flat=True)
+        )
+        for job_id in job_ids:
+            run_job(job_id)
+        failed_jobs = BackgroundJob.objects.filter(
+            pk__in=job_ids, status=BackgroundJob.Status.FAILED
+        ).count()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Ran {len(job_ids)} background job(s), {failed_jobs} failed."
+            )
+        )
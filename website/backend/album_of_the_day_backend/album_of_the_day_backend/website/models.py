@@ -1,8 +1,8 @@
+import datetime
 import json
 import random
 import warnings, sys
-import time
-from threading import Thread
+from functools import cached_property
 
 from spotify_api_client.client import (
     SpotifyClient,
@@ -12,13 +12,29 @@ from spotify_api_client.client import (
     SpotifyDataNotFound,
     ClientCredentials,
 )
-from django.db import models
-from django.db.models.signals import post_save
+from django.conf import settings
+from django.db import connections, models
+from django.db.models import Count, OuterRef, Prefetch, QuerySet, Subquery
+from django.db.models.functions import Coalesce, Upper
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+    post_migrate,
+    pre_migrate,
+)
 from django.dispatch import receiver
+from django.utils import timezone
 from rest_framework import serializers
 import logging, os
+from last_fm_api_client.async_client import AsyncClient
+from last_fm_api_client.cache import ResponseCache, SQLiteCacheStore
 from last_fm_api_client.client import Client, LastFMDataNotFound
-from typing import Tuple, Union, Optional
+from last_fm_api_client.models import GetAlbumDetailsResponse
+from last_fm_api_client.rate_limiter import TokenBucket
+from typing import Dict, Iterable, Tuple, Union, Optional, List
 from collections import OrderedDict
 
 # Create logger
@@ -26,6 +42,199 @@ logger = logging.getLogger(__name__)
 
 # Load constants
 SPOTIFY_MARKET = os.environ.get("SPOTIFY_MARKET", "SE")
+# How often to check Last.FM for changes to album covers that have been found
+COVER_CHECK_INTERVAL = datetime.timedelta(
+    days=int(os.environ.get("COVER_CHECK_INTERVAL_DAYS", 30))
+)
+# How long to wait before checking again for a cover that was not found. Doubles every time
+# it is not found (up to COVER_CHECK_INTERVAL).
+COVER_CHECK_RETRY_DELAY = datetime.timedelta(
+    hours=int(os.environ.get("COVER_CHECK_RETRY_DELAY_HOURS", 1))
+)
+# How often to update the track list of albums that have been found on Spotify
+SPOTIFY_CHECK_INTERVAL = datetime.timedelta(
+    days=int(os.environ.get("SPOTIFY_CHECK_INTERVAL_DAYS", 30))
+)
+# How long to wait before searching again for an album that was not found on Spotify (or did not
+# match any search result exactly). Doubles every time in a row (up to SPOTIFY_CHECK_INTERVAL).
+SPOTIFY_CHECK_RETRY_DELAY = datetime.timedelta(
+    hours=int(os.environ.get("SPOTIFY_CHECK_RETRY_DELAY_HOURS", 1))
+)
+# How many search results to compare to an album when looking for it on Spotify
+SPOTIFY_SEARCH_LIMIT = 5
+
+
+# Trigram indexes make it possible to use indexes for searches that match any part of a name (LIKE '%...%'),
+# but are only available on PostgreSQL (using the pg_trgm extension), like the indexes for full-text searches.
+# They are not a part of the models' Meta.indexes, so that the models (and the migrations that are generated from them)
+# are the same for all databases. Instead, they are created after migrating, see create_postgresql_indexes.
+# Mapping: model name --> fields to index
+TRIGRAM_INDEXED_FIELDS = {
+    "Artist": ["name"],
+    "Genre": ["name"],
+    "Album": ["name"],
+    "SearchDocument": ["document"],
+}
+FULL_TEXT_INDEXED_FIELDS = {"SearchDocument": ["document"]}
+
+
+def generate_trigram_indexes(model_name: str, fields: List[str]) -> List[models.Index]:
+    """Generates trigram indexes for case-insensitive searches in text fields (PostgreSQL).
+
+    :param model_name: The name of the model, used to name the indexes.
+
+    :param fields: The fields to index."""
+    from django.contrib.postgres.indexes import GinIndex, OpClass
+
+    return [
+        GinIndex(
+            OpClass(Upper(field), name="gin_trgm_ops"),
+            name=f"{model_name}_{field}_trgm",
+        )
+        for field in fields
+    ]
+
+
+def generate_full_text_indexes(
+    model_name: str, fields: List[str]
+) -> List[models.Index]:
+    """Generates indexes for full-text searches in text fields (PostgreSQL).
+    The searches have to use the same configuration ("simple") for the indexes to be used, see search.py.
+
+    :param model_name: The name of the model, used to name the indexes.
+
+    :param fields: The fields to index."""
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    return [
+        GinIndex(SearchVector(field, config="simple"), name=f"{model_name}_{field}_fts")
+        for field in fields
+    ]
+
+
+def generate_postgresql_indexes() -> Dict[str, List[models.Index]]:
+    """Generates the indexes that are only available on PostgreSQL (see TRIGRAM_INDEXED_FIELDS and FULL_TEXT_INDEXED_FIELDS).
+
+    :returns A mapping: model name --> indexes."""
+    postgresql_indexes = {}
+    for model_name, fields in TRIGRAM_INDEXED_FIELDS.items():
+        postgresql_indexes.setdefault(model_name, []).extend(
+            generate_trigram_indexes(model_name.lower(), fields)
+        )
+    for model_name, fields in FULL_TEXT_INDEXED_FIELDS.items():
+        postgresql_indexes.setdefault(model_name, []).extend(
+            generate_full_text_indexes(model_name.lower(), fields)
+        )
+    return postgresql_indexes
+
+
+def create_postgresql_indexes(apps, schema_editor):
+    """Creates the indexes that are only available on PostgreSQL (see generate_postgresql_indexes), unless they already exist.
+    Does nothing on other databases. Migrations are not tracked in this repository, so this runs automatically after migrating
+    (see create_postgresql_indexes_after_migrating), but it can also be used in a migration:
+    migrations.RunPython(create_postgresql_indexes, remove_postgresql_indexes)"""
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for model_name, indexes in generate_postgresql_indexes().items():
+        model = apps.get_model("website", model_name)
+        with connection.cursor() as cursor:
+            existing_indexes = connection.introspection.get_constraints(
+                cursor, model._meta.db_table
+            )
+        for index in indexes:
+            if index.name not in existing_indexes:
+                logger.info(f"Creating the index {index.name}...")
+                schema_editor.add_index(model, index)
+
+
+def remove_postgresql_indexes(apps, schema_editor):
+    """Removes the indexes that create_postgresql_indexes creates. Does nothing on other databases."""
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return
+    for model_name, indexes in generate_postgresql_indexes().items():
+        model = apps.get_model("website", model_name)
+        with connection.cursor() as cursor:
+            existing_indexes = connection.introspection.get_constraints(
+                cursor, model._meta.db_table
+            )
+        for index in indexes:
+            if index.name in existing_indexes:
+                schema_editor.remove_index(model, index)
+
+
+@receiver(post_migrate)
+def create_postgresql_indexes_after_migrating(sender, using, apps, **kwargs):
+    """Creates the indexes that are only available on PostgreSQL after the models have been migrated."""
+    if sender.name != "website" or connections[using].vendor != "postgresql":
+        return
+    with connections[using].schema_editor() as schema_editor:
+        create_postgresql_indexes(apps, schema_editor)
+
+
+def normalize_spotify_track_uris_in_database(connection) -> int:
+    """Replaces the track URIs of albums that are not a JSON list with an empty list. When spotify_track_uris was
+    a CharField, it could be an empty string, which can not be converted to a JSONField (PostgreSQL, for example,
+    fails to cast it to jsonb). Values that have already been converted are not changed.
+
+    :param connection: The database connection to use.
+
+    :returns The number of albums that were changed."""
+    quote_name = connection.ops.quote_name
+    table = quote_name(Album._meta.db_table)
+    column = quote_name(Album._meta.get_field("spotify_track_uris").column)
+    invalid_album_ids = []
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT {quote_name('id')}, {column} FROM {table}")
+        for album_id, spotify_track_uris in cursor.fetchall():
+            if spotify_track_uris is not None and not isinstance(
+                spotify_track_uris, str
+            ):  # (already converted by the database driver)
+                continue
+            try:
+                valid = isinstance(json.loads(spotify_track_uris), list)
+            except (TypeError, ValueError):
+                valid = False
+            if not valid:
+                invalid_album_ids.append(album_id)
+        # (in batches, since some databases limit the number of values in IN)
+        for i in range(0, len(invalid_album_ids), 500):
+            batch = invalid_album_ids[i : i + 500]
+            cursor.execute(
+                f"UPDATE {table} SET {column} = %s WHERE {quote_name('id')} IN ({', '.join(['%s'] * len(batch))})",
+                ["[]", *batch],
+            )
+    if len(invalid_album_ids) > 0:
+        logger.warning(
+            f"Replaced the track URIs of {len(invalid_album_ids)} album(s) that were not a JSON list with an empty list."
+        )
+    return len(invalid_album_ids)
+
+
+def normalize_spotify_track_uris(apps, schema_editor):
+    """Migration version of normalize_spotify_track_uris_in_database. Migrations are not tracked in this repository,
+    so this runs automatically before migrating (see normalize_spotify_track_uris_before_migrating), but it can also be
+    added to a migration before the AlterField of spotify_track_uris:
+    migrations.RunPython(normalize_spotify_track_uris, migrations.RunPython.noop)"""
+    normalize_spotify_track_uris_in_database(schema_editor.connection)
+
+
+@receiver(pre_migrate)
+def normalize_spotify_track_uris_before_migrating(sender, using, apps, **kwargs):
+    """Normalizes the track URIs of albums (see normalize_spotify_track_uris_in_database) before migrating,
+    as long as spotify_track_uris has not been migrated to a JSONField yet."""
+    if sender.name != "website":
+        return
+    try:
+        field = apps.get_model("website", "Album")._meta.get_field("spotify_track_uris")
+    except LookupError:  # (the database has not been migrated yet)
+        return
+    if not isinstance(field, models.JSONField):
+        normalize_spotify_track_uris_in_database(connections[using])
 
 
 # Define all models
@@ -37,6 +246,7 @@ class Artist(models.Model):
         max_length=256,
         null=False,
         blank=False,
+        db_index=True,
         help_text='The name of the artist, e.g. "Pavement."',
     )
 
@@ -84,6 +294,7 @@ class Genre(models.Model):
         max_length=256,
         null=False,
         blank=False,
+        db_index=True,
         help_text='The name of the genre, e.g. "avant-folk".',
     )
     description = models.CharField(
@@ -107,6 +318,11 @@ class Genre(models.Model):
         help_text="A Tailwind color that can be used to represent the genre in.",
         default=f"gray-{GENRE_TAILWIND_COLOR_NUMBER}",
     )
+    album_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="The number of albums in the genre. Kept up to date automatically when the genres of an album are changed.",
+    )
 
     # On create, generate a Tailwind color for the model.
     def __str__(self):
@@ -130,14 +346,6 @@ def create_tailwind_color_for_genre_on_save(
 
 
 class GenreSerializer(serializers.ModelSerializer):
-    # Add a custom field, "albums", that counts the current number
-    # of albums in the genre
-    album_count = serializers.SerializerMethodField()
-
-    def get_album_count(self, instance):
-        """Custom field that returns the number of albums in the genre."""
-        return Album.objects.filter(genres__in=[instance]).count()
-
     class Meta:
         model = Genre
         fields = "__all__"
@@ -146,11 +354,22 @@ class GenreSerializer(serializers.ModelSerializer):
 class Album(models.Model):
     """An album refers to a published musical album."""
 
+    class SpotifyStatus(models.TextChoices):
+        UNRESOLVED = (
+            "unresolved"  # Has not been looked up since it was added or changed
+        )
+        RESOLVED = "resolved"  # Was found on Spotify
+        NOT_FOUND = "not_found"  # Was not found on Spotify
+        AMBIGUOUS = (
+            "ambiguous"  # No search result matched it exactly. The best guess is used.
+        )
+
     id = models.AutoField(primary_key=True, help_text="An individual ID of the album.")
     name = models.CharField(
         max_length=256,
         null=False,
         blank=False,
+        db_index=True,
         help_text='The name of the album, e.g. "Clarity"',
     )
     artists = models.ManyToManyField(
@@ -183,19 +402,305 @@ class Album(models.Model):
         help_text="""
     A Spotify UID that is associated with the album. Used for the \"\save to Spotify\" feature.""",
     )
-    spotify_track_uris = models.CharField(
-        max_length=5000,
-        default="[]",
+    spotify_track_uris = models.JSONField(
+        default=list,
         blank=True,
         help_text="""A list of Spotify URIs for all tracks on the album. Used for the \"\save to Spotify\" feature.""",
     )
+    cover_checked_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        default=None,
+        help_text="When Last.FM was last checked for a cover for the album.",
+    )
+    cover_check_failures = models.PositiveIntegerField(
+        default=0,
+        help_text="How many times in a row a cover was not found for the album.",
+    )
+    cover_next_check_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        default=None,
+        db_index=True,
+        help_text="When to check Last.FM for a cover for the album next. Empty if the album has not been checked since it was added or changed.",
+    )
+    spotify_status = models.CharField(
+        max_length=16,
+        choices=SpotifyStatus.choices,
+        default=SpotifyStatus.UNRESOLVED,
+        db_index=True,
+        help_text="If the album has been found on Spotify.",
+    )
+    spotify_checked_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        default=None,
+        help_text="When the album was last looked up on Spotify.",
+    )
+    spotify_check_failures = models.PositiveIntegerField(
+        default=0,
+        help_text="How many times in a row the album was not found (or not found exactly) on Spotify.",
+    )
+    spotify_next_check_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        default=None,
+        db_index=True,
+        help_text="When to look up the album on Spotify next. Empty if the album has not been looked up since it was added or changed.",
+    )
 
     def __str__(self):
         return f'Album "{self.name}"'
 
 
-# List of external fields on Album. Used for prefetch queries
-ALBUM_RELATED_FIELDS = ["artists", "genres"]
+def update_genre_album_counts(genre_ids: Optional[Iterable[int]] = None) -> int:
+    """Recounts the number of albums in genres and saves it to Genre.album_count.
+    All genres are updated in one query.
+
+    :param genre_ids: The IDs of the genres to update. If not specified, all genres are updated.
+
+    :returns The number of genres that were updated."""
+    # Counted using a subquery on the album <--> genre table
+    album_counts = (
+        Album.genres.through.objects.filter(genre=OuterRef("pk"))
+        .order_by()
+        .values("genre")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    genres = Genre.objects.all()
+    if genre_ids is not None:
+        genres = genres.filter(pk__in=list(genre_ids))
+    return genres.update(album_count=Coalesce(Subquery(album_counts), 0))
+
+
+@receiver(m2m_changed, sender=Album.genres.through)
+def update_genre_album_counts_on_change(
+    sender, instance, action, reverse, model, pk_set, using, **kwargs
+):
+    """Updates the album count of the affected genres when the genres of an album are changed.
+    Note: for more information on the parameters, please refer to the Django documentation:
+    https://docs.djangoproject.com/en/4.2/ref/signals/#m2m-changed
+    """
+    if reverse:  # Albums were added to or removed from a genre
+        if action in ["post_add", "post_remove", "post_clear"]:
+            update_genre_album_counts([instance.pk])
+        return
+    # Genres were added to or removed from an album. When clearing, pk_set is not provided,
+    # so the genres have to be retrieved before they are removed.
+    if action == "pre_clear":
+        instance._cleared_genre_ids = list(instance.genres.values_list("pk", flat=True))
+    elif action == "post_clear":
+        update_genre_album_counts(getattr(instance, "_cleared_genre_ids", []))
+    elif action in ["post_add", "post_remove"]:
+        update_genre_album_counts(pk_set)
+
+
+@receiver(pre_delete, sender=Album)
+def save_genres_of_album_before_delete(sender, instance, using, **kwargs):
+    """Saves the genres of an album before it is deleted. The album <--> genre relationships are
+    removed without any m2m_changed signal being sent, so the counts are updated in post_delete.
+    """
+    instance._deleted_genre_ids = list(instance.genres.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Album)
+def update_genre_album_counts_on_delete(sender, instance, using, **kwargs):
+    """Updates the album count of the genres that a deleted album was in."""
+    update_genre_album_counts(getattr(instance, "_deleted_genre_ids", []))
+
+
+def generate_album_prefetches(prefix: Optional[str] = None) -> List[Prefetch]:
+    """Generates the prefetches that are needed to serialize albums without running
+    any queries per album.
+
+    :param prefix: Optional prefix to use if the albums are accessed through another model,
+    for example "album__" for AlbumOfTheDay."""
+    if prefix is None:
+        prefix = ""
+    return [
+        Prefetch(f"{prefix}artists"),
+        Prefetch(f"{prefix}genres"),
+    ]
+
+
+# (created when it is first used)
+last_fm_client: Optional[Client] = None
+spotify_client: Optional[SpotifyClient] = None
+spotify_client_credentials: Optional[ClientCredentials] = None
+# Keeps all requests to Last.FM from this process within the limits of the Last.FM API
+last_fm_rate_limiter = TokenBucket()
+# (created when it is first used)
+last_fm_cache: Optional[ResponseCache] = None
+
+
+def get_last_fm_cache() -> Optional[ResponseCache]:
+    """Returns the cache for Last.FM responses that is shared by all Last.FM API clients,
+    or None if the cache is disabled (see LAST_FM_CACHE_PATH in settings.py)."""
+    global last_fm_cache
+    if last_fm_cache is None and settings.LAST_FM_CACHE_PATH:
+        last_fm_cache = ResponseCache(SQLiteCacheStore(settings.LAST_FM_CACHE_PATH))
+    return last_fm_cache
+
+
+def get_last_fm_client() -> Client:
+    """Returns a Last.FM API client that is shared by the whole process, so that connections
+    to Last.FM are reused between requests."""
+    global last_fm_client
+    if last_fm_client is None:
+        last_fm_client = Client(
+            os.environ["LAST_FM_API_KEY"],
+            os.environ["LAST_FM_USER_AGENT"],
+            rate_limiter=last_fm_rate_limiter,
+            cache=get_last_fm_cache(),
+        )
+    return last_fm_client
+
+
+def create_async_last_fm_client() -> AsyncClient:
+    """Creates an asyncio Last.FM API client, which can send many requests at the same time.
+    It shares its rate limiter and cache with the client from get_last_fm_client. Create it inside the
+    event loop that uses it and close it when done."""
+    return AsyncClient(
+        os.environ["LAST_FM_API_KEY"],
+        os.environ["LAST_FM_USER_AGENT"],
+        rate_limiter=last_fm_rate_limiter,
+        cache=get_last_fm_cache(),
+    )
+
+
+def get_first_artist_prefetch() -> Prefetch:
+    """Prefetches the artists of albums in the same order as .artists.first(), since
+    the first artist is used to look up albums in APIs."""
+    return Prefetch("artists", queryset=Artist.objects.order_by("pk"))
+
+
+def update_cover_url_from_album_data(
+    instance: Album, album_data: GetAlbumDetailsResponse
+):
+    """Updates the cover URL for an album instance from its Last.FM album details.
+
+    :param instance: The instance (actual object) to update the cover for.
+
+    :param album_data: The Last.FM album details of the album.
+
+    :returns Whether a cover was found in the album details."""
+    logger.info("Got album data response. Checking images...")
+    if len(album_data.album.image) > 0:
+        logger.info(f"Found image cover URL(s) for album {instance.name}! Checking...")
+        # Double-check that the image URL isn't empty
+        # Start from the end, since it is where the biggest images are.
+        for i in range(len(album_data.album.image) - 1, 0, -1):
+            album_image = album_data.album.image[i]
+            if album_image.url is not None and len(album_image.url) > 0:
+                if instance.cover_url != album_image.url:
+                    logger.info(f"Using cover URL of size {album_image.size}.")
+                    instance.cover_url = album_image.url
+                    instance.cover_source = "last_fm"  # Static for now since we only use Last.FM for the source
+                    logger.info(f"Saving new cover for album {instance.name}...")
+                    instance.save()
+                    logger.info(f"Cover for album {instance.name} was saved.")
+                    return True
+                else:
+                    logger.info(
+                        f"Will not update cover for album {instance.name}: Is already the same as in the API."
+                    )
+                    return True
+            else:
+                logger.warning(
+                    f"Will not use album cover size {album_image.size} - URL is empty or None ({album_image.url}."
+                )
+        # Since we check for empty images, throw a warning if all images were empty (highly unlikely but possible)
+        logger.warning(
+            f"Did not find any images for album {instance.name} (all sizes were empty). Its cover will be left as it is."
+        )
+    else:
+        logger.warning(
+            f"Did not find any images for album {instance.name}. Its cover will be left as it is."
+        )
+    return False
+
+
+def get_retry_delay(
+    failures: int, retry_delay: datetime.timedelta, max_delay: datetime.timedelta
+) -> datetime.timedelta:
+    """Returns how long to wait before trying something again that has failed (exponential back-off).
+
+    :param failures: How many times in a row it has failed.
+
+    :param retry_delay: How long to wait after the first failure. Doubles for every failure.
+
+    :param max_delay: The maximum time to wait."""
+    # (the exponent is limited, since the delay is limited anyway)
+    return min(retry_delay * 2 ** min(failures - 1, 32), max_delay)
+
+
+def record_cover_check(instance: Album, cover_found: bool):
+    """Records that Last.FM has been checked for a cover for an album, and schedules the next check.
+    Covers that have been found are checked again after COVER_CHECK_INTERVAL. Covers that were not
+    found are checked again after COVER_CHECK_RETRY_DELAY, which doubles every time in a row that
+    the cover is not found.
+
+    :param instance: The album that was checked.
+
+    :param cover_found: Whether a cover was found."""
+    now = timezone.now()
+    if cover_found:
+        instance.cover_check_failures = 0
+        next_check_delay = COVER_CHECK_INTERVAL
+    else:
+        instance.cover_check_failures += 1
+        next_check_delay = get_retry_delay(
+            instance.cover_check_failures,
+            COVER_CHECK_RETRY_DELAY,
+            COVER_CHECK_INTERVAL,
+        )
+    instance.cover_checked_at = now
+    instance.cover_next_check_at = now + next_check_delay
+    # (update() rather than save(), since the API data of the album does not change)
+    Album.objects.filter(pk=instance.pk).update(
+        cover_checked_at=instance.cover_checked_at,
+        cover_check_failures=instance.cover_check_failures,
+        cover_next_check_at=instance.cover_next_check_at,
+    )
+
+
+@receiver(pre_save, sender=Album)
+def check_renamed_album_again(sender, instance, raw, update_fields, **kwargs):
+    """Makes sure that the cover and the Spotify UID of an album that has been renamed are checked
+    in the next updates, since the name is used to look up the album on Last.FM and Spotify.
+    """
+    if (
+        raw
+        or instance.pk is None
+        or (update_fields is not None and "name" not in update_fields)
+        or (
+            instance.cover_next_check_at is None
+            and instance.spotify_next_check_at is None
+        )
+    ):
+        return
+    if Album.objects.filter(pk=instance.pk).exclude(name=instance.name).exists():
+        instance.cover_next_check_at = None
+        instance.spotify_status = Album.SpotifyStatus.UNRESOLVED
+        instance.spotify_next_check_at = None
+
+
+@receiver(m2m_changed, sender=Album.artists.through)
+def check_album_again_on_artists_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """Makes sure that the cover and the Spotify UID of an album are checked in the next updates when
+    its artists change, since the first artist is used to look up the album on Last.FM and Spotify.
+    """
+    if action not in ["post_add", "post_remove"]:
+        return
+    album_ids = pk_set if reverse else [instance.pk]
+    Album.objects.filter(pk__in=album_ids).update(
+        cover_next_check_at=None,
+        spotify_status=Album.SpotifyStatus.UNRESOLVED,
+        spotify_next_check_at=None,
+    )
 
 
 def retrieve_and_update_cover_url_for_instance(instance: Album):
@@ -204,50 +709,14 @@ def retrieve_and_update_cover_url_for_instance(instance: Album):
     :param instance: The instance (actual object) to retrieve and update the cover for.
     """
     logger.info(f"Looking for a cover URL for {instance.name}...")
-    wait_until_artists(instance)
-    # Initialize a Last.FM API client
-    client = Client(os.environ["LAST_FM_API_KEY"], os.environ["LAST_FM_USER_AGENT"])
+    client = get_last_fm_client()
+    cover_found = False
     try:
         logger.info("Sending request to Last.FM for album details...")
         # Use the first artist's name as the artist name
         artist_name = instance.artists.first().name
         album_data = client.get_album(album=instance.name, artist=artist_name)
-        logger.info("Got album data response. Checking images...")
-        if len(album_data.album.image) > 0:
-            logger.info(
-                f"Found image cover URL(s) for album {instance.name}! Checking..."
-            )
-            # Double-check that the image URL isn't empty
-            # Start from the end, since it is where the biggest images are.
-            for i in range(len(album_data.album.image) - 1, 0, -1):
-                album_image = album_data.album.image[i]
-                if album_image.url is not None and len(album_image.url) > 0:
-                    if instance.cover_url != album_image.url:
-                        logger.info(f"Using cover URL of size {album_image.size}.")
-                        instance.cover_url = album_image.url
-                        instance.cover_source = "last_fm"  # Static for now since we only use Last.FM for the source
-                        logger.info(f"Saving new cover for album {instance.name}...")
-                        instance.save()
-                        logger.info(f"Cover for album {instance.name} was saved.")
-                        break
-                    else:
-                        logger.info(
-                            f"Will not update cover for album {instance.name}: Is already the same as in the API."
-                        )
-                        break
-                else:
-                    logger.warning(
-                        f"Will not use album cover size {album_image.size} - URL is empty or None ({album_image.url}."
-                    )
-            # Since we check for empty images, throw a warning if all images were empty (highly unlikely but possible)
-            if instance.cover_url is None:
-                logger.warning(
-                    f"Did not find any images for album {instance.name} (all sizes were empty). Its cover will be left blank."
-                )
-        else:
-            logger.warning(
-                f"Did not find any images for album {instance.name}. Its cover will be left blank."
-            )
+        cover_found = update_cover_url_from_album_data(instance, album_data)
     except LastFMDataNotFound as e:
         logger.warning(
             f"Failed to retrieve a cover URL for album {instance.name} (was not found). Its cover will be left blank.",
@@ -258,142 +727,244 @@ def retrieve_and_update_cover_url_for_instance(instance: Album):
             f"Failed to retrieve a cover URL for album {instance.name} (unhandled exception: {e}). Its cover will be left blank.",
             exc_info=True,
         )
+    record_cover_check(instance, cover_found)
+
+
+def get_spotify_client() -> Tuple[SpotifyClient, ClientCredentials]:
+    """Returns a Spotify API client and client credentials that are shared by the whole process,
+    so that access tokens are reused between requests."""
+    global spotify_client, spotify_client_credentials
+    if spotify_client is None:
+        spotify_client = SpotifyClient(
+            os.environ["SPOTIFY_CLIENT_ID"],
+            os.environ["SPOTIFY_CLIENT_SECRET"],
+            os.environ["SPOTIFY_USER_AGENT"],
+        )
+        spotify_client_credentials = ClientCredentials(
+            spotify_client.authorization_header, spotify_client.user_agent
+        )
+    return spotify_client, spotify_client_credentials
+
+
+def normalize_name(name: str) -> str:
+    """Normalizes an album or artist name for comparisons."""
+    return " ".join(name.casefold().split())
+
+
+def find_spotify_album(
+    album_name: str, artist_name: str, search_results: List[Dict]
+) -> Tuple[Dict, bool]:
+    """Finds the search result on Spotify that matches an album.
+
+    :param album_name: The name of the album.
+
+    :param artist_name: The name of the first artist of the album.
+
+    :param search_results: The albums that were found when searching Spotify, in the order that they were returned.
+
+    :returns The search result that matches the album, and whether it matched it exactly.
+    If no search result matches it exactly, the first one is returned."""
+    for search_result in search_results:
+        if normalize_name(search_result["name"]) == normalize_name(
+            album_name
+        ) and normalize_name(artist_name) in [
+            normalize_name(artist["name"]) for artist in search_result["artists"]
+        ]:
+            return search_result, True
+    return search_results[0], False
+
+
+def set_spotify_track_uris(instance: Album, album_tracks: List[Dict]) -> bool:
+    """Sets the track URIs of an album from its Spotify tracklist. Does not save the album.
+
+    :param instance: The album instance to set the track URIs for.
+
+    :param album_tracks: The tracks of the album on Spotify.
+
+    :returns Whether the track URIs changed."""
+    # We save the IDs for all tracks as well so we can add tracks to the user's stored Album of the day playlist via an API.
+    # See views.py or play around with the frontend.
+    track_uris = [track["uri"] for track in album_tracks]
+    if len(track_uris) == 0:
+        logger.warning(
+            f"Missing track URIs for album with UID {instance.spotify_uid} - we have a length of 0 track URIs!"
+        )
+    if instance.spotify_track_uris == track_uris:
+        return False
+    instance.spotify_track_uris = track_uris
+    return True
+
+
+def update_spotify_track_uris_for_instance(instance: Album) -> bool:
+    """Retrieves and updates the track URIs of an album that has a Spotify UID. Does not save the album.
+
+    :param instance: The album instance to update the track URIs for.
+
+    :returns Whether the track URIs changed."""
+    client, client_credentials = get_spotify_client()
+    album_tracks = client.get_album_tracklist(
+        credentials=client_credentials,
+        album_uid=instance.spotify_uid,
+        market=SPOTIFY_MARKET,
+    )
+    return set_spotify_track_uris(instance, album_tracks)
+
+
+def has_spotify_album(instance: Album) -> bool:
+    """Checks if an album has a Spotify UID that should be used as it is, so that only the track list
+    of the album needs to be updated rather than searching for it.
+
+    :param instance: The album to check."""
+    # (albums that got a UID before they were ever looked up, for example by hand, are trusted)
+    return instance.spotify_uid is not None and (
+        instance.spotify_status == Album.SpotifyStatus.RESOLVED
+        or (
+            instance.spotify_status == Album.SpotifyStatus.UNRESOLVED
+            and instance.spotify_checked_at is None
+        )
+    )
+
+
+def update_spotify_track_uris_for_instances(instances: List[Album]):
+    """Updates the track lists of albums that have Spotify UIDs (see has_spotify_album).
+    Uses one request for every 20 albums rather than one request per album.
+
+    :param instances: The albums to update the track lists for."""
+    client, client_credentials = get_spotify_client()
+    logger.info(f"Updating the Spotify track lists of {len(instances)} album(s)...")
+    try:
+        spotify_albums = client.get_albums(
+            client_credentials,
+            [instance.spotify_uid for instance in instances],
+            market=SPOTIFY_MARKET,
+        )
+    except Exception as e:
+        logger.warning(
+            f"Failed to update the Spotify track lists of {len(instances)} album(s) (unhandled exception: {e}). They will be retried.",
+            exc_info=True,
+        )
+        for instance in instances:
+            record_spotify_check(instance, instance.spotify_status, failed=True)
+        return
+    for instance, spotify_album in zip(instances, spotify_albums):
+        if spotify_album is None:
+            logger.warning(
+                f"Spotify album {instance.spotify_uid} of album {instance.name} was not found. It will be searched for again."
+            )
+            record_spotify_check(instance, Album.SpotifyStatus.UNRESOLVED)
+            continue
+        if set_spotify_track_uris(instance, spotify_album["tracks"]["items"]):
+            instance.save()
+            logger.info(f"Spotify track URIs for {instance.name} were saved.")
+        record_spotify_check(instance, Album.SpotifyStatus.RESOLVED)
+
+
+def record_spotify_check(instance: Album, spotify_status: str, failed: bool = False):
+    """Records that an album has been looked up on Spotify, and schedules the next check.
+    The track lists of albums that have been found are updated after SPOTIFY_CHECK_INTERVAL.
+    Albums that were not found or did not match any search result exactly are searched for again after
+    SPOTIFY_CHECK_RETRY_DELAY, which doubles every time in a row.
+
+    :param instance: The album that was looked up.
+
+    :param spotify_status: The result of the lookup (see Album.SpotifyStatus).
+
+    :param failed: True if the lookup failed because of an error. It is then retried like albums that were not found.
+    """
+    now = timezone.now()
+    if spotify_status == Album.SpotifyStatus.RESOLVED and not failed:
+        instance.spotify_check_failures = 0
+        next_check_delay = SPOTIFY_CHECK_INTERVAL
+    else:
+        instance.spotify_check_failures += 1
+        next_check_delay = get_retry_delay(
+            instance.spotify_check_failures,
+            SPOTIFY_CHECK_RETRY_DELAY,
+            SPOTIFY_CHECK_INTERVAL,
+        )
+    instance.spotify_status = spotify_status
+    instance.spotify_checked_at = now
+    instance.spotify_next_check_at = now + next_check_delay
+    # (update() rather than save(), since the API data of the album does not change)
+    Album.objects.filter(pk=instance.pk).update(
+        spotify_status=instance.spotify_status,
+        spotify_checked_at=instance.spotify_checked_at,
+        spotify_check_failures=instance.spotify_check_failures,
+        spotify_next_check_at=instance.spotify_next_check_at,
+    )
 
 
 def retrieve_and_update_spotify_uid_for_instance(instance: Album):
     """Retrieves and updates the Spotify UID for an album by searching for it on Spotify.
+    Albums that have already been found only have their track list updated.
 
     :param instance: The album instance to look for UIDs for."""
+    client, client_credentials = get_spotify_client()
+    spotify_status = instance.spotify_status
+    if has_spotify_album(instance):
+        logger.info(f"Updating the Spotify track list of album {instance.name}...")
+        try:
+            if update_spotify_track_uris_for_instance(instance):
+                instance.save()
+                logger.info(f"Spotify track URIs for {instance.name} were saved.")
+            spotify_status = Album.SpotifyStatus.RESOLVED
+        except SpotifyDataNotFound as e:
+            logger.warning(
+                f"Spotify album {instance.spotify_uid} of album {instance.name} was not found. It will be searched for again."
+            )
+            spotify_status = Album.SpotifyStatus.UNRESOLVED
+        except Exception as e:
+            logger.warning(
+                f"Failed to update the Spotify track list of album {instance.name} (unhandled exception: {e}). It will be retried."
+            )
+            record_spotify_check(instance, spotify_status, failed=True)
+            return
+        record_spotify_check(instance, spotify_status)
+        return
     logger.info(f"Trying to find a Spotify UID for album {instance.name}...")
-    wait_until_artists(instance)
-    # Initialize a Spotify client
-    spotify_client = SpotifyClient(
-        os.environ["SPOTIFY_CLIENT_ID"],
-        os.environ["SPOTIFY_CLIENT_SECRET"],
-        os.environ["SPOTIFY_USER_AGENT"],
-    )
-    # ...and some client credentials
-    client_credentials = ClientCredentials(
-        spotify_client.authorization_header, spotify_client.user_agent
-    )
     try:
         # Use the first artist's name as the artist name
         artist_name = instance.artists.first().name
         logger.info("Sending request to Spotify...")
-        # When searching, we only want the first album. The market can be customized but defaults to Swedish.
-        search_results = spotify_client.search(
+        # The market can be customized but defaults to Swedish.
+        search_results = client.search(
             client_credentials=client_credentials,
             query=f"album:{instance.name} artist:{artist_name}",
             type="album",  # Only return albums...
             market=SPOTIFY_MARKET,  # ...available in our requested market
-            limit=1,
+            limit=SPOTIFY_SEARCH_LIMIT,
+            max_results=SPOTIFY_SEARCH_LIMIT,
         )
         logger.info("Got search results back. Handling...")
-        album = search_results[0]
-        album_id = album["id"]
-        logger.info(f"Found Spotify UID: {album_id}. Getting ID for tracks...")
-        # We save the IDs for all tracks as well so we can add tracks to the user's stored Album of the day playlist via an API.
-        # See views.py or play around with the frontend.
-        album_tracks = spotify_client.get_album_tracklist(
-            credentials=client_credentials, album_uid=album_id, market=SPOTIFY_MARKET
+        album, exact_match = find_spotify_album(
+            instance.name, artist_name, search_results
         )
-        track_uris = [track["uri"] for track in album_tracks]
-        instance.spotify_uid = album_id
-        if len(track_uris) == 0:
+        if exact_match:
+            spotify_status = Album.SpotifyStatus.RESOLVED
+        else:
             logger.warning(
-                f"Missing track URIs for album with UID {album_id} - we have a length of 0 track URIs!"
+                f"No search result matched album {instance.name} exactly. Using the best guess {album['name']}."
             )
-        instance.spotify_track_uris = json.dumps(track_uris)
+            spotify_status = Album.SpotifyStatus.AMBIGUOUS
+        album_id = album["id"]
+        logger.info(f"Found Spotify UID: {album_id}. Getting ID for tracks...")
+        instance.spotify_uid = album_id
+        update_spotify_track_uris_for_instance(instance)
         instance.save()
         logger.info(f"Spotify UID for {instance.name} was saved.")
     except SpotifyDataNotFound as e:
         logger.warning(
-            f"Failed to find a Spotify UID for album {instance.name} (was not found). Its UID will be left blank.",
+            f"Failed to find a Spotify UID for album {instance.name} (was not found). Its UID will be left as it is.",
             exc_info=True,
         )
+        spotify_status = Album.SpotifyStatus.NOT_FOUND
     except Exception as e:
         logger.warning(
-            f"Failed to find a Spotify UID for album {instance.name} (unhandled exception: {e}). Its UID will be left blank."
-        )
-
-
-def wait_until_artists(instance: Album, timeout: Optional[int] = None) -> None:
-    """When an album is created and received by the post_save hooks below,
-    it still doesn't have artists because its ManyToMany relationship requires
-    the album to exist before artists can be added (post_save is run before artists
-    are added). This function waits until an Album has .artists != None.
-
-    :param instance: The instance of the album to check.
-
-    :param timeout: An optional timeout. Default is 30 seconds."""
-    if timeout is None:
-        timeout = 30
-    if instance.artists.first() is None:
-        time_elapsed = 0
-        # Run until timeout or until we have artists
-        while time_elapsed < timeout and instance.artists.first() is None:
-            # Print out debugging every 2 seconds
-            if time_elapsed % 2 == 0:
-                logger.info(
-                    f"Waiting until artists are created on {instance} ({time_elapsed}s elapsed)..."
-                )
-            time.sleep(1)
-            time_elapsed += 1
-        # Raise a TimeoutError if we do not get artists added
-        if instance.artists.first() is None:
-            error_message = (
-                f"Timeout exceeded waiting for artists to be created on {instance}."
-            )
-            logger.warning(error_message)
-            raise TimeoutError(error_message)
-
-
-@receiver(post_save, sender=Album)
-def retrieve_cover_url_for_album_on_save(
-    sender, instance, created, raw, using, update_fields, **kwargs
-):
-    """Automatically retrieve cover URL when an album is or created to ensure that it is up to date.
-
-    Note: for more information on the parameters, please refer to the Django documentation:
-    https://docs.djangoproject.com/en/4.2/ref/signals/#post-save
-
-    Note: automatic updating of cover URLs is done using the task update_album_cover.
-    """
-    # Only run when an album is created and the field has not been manually set
-    if created and (update_fields is None or "cover_url" not in update_fields):
-        # Create a thread to queue the retrieval
-        thread = Thread(
-            target=retrieve_and_update_cover_url_for_instance, args=[instance]
-        )
-        thread.start()
-    else:
-        logger.info(
-            "Ignored retrieving cover for an album: it has already been created."
-        )
-
-
-@receiver(post_save, sender=Album)
-def retrieve_uid_for_album_on_save(
-    sender, instance, created, raw, using, update_fields, **kwargs
-):
-    """Automatically retrieve Spotify UUID when an album is or created to ensure that it is up to date.
-
-    Note: for more information on the parameters, please refer to the Django documentation:
-    https://docs.djangoproject.com/en/4.2/ref/signals/#post-save
-
-    Note: automatic updating of Spotify UIDs is done using the task update_spotify_uids.
-    """
-    # Only run when an album is created and the field has not been manually set
-    if created and (update_fields is None or "update_uids" not in update_fields):
-        # Create a thread to queue the retrieval
-        thread = Thread(
-            target=retrieve_and_update_spotify_uid_for_instance, args=[instance]
-        )
-        thread.start()
-    else:
-        logger.info(
-            "Ignored retrieving Spotify UIDs for an album: it has already been created."
+            f"Failed to find a Spotify UID for album {instance.name} (unhandled exception: {e}). Its UID will be left as it is."
         )
+        record_spotify_check(instance, spotify_status, failed=True)
+        return
+    record_spotify_check(instance, spotify_status)
 
 
 class AlbumSerializer(serializers.ModelSerializer):
@@ -404,36 +975,34 @@ class AlbumSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Album
-        fields = "__all__"
+        # (these fields are only used to schedule cover and Spotify updates)
+        exclude = [
+            "cover_checked_at",
+            "cover_check_failures",
+            "cover_next_check_at",
+            "spotify_status",
+            "spotify_checked_at",
+            "spotify_check_failures",
+            "spotify_next_check_at",
+        ]
 
     def to_representation(self, instance):
-        """We override the get method of this view to convert spotify_track_uris
-        from a JSON string to JSON."""
-        spotify_track_uris = []
-        try:
-            spotify_track_uris = json.loads(instance.spotify_track_uris)
-        except Exception as a:  # Since the default value is JSON, this is not expected.
-            try:
-                spotify_track_uris_value = (
-                    f"Track URIs value: {instance.spotify_track_uris}"
-                )
-            except Exception as b:
-                spotify_track_uris_value = f"Track URIs value not available. {str(b)}"
+        """We override the get method of this view to serialize albums without going through
+        every field of the serializer."""
+        spotify_track_uris = instance.spotify_track_uris
+        if not isinstance(
+            spotify_track_uris, list
+        ):  # Since the default value is a list, this is not expected.
             logger.critical(
-                f"Failed to load track URIs value: deserialization failed. This is not expected, please check the spotify_track_uris field of the album {instance.id}. Exception: {str(a)}. {spotify_track_uris_value}",
-                exc_info=True,
+                f"The track URIs of album {instance.id} are not a list. This is not expected, please check its spotify_track_uris field. Track URIs value: {spotify_track_uris}"
             )
+            spotify_track_uris = []
         return {
             "id": instance.id,
             "name": instance.name,
-            "artists": [
-                ArtistSerializer(artist).to_representation(artist)
-                for artist in instance.artists.all()
-            ],
-            "genres": [
-                GenreSerializer(genre).to_representation(genre)
-                for genre in instance.genres.all()
-            ],
+            # (the nested serializers reuse any prefetched artists and genres)
+            "artists": self.fields["artists"].to_representation(instance.artists.all()),
+            "genres": self.fields["genres"].to_representation(instance.genres.all()),
             "cover_url": instance.cover_url,
             "cover_source": instance.cover_source,
             "spotify_uid": instance.spotify_uid,
@@ -454,7 +1023,7 @@ class AlbumOfTheDay(models.Model):
         on_delete=models.CASCADE,
     )
     date = models.DateField(
-        help_text="The day that the album of the day was written on/for."
+        db_index=True, help_text="The day that the album of the day was written on/for."
     )
     comments = models.CharField(
         max_length=10000, null=False, blank=False, help_text="My comments on the album."
@@ -468,8 +1037,13 @@ class AlbumOfTheDay(models.Model):
     )
 
 
-# List of external fields on AlbumOfTheDay. Used for prefetch queries
-ALBUM_OF_THE_DAY_RELATED_FIELDS = ["album"]
+def generate_album_of_the_day_queryset() -> QuerySet:
+    """Returns a queryset of albums of the day that can be serialized without running
+    any queries per entry. The album is joined in the same query as the entries, while
+    the artists and genres of all albums are prefetched in one query each."""
+    return AlbumOfTheDay.objects.select_related("album").prefetch_related(
+        *generate_album_prefetches("album__")
+    )
 
 
 class AlbumOfTheDaySerializer(serializers.ModelSerializer):
@@ -480,6 +1054,12 @@ class AlbumOfTheDaySerializer(serializers.ModelSerializer):
         ordering = ["date"]
         fields = "__all__"
 
+    @cached_property
+    def album_serializer(self) -> AlbumSerializer:
+        """An album serializer that is shared between all entries, so that one does not
+        have to be created for every entry that is serialized."""
+        return AlbumSerializer()
+
     def to_representation(self, instance):
         """Override the to_representation method to provide detailed data for the album that is linked to the album of the day entry."""
         return {
@@ -487,7 +1067,7 @@ class AlbumOfTheDaySerializer(serializers.ModelSerializer):
             "comments": instance.comments,
             "comments_source": instance.comments_source,
             "date": instance.date,
-            "album": AlbumSerializer(instance.album).to_representation(instance.album),
+            "album": self.album_serializer.to_representation(instance.album),
         }
 
 
@@ -527,7 +1107,7 @@ class AlbumListItem(models.Model):
     )
     # Generic
     index_in_list = models.IntegerField(
-        help_text="The index that the item has in the list."
+        db_index=True, help_text="The index that the item has in the list."
     )
 
     def __str__(self):
@@ -540,6 +1120,8 @@ class AlbumListItem(models.Model):
 class AlbumListItemSerializer(serializers.ModelSerializer):
     """Defines a serializer for the AlbumListItem class."""
 
+    album = AlbumSerializer(required=False, allow_null=True)
+
     class Meta:
         model = AlbumListItem
         fields = "__all__"
@@ -553,9 +1135,7 @@ class AlbumListItemSerializer(serializers.ModelSerializer):
         if instance.album is not None:  # Album type
             filled_out_type = "album"
             representation = {
-                "album": AlbumSerializer(instance.album).to_representation(
-                    instance.album
-                ),
+                "album": self.fields["album"].to_representation(instance.album),
                 "comments": instance.comments,
             }
         elif (instance.heading is not None and len(instance.heading) > 0) or (
@@ -600,8 +1180,18 @@ class AlbumList(models.Model):
         return f'Album list "{self.name}" (ID {self.id})'
 
 
-# List of external fields on AlbumList. Used for prefetch queries
-ALBUM_LIST_RELATED_FIELDS = ["items"]
+def generate_album_list_prefetches() -> List[Prefetch]:
+    """Generates the prefetches that are needed to serialize album lists without running
+    any queries per list or list item."""
+    return [
+        Prefetch(
+            "items",
+            queryset=AlbumListItem.objects.select_related("album").order_by(
+                "index_in_list"
+            ),
+        ),
+        *generate_album_prefetches("items__album__"),
+    ]
 
 
 class AlbumListSerializer(serializers.ModelSerializer):
@@ -615,8 +1205,9 @@ class AlbumListSerializer(serializers.ModelSerializer):
         """We override to_representation to sort the items properly. You might think "why not use the filters and sortering that you have
         already installed?" Valid point, but I think it is so crucial that a list appears in the correct order.
         """
+        item_serializer = self.fields["items"].child
         items = [
-            AlbumListItemSerializer(item).to_representation(item)
+            item_serializer.to_representation(item)
             for item in instance.items.all()  # Format all items
         ]
         items.sort(
@@ -637,7 +1228,10 @@ class DailyRotation(models.Model):
     id = models.AutoField(
         primary_key=True, help_text="A unique ID for the daily rotation"
     )
-    day = models.DateField(help_text="The day that the rotation is for.")
+    day = models.DateField(
+        unique=True,
+        help_text="The day that the rotation is for. There is one rotation per day.",
+    )
     description = models.CharField(
         max_length=256,
         null=True,
@@ -655,8 +1249,14 @@ class DailyRotation(models.Model):
     )
 
 
-# List of external fields on DailyRotation. Used for prefetch queries.
-DAILY_ROTATION_RELATED_FIELDS = ["albums", "genres"]
+def generate_daily_rotation_prefetches() -> List[Union[str, Prefetch]]:
+    """Generates the prefetches that are needed to serialize daily rotations without running
+    any queries per rotation."""
+    return [
+        "albums",
+        *generate_album_prefetches("albums__"),
+        "genres",
+    ]
 
 
 class DailyRotationSerializer(serializers.ModelSerializer):
@@ -669,12 +1269,114 @@ class DailyRotationSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class SearchDocument(models.Model):
+    """A SearchDocument contains all searchable text of an album, album of the day, list or daily rotation,
+    including the text of related entries (like the names of the genres of an album). This makes it possible
+    to search without joining any relationships. Kept up to date automatically, see search.py.
+    """
+
+    id = models.AutoField(primary_key=True, help_text="The ID of the search document.")
+    model = models.CharField(
+        max_length=64,
+        help_text='The model of the entry that the document is for, for example "website.album".',
+    )
+    object_id = models.IntegerField(
+        help_text="The ID of the entry that the document is for."
+    )
+    document = models.TextField(
+        blank=True, default="", help_text="All searchable text of the entry."
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["model", "object_id"], name="unique_search_document"
+            )
+        ]
+
+    def __str__(self):
+        return f"Search document for {self.model} {self.object_id}"
+
+
+class BackgroundJob(models.Model):
+    """A BackgroundJob is work that has been queued to run in the background for an album,
+    like retrieving its cover. Jobs are stored so that they survive restarts and are removed
+    once they have finished. See jobs.py."""
+
+    class Status(models.TextChoices):
+        QUEUED = "queued"
+        RUNNING = "running"
+        FAILED = "failed"
+
+    id = models.AutoField(primary_key=True, help_text="The ID of the job.")
+    name = models.CharField(
+        max_length=64,
+        help_text='What the job does, for example "retrieve_cover_url". See jobs.py.',
+    )
+    album = models.ForeignKey(
+        Album,
+        on_delete=models.CASCADE,
+        help_text="The album that the job is for.",
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=Status.choices,
+        default=Status.QUEUED,
+        db_index=True,
+        help_text="If the job is waiting to run, running or has failed.",
+    )
+    attempts = models.PositiveIntegerField(
+        default=0, help_text="How many times the job has been started."
+    )
+    error = models.TextField(
+        blank=True, default="", help_text="The error of the last failed attempt."
+    )
+    queued_at = models.DateTimeField(
+        auto_now=True, help_text="When the job was last queued or updated."
+    )
+
+    class Meta:
+        constraints = [
+            # Only one job of each kind can be queued per album
+            models.UniqueConstraint(
+                fields=["name", "album"], name="unique_background_job"
+            )
+        ]
+
+    def __str__(self):
+        return f"Background job {self.name} for album {self.album_id} ({self.status})"
+
+
+class ModelVersion(models.Model):
+    """A ModelVersion keeps track of changes to the entries of a model, which is used to answer conditional requests
+    and to cache API responses (see caching.py). It is stored in the database so that changes made by any process,
+    like the tasks, are visible to all of them."""
+
+    id = models.AutoField(primary_key=True, help_text="The ID of the version.")
+    model = models.CharField(
+        max_length=128,
+        unique=True,
+        help_text='The label of the model that the version is for, for example "website.album".',
+    )
+    changes = models.PositiveBigIntegerField(
+        default=0,
+        help_text="How many times the entries of the model have been changed.",
+    )
+    changed_at = models.DateTimeField(
+        help_text="When the entries of the model were last changed."
+    )
+
+    def __str__(self):
+        return f"Version {self.changes} of {self.model}"
+
+
 class SavedSpotifyUser(models.Model):
     """A SavedSpotifyUser is a user that has connected their Spotify account to save albums to their profile."""
 
     id = models.AutoField(primary_key=True, help_text="The ID of the user.")
     cookie_token = models.CharField(
         max_length=128,
+        unique=True,
         help_text="A token that the user can use for identification purposes.",
     )
     # Spotify is not joking with the size of tokens - tests showed a value of 268, we're alolowing big big space for them.
@@ -699,7 +1401,7 @@ class SavedSpotifyUser(models.Model):
         max_length=256, help_text="The user's Spotify username."
     )
     spotify_user_id = models.CharField(
-        max_length=256, help_text="The user's Spotify ID."
+        max_length=256, db_index=True, help_text="The user's Spotify ID."
     )
     connected_playlist_id = models.CharField(
         max_length=256, help_text="The playlist that Album of the Day saves albums to."
@@ -0,0 +1,431 @@
+"""search.py
+Searching albums, albums of the day, lists and daily rotations. Instead of searching across relationships
+(which leads to a lot of joins and LIKE '%...%' queries that can not use indexes), all searchable text of an entry
+is stored in one SearchDocument. The documents are kept up to date using signals and are searched using:
+* PostgreSQL: full-text search, using a GIN index (see generate_full_text_indexes in models.py).
+* SQLite: an FTS5 table next to the search documents, that is kept up to date by triggers.
+* Other databases: case-insensitive matching on the search documents."""
+import logging
+import re
+from typing import Dict, Iterable, List, Optional, Set, Type
+from django.db import connections, OperationalError
+from django.db.models import Model, QuerySet
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_delete,
+)
+from rest_framework.filters import SearchFilter
+from .models import (
+    Album,
+    AlbumList,
+    AlbumListItem,
+    AlbumOfTheDay,
+    Artist,
+    DailyRotation,
+    Genre,
+    SearchDocument,
+)
+
+logger = logging.getLogger(__name__)
+
+OBJECT_TO_SEARCHABLE_FIELDS = {  # Mapping: object --> searchable field
+    Album: ["name", "id", ("genres", Genre)],
+    Artist: ["name", "id"],
+    Genre: ["name", "id"],
+    AlbumList: ["name", "id", "description", ("items", AlbumListItem)],
+    AlbumListItem: [("album", Album), "comments", "heading", "body"],
+    DailyRotation: ["day", "id", "description"],
+}
+
+
+def generate_searchable_parameters(
+    internal_fields: List, external_fields: Dict[str, Model]
+):
+    """For the Django search API, you can not specify searchable fields
+    that are ManyToManyField or ForeignKeys without setting what the searchable attributes of those
+    fields are. Since I'm reusing relationships, this function will be able to generate
+    and centralize what the searchable parameters for each model are and generate a list with
+    these parameters.
+
+    :param internal_fields The internal fields that should be searchable in a view.
+
+    :param external_fields The IDs of any external fields that should be searchable in a view.
+    For example, if a model has a list of Genre(s) under the key "genre", you can pass
+    {"genres": Genre} to generate the searchable parameters."""
+    searchable_parameters = internal_fields
+    for external_key, external_object_type in external_fields.items():
+        # Get the searchable fields for each object type
+        for searchable_field in OBJECT_TO_SEARCHABLE_FIELDS[external_object_type]:
+            if isinstance(searchable_field, str):
+                searchable_parameters.append(f"{external_key}__{searchable_field}")
+            else:  # Allow nesting relationships - somewhat hacky, but whatever:)
+                searchable_parameters.extend(
+                    generate_searchable_parameters(
+                        [],
+                        {f"{external_key}__{searchable_field[0]}": searchable_field[1]},
+                    )
+                )
+    return searchable_parameters
+
+
+# The fields that are included in the search document of each model.
+SEARCH_DOCUMENT_FIELDS = {
+    Album: generate_searchable_parameters(
+        ["name", "id"], {"artists": Artist, "genres": Genre}
+    ),
+    AlbumOfTheDay: generate_searchable_parameters(
+        ["date", "comments"], {"album": Album}
+    ),
+    AlbumList: generate_searchable_parameters(["name", "id"], {"items": AlbumListItem}),
+    DailyRotation: generate_searchable_parameters(
+        ["day", "id"], {"genres": Genre, "albums": Album}
+    ),
+}
+# How many entries to generate search documents for at once.
+SEARCH_DOCUMENT_BATCH_SIZE = 500
+# The FTS5 table that is used to search the documents on SQLite.
+SQLITE_SEARCH_TABLE = f"{SearchDocument._meta.db_table}_fts"
+
+
+def get_search_document_model_name(model: Type[Model]) -> str:
+    """Returns the name that is used for a model in SearchDocument.model, for example "website.album"."""
+    return model._meta.label_lower
+
+
+def generate_search_documents(
+    model: Type[Model], object_ids: Iterable[int]
+) -> Dict[int, str]:
+    """Generates the search documents for entries. One query is run per field in SEARCH_DOCUMENT_FIELDS.
+    IDs of related entries are not included, since searching for an ID should only return the entry with that ID.
+
+    :param model: The model of the entries.
+
+    :param object_ids: The IDs of the entries.
+
+    :returns A mapping: ID of entry --> search document. Entries that do not exist are not included.
+    """
+    object_ids = list(object_ids)
+    values: Dict[int, Dict[str, None]] = {}  # (dictionaries are used as ordered sets)
+    for field in SEARCH_DOCUMENT_FIELDS[model]:
+        if field.endswith("__id"):
+            continue
+        for object_id, value in model.objects.filter(pk__in=object_ids).values_list(
+            "pk", field
+        ):
+            object_values = values.setdefault(object_id, {})
+            if value is not None and value != "":
+                object_values[str(value)] = None
+    return {object_id: "\n".join(value) for object_id, value in values.items()}
+
+
+def update_search_documents(model: Type[Model], object_ids: Iterable[int]) -> None:
+    """Updates the search documents of entries. Documents of entries that no longer exist are removed.
+
+    :param model: The model of the entries.
+
+    :param object_ids: The IDs of the entries."""
+    object_ids = list(object_ids)
+    model_name = get_search_document_model_name(model)
+    for i in range(0, len(object_ids), SEARCH_DOCUMENT_BATCH_SIZE):
+        batch = object_ids[i : i + SEARCH_DOCUMENT_BATCH_SIZE]
+        documents = generate_search_documents(model, batch)
+        existing_documents = {
+            search_document.object_id: search_document
+            for search_document in SearchDocument.objects.filter(
+                model=model_name, object_id__in=batch
+            )
+        }
+        SearchDocument.objects.filter(model=model_name, object_id__in=batch).exclude(
+            object_id__in=documents.keys()
+        ).delete()
+        changed_documents = []
+        new_documents = []
+        for object_id, document in documents.items():
+            search_document = existing_documents.get(object_id)
+            if search_document is None:
+                new_documents.append(
+                    SearchDocument(
+                        model=model_name, object_id=object_id, document=document
+                    )
+                )
+            elif search_document.document != document:
+                search_document.document = document
+                changed_documents.append(search_document)
+        SearchDocument.objects.bulk_create(new_documents)
+        SearchDocument.objects.bulk_update(changed_documents, ["document"])
+
+
+def rebuild_search_documents() -> int:
+    """Generates the search documents of all entries.
+
+    :returns The number of entries that search documents were generated for."""
+    entry_count = 0
+    for model in SEARCH_DOCUMENT_FIELDS:
+        object_ids = list(model.objects.values_list("pk", flat=True))
+        logger.info(f"Generating search documents for {len(object_ids)} {model}...")
+        update_search_documents(model, object_ids)
+        entry_count += len(object_ids)
+    return entry_count
+
+
+def find_entries_to_update(
+    model: Type[Model], object_ids: Iterable[int]
+) -> Dict[Type[Model], Set[int]]:
+    """Finds the entries whose search documents depend on some entries.
+
+    :param model: The model of the entries that were changed.
+
+    :param object_ids: The IDs of the entries that were changed.
+
+    :returns A mapping: model --> IDs of entries that need their search documents updated.
+    """
+    object_ids = set(object_ids)
+    entries_to_update: Dict[Type[Model], Set[int]] = {
+        indexed_model: set() for indexed_model in SEARCH_DOCUMENT_FIELDS
+    }
+    if model in entries_to_update:
+        entries_to_update[model].update(object_ids)
+    album_ids = set()
+    if model == Album:
+        album_ids = object_ids
+    elif model == Artist:
+        album_ids = set(
+            Album.objects.filter(artists__in=object_ids).values_list("pk", flat=True)
+        )
+    elif model == Genre:
+        album_ids = set(
+            Album.objects.filter(genres__in=object_ids).values_list("pk", flat=True)
+        )
+        entries_to_update[DailyRotation].update(
+            DailyRotation.objects.filter(genres__in=object_ids).values_list(
+                "pk", flat=True
+            )
+        )
+    elif model == AlbumListItem:
+        entries_to_update[AlbumList].update(
+            AlbumList.objects.filter(items__in=object_ids).values_list("pk", flat=True)
+        )
+    # Update all entries that the albums are part of
+    if len(album_ids) > 0:
+        entries_to_update[Album].update(album_ids)
+        entries_to_update[AlbumOfTheDay].update(
+            AlbumOfTheDay.objects.filter(album__in=album_ids).values_list(
+                "pk", flat=True
+            )
+        )
+        entries_to_update[DailyRotation].update(
+            DailyRotation.objects.filter(albums__in=album_ids).values_list(
+                "pk", flat=True
+            )
+        )
+        entries_to_update[AlbumList].update(
+            AlbumList.objects.filter(items__album__in=album_ids).values_list(
+                "pk", flat=True
+            )
+        )
+    return entries_to_update
+
+
+def update_entries(entries_to_update: Dict[Type[Model], Set[int]]) -> None:
+    """Updates the search documents of entries returned from find_entries_to_update()."""
+    for model, object_ids in entries_to_update.items():
+        if len(object_ids) > 0:
+            update_search_documents(model, object_ids)
+
+
+# Models that search documents depend on: models with search documents and models that are included in them.
+SEARCH_DOCUMENT_DEPENDENCIES = [*SEARCH_DOCUMENT_FIELDS, Artist, Genre, AlbumListItem]
+# Relationships that search documents depend on
+SEARCH_DOCUMENT_RELATIONSHIPS = [
+    Album.artists.through,
+    Album.genres.through,
+    AlbumList.items.through,
+    DailyRotation.albums.through,
+    DailyRotation.genres.through,
+]
+
+
+def update_search_documents_on_save(sender, instance, raw, **kwargs):
+    """Updates the search documents that depend on an entry when it is saved."""
+    if not raw:
+        update_entries(find_entries_to_update(sender, [instance.pk]))
+
+
+def find_search_documents_to_update_on_delete(sender, instance, **kwargs):
+    """Finds the search documents that depend on an entry before it is deleted.
+    Its relationships are removed without sending any m2m_changed signals, so the documents are updated in post_delete.
+    """
+    instance._search_entries_to_update = find_entries_to_update(sender, [instance.pk])
+
+
+def update_search_documents_on_delete(sender, instance, **kwargs):
+    """Updates the search documents that depended on a deleted entry."""
+    update_entries(getattr(instance, "_search_entries_to_update", {}))
+
+
+def update_search_documents_on_relationship_change(
+    sender, instance, action, reverse, model, pk_set, **kwargs
+):
+    """Updates the search documents that depend on a relationship when it is changed.
+    Note: for more information on the parameters, please refer to the Django documentation:
+    https://docs.djangoproject.com/en/4.2/ref/signals/#m2m-changed
+    """
+    if (
+        reverse
+    ):  # instance is the related entry (for example a genre), pk_set contains the entries it was added to
+        if action == "pre_clear":
+            instance._search_entries_to_update = find_entries_to_update(
+                type(instance), [instance.pk]
+            )
+        elif action == "post_clear":
+            update_entries(getattr(instance, "_search_entries_to_update", {}))
+        elif action in ["post_add", "post_remove"]:
+            update_entries(find_entries_to_update(model, pk_set))
+    elif action in ["post_add", "post_remove", "post_clear"]:
+        update_entries(find_entries_to_update(type(instance), [instance.pk]))
+
+
+for dependency in SEARCH_DOCUMENT_DEPENDENCIES:
+    post_save.connect(update_search_documents_on_save, sender=dependency)
+    pre_delete.connect(find_search_documents_to_update_on_delete, sender=dependency)
+    post_delete.connect(update_search_documents_on_delete, sender=dependency)
+for relationship in SEARCH_DOCUMENT_RELATIONSHIPS:
+    m2m_changed.connect(
+        update_search_documents_on_relationship_change, sender=relationship
+    )
+
+# Whether the FTS5 table exists on SQLite. Mapping: database alias --> True/False
+sqlite_search_table_exists: Dict[str, bool] = {}
+
+
+def create_sqlite_search_table(sender, using: str, **kwargs):
+    """Creates an FTS5 table that indexes the search documents on SQLite, and triggers that keep it up to date.
+    Run after migrating, since migrations can only create normal tables."""
+    if sender.name != "website" or connections[using].vendor != "sqlite":
+        return
+    search_document_table = SearchDocument._meta.db_table
+    try:
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE name = %s",
+                [SQLITE_SEARCH_TABLE],
+            )
+            table_existed = cursor.fetchone()[0] > 0
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_SEARCH_TABLE} USING fts5("
+                f"model, document, content='{search_document_table}', content_rowid='id', prefix='2 3')"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {SQLITE_SEARCH_TABLE}_insert AFTER INSERT ON {search_document_table} BEGIN "
+                f"INSERT INTO {SQLITE_SEARCH_TABLE}(rowid, model, document) VALUES (new.id, new.model, new.document); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {SQLITE_SEARCH_TABLE}_delete AFTER DELETE ON {search_document_table} BEGIN "
+                f"INSERT INTO {SQLITE_SEARCH_TABLE}({SQLITE_SEARCH_TABLE}, rowid, model, document) VALUES ('delete', old.id, old.model, old.document); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {SQLITE_SEARCH_TABLE}_update AFTER UPDATE ON {search_document_table} BEGIN "
+                f"INSERT INTO {SQLITE_SEARCH_TABLE}({SQLITE_SEARCH_TABLE}, rowid, model, document) VALUES ('delete', old.id, old.model, old.document); "
+                f"INSERT INTO {SQLITE_SEARCH_TABLE}(rowid, model, document) VALUES (new.id, new.model, new.document); END"
+            )
+            if not table_existed:  # Index any documents that already exist
+                cursor.execute(
+                    f"INSERT INTO {SQLITE_SEARCH_TABLE}({SQLITE_SEARCH_TABLE}) VALUES ('rebuild')"
+                )
+        sqlite_search_table_exists[using] = True
+    except OperationalError as e:
+        logger.warning(
+            f"Could not create the SQLite search table (is FTS5 available?): {e}. Searches will be slower."
+        )
+        sqlite_search_table_exists[using] = False
+
+
+post_migrate.connect(create_sqlite_search_table)
+
+
+def get_search_backend(using: str = "default") -> str:
+    """Returns the backend to search with: "postgresql", "sqlite" (FTS5) or "fallback"."""
+    vendor = connections[using].vendor
+    if vendor == "postgresql":
+        return "postgresql"
+    elif vendor == "sqlite":
+        if using not in sqlite_search_table_exists:  # Check once if the table exists
+            with connections[using].cursor() as cursor:
+                cursor.execute(
+                    "SELECT COUNT(*) FROM sqlite_master WHERE name = %s",
+                    [SQLITE_SEARCH_TABLE],
+                )
+                sqlite_search_table_exists[using] = cursor.fetchone()[0] > 0
+        if sqlite_search_table_exists[using]:
+            return "sqlite"
+    return "fallback"
+
+
+def search(
+    model: Type[Model], search_terms: List[str], backend: Optional[str] = None
+) -> QuerySet:
+    """Searches for entries of a model. Terms match the start of words in the search document, and all terms have to match.
+
+    :param model: The model to search for. Must be in SEARCH_DOCUMENT_FIELDS.
+
+    :param search_terms: The terms to search for.
+
+    :param backend: The backend to search with. Default is the one returned by get_search_backend().
+
+    :returns A queryset of the IDs of the entries that matched. Can be used in a subquery like pk__in=...
+    """
+    if backend is None:
+        backend = get_search_backend()
+    search_documents = SearchDocument.objects.filter(
+        model=get_search_document_model_name(model)
+    )
+    # Only use the words in the search terms, which means that they do not have to be escaped
+    words = re.findall(r"\w+", " ".join(search_terms))
+    if len(words) == 0:
+        backend = "fallback"
+        words = search_terms
+    if backend == "postgresql":
+        from django.contrib.postgres.search import SearchQuery, SearchVector
+
+        search_documents = search_documents.annotate(
+            search_vector=SearchVector("document", config="simple")
+        ).filter(
+            search_vector=SearchQuery(
+                " & ".join(f"{word}:*" for word in words),
+                search_type="raw",
+                config="simple",
+            )
+        )
+    elif backend == "sqlite":
+        # The model is also matched in the FTS5 table, so that only the documents of the model are retrieved from it
+        model_name = get_search_document_model_name(model)
+        search_documents = search_documents.filter(
+            id__in=RawSQL(
+                f"SELECT rowid FROM {SQLITE_SEARCH_TABLE} WHERE {SQLITE_SEARCH_TABLE} MATCH %s",
+                [
+                    f'model : "{model_name}" AND document : ('
+                    + " ".join(f'"{word}"*' for word in words)
+                    + ")"
+                ],
+            )
+        )
+    else:
+        for word in words:
+            search_documents = search_documents.filter(document__icontains=word)
+    return search_documents.values("object_id")
+
+
+class SearchDocumentFilter(SearchFilter):
+    """A filter backend that works like SearchFilter (it uses the same URL parameter), but that searches the
+    search documents of the entries instead of their fields. The view's model must be in SEARCH_DOCUMENT_FIELDS.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms:
+            return queryset
+        return queryset.filter(pk__in=search(queryset.model, search_terms))
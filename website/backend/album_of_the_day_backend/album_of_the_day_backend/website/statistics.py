@@ -0,0 +1,193 @@
+"""statistics.py
+Generates the all-time statistics that are shown on the website, such as how many albums there are in the database.
+The statistics are cached as a snapshot that is invalidated whenever an entry that they depend on is saved or deleted.
+Also generates the months that there are albums of the day and daily rotations for, which are cached until an entry
+is added in a new month (or moved out of or deleted from a month)."""
+import datetime
+import logging
+import os
+from typing import Dict, List, Optional, Tuple, Type
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, Model, Value
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from .models import (
+    Album,
+    AlbumList,
+    AlbumOfTheDay,
+    Artist,
+    DailyRotation,
+    Genre,
+)
+
+logger = logging.getLogger(__name__)
+
+# Models to count. Mapping: ID --> model
+COUNTED_MODELS = {
+    "album_of_the_day": AlbumOfTheDay,
+    "album": Album,
+    "list": AlbumList,
+    "genre": Genre,
+    "artist": Artist,
+    "daily_rotation": DailyRotation,
+}
+# How many genres and artists to include in the top lists.
+STATISTICS_TOP_LIST_LENGTH = int(os.environ.get("STATISTICS_TOP_LIST_LENGTH", 10))
+# The maximum number of seconds to keep the snapshot and the available months for. They are invalidated on changes,
+# but this also makes changes from other processes (such as tasks) visible when using a per-process cache.
+STATISTICS_CACHE_TIMEOUT = int(os.environ.get("STATISTICS_CACHE_TIMEOUT", 60 * 60))
+STATISTICS_CACHE_KEY = "all_time_statistics"
+# Models that available months can be retrieved for. Mapping: model --> name of its date field
+DATED_MODELS = {AlbumOfTheDay: "date", DailyRotation: "day"}
+
+
+def generate_counts() -> Dict[str, int]:
+    """Counts the entries of all models in COUNTED_MODELS in one query.
+
+    :returns A mapping: ID of model --> number of entries"""
+    count_querysets = [
+        model.objects.order_by()
+        .values(model_index=Value(i, output_field=IntegerField()))
+        .annotate(count=Count("pk"))
+        for i, model in enumerate(COUNTED_MODELS.values())
+    ]
+    counts = count_querysets[0].union(*count_querysets[1:], all=True)
+    model_ids = list(COUNTED_MODELS.keys())
+    return {model_ids[row["model_index"]]: row["count"] for row in counts}
+
+
+def generate_statistics() -> Dict:
+    """Generates all statistics from the database.
+
+    :returns The statistics: entry counts ("count"), the genres and artists with the most albums
+    ("top_genres" and "top_artists") and the number of albums of the day per year ("album_of_the_days_per_year").
+    """
+    logger.info("Generating all-time statistics...")
+    top_genres = Genre.objects.order_by("-album_count", "name").values(
+        "id", "name", "color", "album_count"
+    )[:STATISTICS_TOP_LIST_LENGTH]
+    top_artists = (
+        Artist.objects.annotate(album_count=Count("album_artists"))
+        .order_by("-album_count", "name")
+        .values("id", "name", "album_count")[:STATISTICS_TOP_LIST_LENGTH]
+    )
+    album_of_the_days_per_year = (
+        AlbumOfTheDay.objects.annotate(year=ExtractYear("date"))
+        .order_by("year")
+        .values("year")
+        .annotate(count=Count("pk"))
+    )
+    return {
+        "count": generate_counts(),
+        "top_genres": list(top_genres),
+        "top_artists": list(top_artists),
+        "album_of_the_days_per_year": {
+            str(row["year"]): row["count"] for row in album_of_the_days_per_year
+        },
+    }
+
+
+def get_statistics() -> Dict:
+    """Gets the statistics from the cache, or generates them if they are not cached."""
+    return cache.get_or_set(
+        STATISTICS_CACHE_KEY, generate_statistics, STATISTICS_CACHE_TIMEOUT
+    )
+
+
+def invalidate_statistics(*args, **kwargs):
+    """Removes the cached statistics. Used as a receiver for signals that change the statistics."""
+    cache.delete(STATISTICS_CACHE_KEY)
+
+
+def get_available_months_cache_key(model: Type[Model]) -> str:
+    """Returns the cache key for the available months of a model."""
+    return f"available_months_{model._meta.model_name}"
+
+
+def generate_available_months(model: Type[Model]) -> Dict[str, List[int]]:
+    """Retrieves the years and months that there are entries for. Only the distinct
+    months are retrieved from the database.
+
+    :param model: The model to retrieve the months for. Must be in DATED_MODELS.
+
+    :returns A mapping: year --> months in the year. Both years and months are sorted in descending order.
+    """
+    date_field = DATED_MODELS[model]
+    months = (
+        model.objects.annotate(
+            year=ExtractYear(date_field), month=ExtractMonth(date_field)
+        )
+        .order_by("-year", "-month")
+        .values_list("year", "month")
+        .distinct()
+    )
+    available_months = {}
+    for year, month in months:
+        available_months.setdefault(str(year), []).append(month)
+    return available_months
+
+
+def get_available_months(model: Type[Model]) -> Dict[str, List[int]]:
+    """Gets the available months of a model from the cache, or generates them if they are not cached.
+    See generate_available_months()."""
+    return cache.get_or_set(
+        get_available_months_cache_key(model),
+        lambda: generate_available_months(model),
+        STATISTICS_CACHE_TIMEOUT,
+    )
+
+
+def get_month(entry_date) -> Optional[Tuple[int, int]]:
+    """Returns the (year, month) of a date, or None if it is not a date."""
+    if not isinstance(entry_date, datetime.date):
+        return None
+    return entry_date.year, entry_date.month
+
+
+def save_previous_month_before_save(sender, instance, **kwargs):
+    """Saves the month that an existing entry was in before it is saved, so that the cached available
+    months can be removed if the entry is moved out of it (see invalidate_available_months_on_save).
+    The month is only retrieved if the available months are cached."""
+    if instance._state.adding or instance.pk is None:
+        return
+    if cache.get(get_available_months_cache_key(sender)) is None:
+        return
+    instance._previous_month = get_month(
+        sender.objects.filter(pk=instance.pk)
+        .values_list(DATED_MODELS[sender], flat=True)
+        .first()
+    )
+
+
+def invalidate_available_months_on_save(sender, instance, created, **kwargs):
+    """Removes the cached available months of a model if an entry was saved in a month that is not cached,
+    or if an existing entry was moved from another month (which might now be empty)."""
+    cache_key = get_available_months_cache_key(sender)
+    available_months = cache.get(cache_key)
+    if available_months is None:
+        return
+    entry_month = get_month(getattr(instance, DATED_MODELS[sender]))
+    if (
+        entry_month is None
+        or entry_month[1] not in available_months.get(str(entry_month[0]), [])
+        or (not created and getattr(instance, "_previous_month", None) != entry_month)
+    ):
+        cache.delete(cache_key)
+
+
+def invalidate_available_months_on_delete(sender, instance, **kwargs):
+    """Removes the cached available months of a model when an entry is deleted,
+    since it might have been the last entry in its month."""
+    cache.delete(get_available_months_cache_key(sender))
+
+
+# Invalidate the statistics when any entry that they depend on changes
+for model in COUNTED_MODELS.values():
+    post_save.connect(invalidate_statistics, sender=model)
+    post_delete.connect(invalidate_statistics, sender=model)
+for through_model in [Album.artists.through, Album.genres.through]:
+    m2m_changed.connect(invalidate_statistics, sender=through_model)
+for model in DATED_MODELS:
+    pre_save.connect(save_previous_month_before_save, sender=model)
+    post_save.connect(invalidate_available_months_on_save, sender=model)
+    post_delete.connect(invalidate_available_months_on_delete, sender=model)
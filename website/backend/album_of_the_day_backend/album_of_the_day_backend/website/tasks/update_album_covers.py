@@ -1,23 +1,99 @@
 """update_album_covers.py
-Updates the album covers of all albums in the database."""
-import time
-import django, logging
+Updates the covers of the albums that are due for a cover check. Albums that have been added or changed
+are checked first, then albums that are missing a cover, and then albums whose covers have not been checked
+for a while. At most COVER_CHECK_BUDGET albums are checked per run."""
+import asyncio
+import django, logging, os
 
 django.setup()
-from website.models import Album, retrieve_and_update_cover_url_for_instance
+from django.db.models import Case, Exists, OuterRef, Q, When
+from django.utils import timezone
+from website.models import (
+    Album,
+    create_async_last_fm_client,
+    get_first_artist_prefetch,
+    record_cover_check,
+    update_cover_url_from_album_data,
+)
+from last_fm_api_client.client import LastFMDataNotFound
+from last_fm_api_client.models import GetAlbumDetailsResponse
+from typing import List, Union
 
 # Create logger
 logger = logging.getLogger(__name__)
+# The maximum number of albums to check per run
+COVER_CHECK_BUDGET = int(os.environ.get("COVER_CHECK_BUDGET", 100))
+
+
+def get_albums_to_check(budget: int) -> List[Album]:
+    """Gets the albums that are due for a cover check, in the order that they should be checked.
+
+    :param budget: The maximum number of albums to get."""
+    return list(
+        Album.objects.filter(
+            Q(cover_next_check_at__isnull=True)
+            | Q(cover_next_check_at__lte=timezone.now()),
+            # (albums are looked up using their first artist)
+            Exists(Album.artists.through.objects.filter(album_id=OuterRef("pk"))),
+        )
+        .order_by(
+            Case(
+                When(cover_next_check_at__isnull=True, then=0),  # New or changed
+                When(cover_url__isnull=True, then=1),  # Missing a cover
+                default=2,
+            ),
+            "cover_next_check_at",
+            "pk",
+        )
+        .prefetch_related(get_first_artist_prefetch())[:budget]
+    )
+
+
+async def retrieve_album_data(
+    albums: List[Album],
+) -> List[Union[GetAlbumDetailsResponse, Exception]]:
+    """Retrieves the Last.FM album details of albums. The requests are sent at the same time,
+    as fast as the rate limiter allows.
+
+    :param albums: The albums to retrieve details for. Their artists should be prefetched.
+
+    :returns The details of each album, or the exception that was raised when retrieving them.
+    """
+    async with create_async_last_fm_client() as client:
+        return await asyncio.gather(
+            *[
+                # Use the first artist's name as the artist name
+                client.get_album(artist=album.artists.all()[0].name, album=album.name)
+                for album in albums
+            ],
+            return_exceptions=True,
+        )
 
 
 def update_album_covers():
-    """Updates album covers for all albums in the database."""
-    logger.info("Updating all album covers...")
-    for album in Album.objects.all():
-        logger.info(f"Running retrieval function for album {album.name}...")
-        retrieve_and_update_cover_url_for_instance(album)
-        logger.info(f"Cover for {album.name} updated.")
-        time.sleep(1)  # Avoid spamming the Last.FM API:)
+    """Updates the covers of the albums that are due for a cover check."""
+    logger.info("Updating album covers...")
+    albums = get_albums_to_check(COVER_CHECK_BUDGET)
+    if len(albums) == 0:
+        logger.info("No album covers are due for a check.")
+        return
+    logger.info(f"Retrieving album details for {len(albums)} albums...")
+    albums_data = asyncio.run(retrieve_album_data(albums))
+    for album, album_data in zip(albums, albums_data):
+        cover_found = False
+        if isinstance(album_data, LastFMDataNotFound):
+            logger.warning(
+                f"Failed to retrieve a cover URL for album {album.name} (was not found). Its cover will be left as it is."
+            )
+        elif isinstance(album_data, Exception):
+            logger.warning(
+                f"Failed to retrieve a cover URL for album {album.name} (unhandled exception: {album_data}). Its cover will be left as it is.",
+                exc_info=album_data,
+            )
+        else:
+            cover_found = update_cover_url_from_album_data(album, album_data)
+            logger.info(f"Cover for {album.name} checked.")
+        record_cover_check(album, cover_found)
 
 
 if __name__ == "__main__":
@@ -1,13 +1,11 @@
 """update_daily_rotations.py
 Updates the "Daily rotations" which is a list showing what I have listened to for a certain day.
 """
-import time
-
 import django
 
 django.setup()
-from website.models import DailyRotation, Album, Artist, Genre
-from last_fm_api_client.client import Client, LastFMDataNotFound
+from website.models import DailyRotation, Album, Artist, Genre, get_last_fm_client
+from last_fm_api_client.client import LastFMDataNotFound
 from last_fm_api_client.models import RecentTrack, AlbumDetails
 from typing import List, Tuple
 import logging, os, datetime, pytz
@@ -20,10 +18,8 @@ def update_daily_rotations():
     """
     # Set up logging
     logger = logging.getLogger(__name__)
-    # Initialize client
-    last_fm_api = Client(
-        os.environ["LAST_FM_API_KEY"], os.environ["LAST_FM_USER_AGENT"]
-    )
+    # Get a client (which is shared, so that connections are reused)
+    last_fm_api = get_last_fm_client()
     logger.info("Started the task to update daily rotations.")
     # Check if there is a daily rotation for the current day.
     # Timezone can be sent via an environment variable, Europe/Stockholm is the default
@@ -37,11 +33,11 @@ def update_daily_rotations():
         logger.info("There is already a daily rotation for today. Exiting the task.")
     else:
         logger.info("Generating daily rotation for today...")
-        logger.info("Retrieving scrobbles...")
-        scrobble_data = last_fm_api.get_scrobbles(
+        logger.info("Retrieving and looping over scrobbles...")
+        # (scrobbles are handled while the remaining pages are being retrieved)
+        scrobbles = last_fm_api.iterate_scrobbles(
             os.environ["LAST_FM_USERNAME"], now_start_of_day, now_end_of_day
         )
-        logger.info("Scrobbles retrieved. Looping over...")
         # Find all albums that were scrobbled.
         # Requirement: first tracks scrobbled.
         found_album_scrobbles: List[Tuple[AlbumDetails, List[RecentTrack]]] = []
@@ -51,7 +47,7 @@ def update_daily_rotations():
         ] = []  # Store tracks with the same album before checking for an album scrobble
         album_name = None
         artist_name = None
-        for track in scrobble_data.recenttracks.track:
+        for track in scrobbles:
             if track.artist.text is None or track.album.text is None:
                 logger.debug(
                     f"Ignoring scrobble with empty artist or empty album name: {track}..."
@@ -80,10 +76,8 @@ def update_daily_rotations():
                 logger.info(f"Checking album: {album_name}...")
                 do_check = True
                 try:
+                    # (the client is rate limited to avoid spamming the Last.FM API)
                     album_data = last_fm_api.get_album(artist_name, album_name)
-                    time.sleep(
-                        1
-                    )  # Sleep a little while to avoid spamming the Last.FM API.
                 except LastFMDataNotFound as e:
                     logger.info(
                         f"Found no Last.FM album for {album_name} by {artist_name}. Will be skipped!",
@@ -1,32 +1,49 @@
 """update_genre_descriptions.py
 Updates the genre descriptions based on online metadata.
 """
-import time
+import asyncio
 
 import django
 
 django.setup()
-from website.models import Genre
-from last_fm_api_client.client import Client, LastFMDataNotFound
+from website.models import Genre, create_async_last_fm_client
+from last_fm_api_client.client import LastFMDataNotFound
+from last_fm_api_client.models import GetTagInfoResponse
+from typing import List, Union
 import logging, os, re
 
 LAST_FM_GENRE_DESCRIPTION_FILTER_REGEX = re.compile("([\s\S]+)Read more([\s\S]*)")
 
 
+async def retrieve_tag_data(
+    genres: List[Genre],
+) -> List[Union[GetTagInfoResponse, Exception]]:
+    """Retrieves the Last.FM tag information of genres. The requests are sent at the same time,
+    as fast as the rate limiter allows.
+
+    :param genres: The genres to retrieve tag information for.
+
+    :returns The tag information of each genre, or the exception that was raised when retrieving it.
+    """
+    async with create_async_last_fm_client() as client:
+        return await asyncio.gather(
+            *[client.get_tag(genre.name) for genre in genres], return_exceptions=True
+        )
+
+
 def update_genre_descriptions():
     """Updates the descriptions for all genres in the database based on online metadata."""
     # Set up logging
     logger = logging.getLogger(__name__)
-    # Initialize client
-    last_fm_api = Client(
-        os.environ["LAST_FM_API_KEY"], os.environ["LAST_FM_USER_AGENT"]
-    )
     logger.info("Getting genres...")
-    genres = Genre.objects.all()
-    logger.info("Genres retrieved. Updating description.")
-    for genre in genres:
+    genres = list(Genre.objects.all())
+    logger.info("Genres retrieved. Retrieving tag information...")
+    tags_data = asyncio.run(retrieve_tag_data(genres))
+    logger.info("Tag information retrieved. Updating description.")
+    for genre, tag_data in zip(genres, tags_data):
         try:
-            tag_data = last_fm_api.get_tag(genre.name)
+            if isinstance(tag_data, Exception):
+                raise tag_data
             tag_description = tag_data.tag.wiki.content
             # Strip the last disclaimer part of the tag description
             if "Read more" in tag_description:
@@ -65,7 +82,6 @@ def update_genre_descriptions():
                 exc_info=True,
             )
             raise e  # Raise the exception since this not expected output.
-        time.sleep(1)  # Avoid spamming the Last.FM API:)
 
 
 if __name__ == "__main__":
@@ -1,22 +1,68 @@
 """update_spotify_uids.py
-Updates Spotify UIDs for each album. Searches Spotify to try to find a linked album."""
-import logging, django
+Looks up the albums that are due for a Spotify check. Albums that have not been found on Spotify yet are
+searched for, and the track lists of albums that have been found are updated once in a while
+(see Album.SpotifyStatus), 20 albums per request. New and changed albums are checked first.
+At most SPOTIFY_CHECK_BUDGET albums are checked per run."""
+import logging, django, os
 import time
 
 django.setup()
-from website.models import Album, retrieve_and_update_spotify_uid_for_instance
+from django.db.models import Case, Exists, OuterRef, Q, When
+from django.utils import timezone
+from website.models import (
+    Album,
+    has_spotify_album,
+    retrieve_and_update_spotify_uid_for_instance,
+    update_spotify_track_uris_for_instances,
+)
+from typing import List
 
 # Create a logger
 logger = logging.getLogger(__name__)
+# The maximum number of albums to check per run
+SPOTIFY_CHECK_BUDGET = int(os.environ.get("SPOTIFY_CHECK_BUDGET", 100))
+
+
+def get_albums_to_check(budget: int) -> List[Album]:
+    """Gets the albums that are due for a Spotify check, in the order that they should be checked.
+
+    :param budget: The maximum number of albums to get."""
+    return list(
+        Album.objects.filter(
+            Q(spotify_next_check_at__isnull=True)
+            | Q(spotify_next_check_at__lte=timezone.now()),
+            # (albums are looked up using their first artist)
+            Exists(Album.artists.through.objects.filter(album_id=OuterRef("pk"))),
+        ).order_by(
+            Case(
+                When(spotify_next_check_at__isnull=True, then=0),  # New or changed
+                When(spotify_status=Album.SpotifyStatus.RESOLVED, then=2),
+                default=1,  # Not found yet
+            ),
+            "spotify_next_check_at",
+            "pk",
+        )[
+            :budget
+        ]
+    )
 
 
 def update_spotify_uids():
-    """Runs the task to update Spotify UIDs for all albums."""
-    for album in Album.objects.all():
-        logger.info(f"Running task to update Spotify UID for {album.spotify_uid}...")
+    """Runs the task to update Spotify UIDs for the albums that are due for a check."""
+    albums = get_albums_to_check(SPOTIFY_CHECK_BUDGET)
+    logger.info(f"Checking {len(albums)} album(s) on Spotify...")
+    # Albums that have been found only need their track lists updated, which is done in bulk
+    albums_with_uids = [album for album in albums if has_spotify_album(album)]
+    albums_to_search_for = [album for album in albums if not has_spotify_album(album)]
+    if len(albums_with_uids) > 0:
+        update_spotify_track_uris_for_instances(albums_with_uids)
+    for album in albums_to_search_for:
+        logger.info(f"Running task to update Spotify UID for {album.name}...")
         retrieve_and_update_spotify_uid_for_instance(album)
-        logger.info(f"Spotify UID for album {album.spotify_uid} updated.")
-        time.sleep(1)  # Avoid spamming the Last.FM API:)
+        logger.info(
+            f"Spotify UID for album {album.name} checked ({album.spotify_status})."
+        )
+        time.sleep(1)  # Avoid spamming the Spotify API:)
 
 
 if __name__ == "__main__":
@@ -1,3 +1,1266 @@
-from django.test import TestCase
+"""tests.py
+Performance regression tests for the API. A synthetic catalogue is seeded (see benchmarking.py)
+and every route in album_of_the_day/urls.py is requested. Each request has an upper bound on the number
+of SQL queries and on its wall time, so that a serializer or view change that reintroduces per-row queries fails
+the build. A machine-readable report of all measurements is also written (see API_BENCHMARK_REPORT_PATH)."""
+import datetime
+import importlib.util
+import io
+import json
+import os
+import time
+from typing import Dict, List, Optional, Set
+from unittest.mock import AsyncMock, MagicMock, patch
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from album_of_the_day.urls import urlpatterns
+from .caching import set_version
+from .jobs import JOB_FUNCTIONS, queue_jobs, run_job
+from .models import (
+    Album,
+    AlbumOfTheDay,
+    AlbumSerializer,
+    Artist,
+    BackgroundJob,
+    DailyRotation,
+    Genre,
+    create_postgresql_indexes,
+    SavedSpotifyUser,
+    SearchDocument,
+    find_spotify_album,
+    has_spotify_album,
+    normalize_spotify_track_uris_in_database,
+    record_cover_check,
+    retrieve_and_update_spotify_uid_for_instance,
+    update_spotify_track_uris_for_instances,
+)
+from .search import get_search_backend, search
+from .statistics import (
+    STATISTICS_CACHE_TIMEOUT,
+    get_available_months,
+    get_statistics,
+)
+from .tasks.update_album_covers import get_albums_to_check
+from .tasks.update_spotify_uids import (
+    get_albums_to_check as get_albums_to_check_on_spotify,
+)
+from spotify_api_client.client import (
+    SpotifyAPIException,
+    SpotifyDataNotFound,
+    SpotifyUser,
+)
+from .views import (
+    async_spotify_client,
+    get_saved_spotify_profile_from_request,
+    get_saved_spotify_user_from_request,
+    get_spotify_user_arguments,
+    on_updated_tokens,
+    spotify_sessions,
+)
+from .benchmarking import (
+    explain_hot_queries,
+    seed_synthetic_catalogue,
+    measure_request,
+    SYNTHETIC_CATALOGUE_SIZE,
+)
 
-# Create your tests here.
+# The maximum number of seconds that a request may take. Can be raised on slow CI runners.
+API_BENCHMARK_MAX_SECONDS = float(os.environ.get("API_BENCHMARK_MAX_SECONDS", 2))
+# Where to write the machine-readable report. An absolute path is used by default since
+# the startup tasks change the working directory.
+API_BENCHMARK_REPORT_PATH = os.environ.get(
+    "API_BENCHMARK_REPORT_PATH",
+    os.path.join(settings.BASE_DIR, "api_benchmark_report.json"),
+)
+# Requests to send and their budgets. "route" is the route in urlpatterns that the request belongs to,
+# every route must have at least one request. "path" may contain IDs from the seeded catalogue, like {albums}.
+# The budgets of the API views of the models include one query for the version of the data (see caching.py).
+ROUTE_BUDGETS: List[Dict] = [
+    {"route": "", "path": "/", "max_queries": 0},
+    {"route": "admin/", "path": "/admin/", "max_queries": 0},
+    {"route": "api/", "path": "/api/login/", "max_queries": 0},
+    {"route": "api/schema", "path": "/api/schema", "max_queries": 0},
+    {"route": "login/token/", "path": "/login/token/", "max_queries": 0},
+    {"route": "api/albums", "path": "/api/albums?limit=31", "max_queries": 5},
+    {"route": "api/albums", "path": "/api/albums?limit=31&page=90", "max_queries": 5},
+    {"route": "api/albums", "path": "/api/albums?search=Album+12", "max_queries": 5},
+    {"route": "api/albums/<int:pk>", "path": "/api/albums/{albums}", "max_queries": 4},
+    {"route": "api/artists", "path": "/api/artists?limit=31", "max_queries": 3},
+    {
+        "route": "api/artists/<int:pk>",
+        "path": "/api/artists/{artists}",
+        "max_queries": 2,
+    },
+    {"route": "api/genres", "path": "/api/genres?limit=31", "max_queries": 3},
+    {"route": "api/genres/<int:pk>", "path": "/api/genres/{genres}", "max_queries": 2},
+    {
+        "route": "api/album-of-the-days",
+        "path": "/api/album-of-the-days?limit=31",
+        "max_queries": 5,
+    },
+    {
+        "route": "api/album-of-the-days",
+        "path": "/api/album-of-the-days?limit=31&page=30",
+        "max_queries": 5,
+    },
+    {
+        "route": "api/album-of-the-days",
+        "path": "/api/album-of-the-days?date__gte=2021-06-01&date__lte=2021-06-30",
+        "max_queries": 5,
+    },
+    {
+        "route": "api/album-of-the-days",
+        "path": "/api/album-of-the-days?cursor=&limit=31",
+        "max_queries": 4,
+    },
+    {
+        "route": "api/album-of-the-days",
+        "path": "/api/album-of-the-days?search=Album+12",
+        "max_queries": 5,
+    },
+    {
+        "route": "api/album-of-the-days/<int:pk>",
+        "path": "/api/album-of-the-days/{album_of_the_days}",
+        "max_queries": 4,
+    },
+    {"route": "api/lists", "path": "/api/lists?limit=31", "max_queries": 6},
+    {"route": "api/lists", "path": "/api/lists?search=Album+12", "max_queries": 6},
+    {"route": "api/lists/<int:pk>", "path": "/api/lists/{lists}", "max_queries": 5},
+    {
+        "route": "api/daily-rotations",
+        "path": "/api/daily-rotations?limit=31",
+        "max_queries": 7,
+    },
+    {
+        "route": "api/daily-rotations",
+        "path": "/api/daily-rotations?cursor=&limit=31",
+        "max_queries": 6,
+    },
+    {
+        "route": "api/daily-rotations",
+        "path": "/api/daily-rotations?search=genre+12",
+        "max_queries": 7,
+    },
+    {
+        "route": "api/daily-rotations/<int:pk>",
+        "path": "/api/daily-rotations/{daily_rotations}",
+        "max_queries": 6,
+    },
+    {
+        "route": "api/<str:item>/available_months",
+        "path": "/api/album-of-the-days/available_months",
+        "max_queries": 1,
+    },
+    {
+        "route": "api/<str:item>/available_months",
+        "path": "/api/daily-rotations/available_months",
+        "max_queries": 1,
+    },
+    {"route": "api/statistics", "path": "/api/statistics", "max_queries": 4},
+    {"route": "spotify", "path": "/spotify?spotify_token=unknown", "max_queries": 1},
+    {"route": "spotify/auth", "path": "/spotify/auth", "max_queries": 0},
+    {"route": "spotify/callback", "path": "/spotify/callback", "max_queries": 0},
+    {
+        "route": "spotify/toggle",
+        "path": "/spotify/toggle?spotify_token=unknown&items=spotify:track:1",
+        "method": "post",
+        "max_queries": 1,
+    },
+    {
+        "route": "spotify/album/status",
+        "path": "/spotify/album/status?spotify_token=unknown&album_id={albums}",
+        "max_queries": 1,
+    },
+    {
+        "route": "spotify/albums/status",
+        "path": "/spotify/albums/status?spotify_token=unknown&album_ids={albums}",
+        "max_queries": 1,
+    },
+]
+# Routes that can only be requested if an optional dependency is installed.
+# Mapping: route --> module that must be importable
+OPTIONAL_ROUTE_DEPENDENCIES = {"api/schema": "inflection"}
+
+
+# (the index page uses static files, which are not collected when testing)
+@override_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+)
+class APIPerformanceTests(TestCase):
+    """Requests every route in urlpatterns against a synthetic catalogue and checks
+    the number of SQL queries and the wall time of each request."""
+
+    report: List[Dict] = []
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.catalogue = seed_synthetic_catalogue()
+        # Measure requests without anything cached
+        cache.clear()
+
+    def setUp(self):
+        cache.clear()  # (responses that other tests requested are cached)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Writes the machine-readable report once all requests have been measured."""
+        super().tearDownClass()
+        with open(API_BENCHMARK_REPORT_PATH, "w", encoding="UTF-8") as report_file:
+            json.dump(
+                {
+                    "generated_at": datetime.datetime.now().isoformat(),
+                    "catalogue_size": SYNTHETIC_CATALOGUE_SIZE,
+                    "max_seconds": API_BENCHMARK_MAX_SECONDS,
+                    "requests": cls.report,
+                },
+                report_file,
+                indent=2,
+            )
+
+    def test_every_route_has_a_budget(self):
+        """Ensures that new routes can not be added without a query budget."""
+        routes = {str(urlpattern.pattern) for urlpattern in urlpatterns}
+        routes_with_budget = {budget["route"] for budget in ROUTE_BUDGETS}
+        self.assertEqual(routes - routes_with_budget, set())
+
+    def test_route_budgets(self):
+        """Requests every route and checks it against its budget."""
+        for budget in ROUTE_BUDGETS:
+            # Fill out any IDs in the path, using an entry in the middle of the catalogue
+            path = budget["path"].format(
+                **{
+                    model_name: ids[len(ids) // 2]
+                    for model_name, ids in self.catalogue.items()
+                }
+            )
+            with self.subTest(path=path):
+                optional_dependency = OPTIONAL_ROUTE_DEPENDENCIES.get(budget["route"])
+                if (
+                    optional_dependency is not None
+                    and importlib.util.find_spec(optional_dependency) is None
+                ):
+                    self.skipTest(f"{optional_dependency} is not installed.")
+                # Use a new client for each request so that no cookies are shared
+                measurement = measure_request(
+                    self.client_class(), budget.get("method", "get"), path
+                )
+                self.report.append(
+                    {
+                        "route": budget["route"],
+                        "path": path,
+                        "status_code": measurement["status_code"],
+                        "queries": measurement["queries"],
+                        "max_queries": budget["max_queries"],
+                        "seconds": measurement["seconds"],
+                        "passed": measurement["queries"] <= budget["max_queries"]
+                        and measurement["seconds"] <= API_BENCHMARK_MAX_SECONDS,
+                    }
+                )
+                self.assertLess(measurement["status_code"], 500)
+                self.assertLessEqual(measurement["queries"], budget["max_queries"])
+                self.assertLessEqual(measurement["seconds"], API_BENCHMARK_MAX_SECONDS)
+
+    def test_keyset_pagination(self):
+        """Pages through all albums of the day and daily rotations using keyset pagination,
+        checking that every page runs the same number of queries and that every entry is returned once.
+        """
+        for path, date_key, catalogue_key, max_queries in [
+            ("/api/album-of-the-days?cursor=&limit=31", "date", "album_of_the_days", 4),
+            ("/api/daily-rotations?cursor=&limit=31", "day", "daily_rotations", 6),
+        ]:
+            with self.subTest(path=path):
+                entries = []
+                while path is not None:
+                    measurement = measure_request(self.client, "get", path)
+                    self.assertLessEqual(measurement["queries"], max_queries)
+                    response_json = measurement["response"].json()
+                    self.assertNotIn("count", response_json)
+                    entries.extend(response_json["results"])
+                    path = response_json["next"]
+                self.assertEqual(
+                    len({entry["id"] for entry in entries}),
+                    len(self.catalogue[catalogue_key]),
+                )
+                dates = [entry[date_key] for entry in entries]
+                self.assertEqual(dates, sorted(dates, reverse=True))
+                # Go back one page
+                previous_page = self.client.get(response_json["previous"]).json()
+                self.assertEqual(
+                    previous_page["results"][-1]["id"],
+                    entries[-len(response_json["results"]) - 1]["id"],
+                )
+
+    def test_hot_queries_use_indexes(self):
+        """Checks that frequently run queries use indexes rather than scanning whole tables."""
+        if connection.vendor != "sqlite":
+            self.skipTest("Query plans are only checked on SQLite.")
+        for result in explain_hot_queries(repeat=1):
+            with self.subTest(query=result["name"]):
+                self.assertIn("USING", result["plan"])
+                self.assertIn("INDEX", result["plan"])
+
+
+class GenreAlbumCountTests(TestCase):
+    """Checks that Genre.album_count is kept up to date when albums are changed."""
+
+    def setUp(self):
+        self.rock, self.folk = Genre.objects.bulk_create(
+            [Genre(name="rock"), Genre(name="folk")]
+        )
+        self.albums = Album.objects.bulk_create(
+            [Album(name=f"Album {i}") for i in range(3)]
+        )
+
+    def assertAlbumCounts(self, rock: int, folk: int):
+        self.rock.refresh_from_db()
+        self.folk.refresh_from_db()
+        self.assertEqual((self.rock.album_count, self.folk.album_count), (rock, folk))
+
+    def test_add_and_remove(self):
+        self.albums[0].genres.add(self.rock, self.folk)
+        self.albums[1].genres.add(self.rock)
+        self.albums[1].genres.add(self.rock)  # (adding twice should not count twice)
+        self.assertAlbumCounts(2, 1)
+        self.albums[0].genres.remove(self.rock)
+        self.albums[2].genres.remove(self.folk)  # (not in the genre)
+        self.assertAlbumCounts(1, 1)
+        self.albums[0].genres.set([self.rock])
+        self.assertAlbumCounts(2, 0)
+
+    def test_clear(self):
+        self.albums[0].genres.add(self.rock, self.folk)
+        self.albums[1].genres.add(self.rock)
+        self.albums[0].genres.clear()
+        self.assertAlbumCounts(1, 0)
+        self.rock.album_genres.clear()
+        self.assertAlbumCounts(0, 0)
+
+    def test_reverse_add_and_remove(self):
+        self.folk.album_genres.add(*self.albums)
+        self.assertAlbumCounts(0, 3)
+        self.folk.album_genres.remove(self.albums[0])
+        self.assertAlbumCounts(0, 2)
+
+    def test_delete_album(self):
+        self.albums[0].genres.add(self.rock, self.folk)
+        self.albums[1].genres.add(self.rock)
+        self.albums[0].delete()
+        self.assertAlbumCounts(1, 0)
+        Album.objects.all().delete()
+        self.assertAlbumCounts(0, 0)
+
+    def test_rebuild_command(self):
+        Album.genres.through.objects.bulk_create(
+            [
+                Album.genres.through(album_id=album.id, genre_id=self.rock.id)
+                for album in self.albums
+            ]
+        )
+        self.assertAlbumCounts(0, 0)  # (bulk inserts do not send any signals)
+        call_command("rebuild_genre_album_counts", stdout=io.StringIO())
+        self.assertAlbumCounts(3, 0)
+
+
+class StatisticsTests(TestCase):
+    """Checks that the cached statistics snapshot is correct and invalidated on changes."""
+
+    def setUp(self):
+        cache.clear()
+        self.rock = Genre.objects.create(name="rock")
+        self.artist = Artist.objects.create(name="Pavement")
+
+    def test_statistics_are_cached_and_invalidated(self):
+        self.assertEqual(get_statistics()["count"]["album"], 0)
+        with self.assertNumQueries(0):
+            get_statistics()
+        # (bulk_create is used to not retrieve album covers, the statistics are invalidated when adding genres)
+        album = Album.objects.bulk_create([Album(name="Slanted and Enchanted")])[0]
+        album.genres.add(self.rock)
+        album.artists.add(self.artist)
+        Genre.objects.create(name="indie rock")
+        statistics = get_statistics()
+        self.assertEqual(statistics["count"]["album"], 1)
+        self.assertEqual(statistics["count"]["genre"], 2)
+        self.assertEqual(statistics["top_genres"][0]["album_count"], 1)
+        self.assertEqual(statistics["top_artists"][0]["name"], "Pavement")
+        album.delete()
+        self.assertEqual(get_statistics()["count"]["album"], 0)
+
+
+class AvailableMonthsTests(TestCase):
+    """Checks the available months of albums of the day and when they are regenerated."""
+
+    def setUp(self):
+        cache.clear()
+        self.album = Album.objects.bulk_create([Album(name="Slanted and Enchanted")])[0]
+        for date in ["2021-01-02", "2021-01-03", "2021-03-01", "2022-12-31"]:
+            self.create_album_of_the_day(datetime.date.fromisoformat(date))
+
+    def create_album_of_the_day(self, date: datetime.date) -> AlbumOfTheDay:
+        return AlbumOfTheDay.objects.create(
+            album=self.album, date=date, comments_source="plain_text"
+        )
+
+    def test_available_months(self):
+        response = self.client.get("/api/album-of-the-days/available_months")
+        self.assertEqual(response.json(), {"2022": [12], "2021": [3, 1]})
+        self.assertEqual(list(response.json().keys()), ["2022", "2021"])
+
+    def test_cache_is_only_invalidated_for_new_months(self):
+        get_available_months(AlbumOfTheDay)
+        self.create_album_of_the_day(datetime.date(2021, 3, 2))
+        with self.assertNumQueries(0):
+            get_available_months(AlbumOfTheDay)
+        self.create_album_of_the_day(datetime.date(2023, 1, 1))
+        self.assertEqual(get_available_months(AlbumOfTheDay)["2023"], [1])
+        AlbumOfTheDay.objects.filter(date__year=2023).delete()
+        self.assertNotIn("2023", get_available_months(AlbumOfTheDay))
+
+    def test_entry_moved_between_months(self):
+        album_of_the_day = AlbumOfTheDay.objects.get(date=datetime.date(2022, 12, 31))
+        get_available_months(AlbumOfTheDay)
+        # Saving an entry without moving it keeps the cache
+        album_of_the_day.save()
+        with self.assertNumQueries(0):
+            get_available_months(AlbumOfTheDay)
+        # Moving the only entry in December 2022 to a month that is already cached empties December 2022
+        album_of_the_day.date = datetime.date(2021, 3, 2)
+        album_of_the_day.save()
+        self.assertEqual(get_available_months(AlbumOfTheDay), {"2021": [3, 1]})
+
+    def test_changes_from_other_processes(self):
+        get_available_months(DailyRotation)
+        # Daily rotations are created by a task, in another process (which does not change this process's cache)
+        DailyRotation.objects.bulk_create(
+            [DailyRotation(day=datetime.date(2023, 1, 1))]
+        )
+        self.assertEqual(get_available_months(DailyRotation), {})
+        with patch(
+            "time.time", return_value=time.time() + STATISTICS_CACHE_TIMEOUT + 1
+        ):
+            self.assertEqual(get_available_months(DailyRotation), {"2023": [1]})
+
+
+class PostgreSQLIndexTests(TestCase):
+    """Checks that the indexes that are only available on PostgreSQL are created outside of the models."""
+
+    def test_models_are_the_same_for_all_databases(self):
+        for model in apps.get_app_config("website").get_models():
+            for index in model._meta.indexes:
+                self.assertNotIn(
+                    "django.contrib.postgres", type(index).__module__, index.name
+                )
+
+    def test_indexes_are_created_on_postgresql(self):
+        schema_editor = MagicMock()
+        schema_editor.connection.vendor = "postgresql"
+        schema_editor.connection.introspection.get_constraints.return_value = {
+            "album_name_trgm": {}
+        }
+        create_postgresql_indexes(apps, schema_editor)
+        created_indexes = {
+            call.args[1].name for call in schema_editor.add_index.call_args_list
+        }
+        self.assertEqual(
+            created_indexes,
+            {
+                "artist_name_trgm",
+                "genre_name_trgm",
+                "searchdocument_document_trgm",
+                "searchdocument_document_fts",
+            },
+        )
+        # Nothing is created on other databases
+        schema_editor.reset_mock()
+        schema_editor.connection.vendor = "sqlite"
+        create_postgresql_indexes(apps, schema_editor)
+        schema_editor.add_index.assert_not_called()
+
+
+class SearchTests(TestCase):
+    """Checks that search documents are kept up to date and that all search backends find the same entries."""
+
+    def setUp(self):
+        self.pavement = Artist.objects.create(name="Pavement")
+        self.indie_rock = Genre.objects.create(name="indie rock")
+        # (bulk_create is used to not retrieve album covers, the documents are generated when adding artists)
+        self.slanted, self.crooked = Album.objects.bulk_create(
+            [
+                Album(name="Slanted and Enchanted"),
+                Album(name="Crooked Rain, Crooked Rain"),
+            ]
+        )
+        self.slanted.artists.add(self.pavement)
+        self.slanted.genres.add(self.indie_rock)
+        self.crooked.artists.add(self.pavement)
+        AlbumOfTheDay.objects.create(
+            album=self.slanted,
+            date=datetime.date(2023, 1, 1),
+            comments="A lo-fi classic.",
+            comments_source="plain_text",
+        )
+
+    def search_albums(self, query: str, backend: Optional[str] = None) -> Set[int]:
+        return set(
+            Album.objects.filter(pk__in=search(Album, [query], backend)).values_list(
+                "pk", flat=True
+            )
+        )
+
+    def test_backends_find_the_same_entries(self):
+        if connection.vendor == "sqlite":
+            self.assertEqual(get_search_backend(), "sqlite")
+        for backend in [get_search_backend(), "fallback"]:
+            with self.subTest(backend=backend):
+                both = {self.slanted.pk, self.crooked.pk}
+                self.assertEqual(self.search_albums("pavem", backend), both)
+                self.assertEqual(
+                    self.search_albums("INDIE", backend), {self.slanted.pk}
+                )
+                self.assertEqual(
+                    self.search_albums("pavement crooked", backend), {self.crooked.pk}
+                )
+                self.assertEqual(self.search_albums("jenny hval", backend), set())
+
+    def test_documents_are_updated(self):
+        self.pavement.name = "Silver Jews"
+        self.pavement.save()
+        self.assertEqual(
+            self.search_albums("silver"), {self.slanted.pk, self.crooked.pk}
+        )
+        self.slanted.genres.remove(self.indie_rock)
+        self.assertEqual(self.search_albums("indie"), set())
+        self.slanted.name = "Wowee Zowee"
+        self.slanted.save()
+        response = self.client.get("/api/album-of-the-days?search=wowee")
+        self.assertEqual(response.json()["count"], 1)
+        self.crooked.delete()
+        self.assertFalse(
+            SearchDocument.objects.filter(
+                model="website.album", object_id=self.crooked.pk
+            ).exists()
+        )
+
+    def test_api_search(self):
+        response = self.client.get("/api/albums?search=pavement")
+        self.assertEqual(response.json()["count"], 2)
+
+
+class ConditionalRequestTests(TestCase):
+    """Checks that unchanged responses are answered with 304 Not Modified, only querying the version of the data."""
+
+    def setUp(self):
+        cache.clear()
+        self.rock = Genre.objects.create(name="rock")
+
+    def test_not_modified(self):
+        response = self.client.get("/api/genres")
+        etag = response["ETag"]
+        with self.assertNumQueries(1):  # (the version of the data)
+            response = self.client.get("/api/genres", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            "/api/genres", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, 304)
+        # Other URLs have other ETags
+        response = self.client.get("/api/genres?search=rock", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_not_modified_after_a_long_time(self):
+        response = self.client.get("/api/genres")
+        # The version only changes when the data changes, so it does not matter how long ago the response was retrieved
+        with patch("time.time", return_value=time.time() + 24 * 60 * 60):
+            cache.clear()
+            not_modified_response = self.client.get(
+                "/api/genres", HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+        self.assertEqual(not_modified_response.status_code, 304)
+        self.assertEqual(not_modified_response["ETag"], response["ETag"])
+        self.assertEqual(
+            not_modified_response["Last-Modified"], response["Last-Modified"]
+        )
+
+    def test_modified(self):
+        etag = self.client.get("/api/genres")["ETag"]
+        # Adding an album to the genre changes its album count
+        album = Album.objects.bulk_create([Album(name="Slanted and Enchanted")])[0]
+        album.genres.add(self.rock)
+        response = self.client.get("/api/genres", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["album_count"], 1)
+        etag = response["ETag"]
+        self.rock.delete()
+        response = self.client.get("/api/genres", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 0)
+
+    def test_album_deleted(self):
+        albums = Album.objects.bulk_create(
+            [Album(name="Slanted and Enchanted"), Album(name="Wowee Zowee")]
+        )
+        self.rock.album_genres.add(*albums)
+        response = self.client.get("/api/genres")
+        self.assertEqual(response.json()["results"][0]["album_count"], 2)
+        # Deleting an album removes its genres without any m2m_changed signal
+        albums[0].delete()
+        response = self.client.get("/api/genres", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["album_count"], 1)
+
+
+class ResponseCacheTests(TestCase):
+    """Checks that responses to anonymous users are cached and that changes are visible right away."""
+
+    def setUp(self):
+        cache.clear()
+        self.pavement = Artist.objects.create(name="Pavement")
+
+    def test_responses_are_cached(self):
+        for path in ["/api/artists", f"/api/artists/{self.pavement.pk}"]:
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                with self.assertNumQueries(1):  # (the version of the data)
+                    cached_response = self.client.get(path)
+                self.assertEqual(cached_response.json(), response.json())
+        # Other pages are cached separately
+        self.assertEqual(self.client.get("/api/artists?page=2").status_code, 404)
+
+    def test_changes_are_visible(self):
+        self.assertEqual(self.client.get("/api/artists").json()["count"], 1)
+        Artist.objects.create(name="Silver Jews")
+        self.assertEqual(self.client.get("/api/artists").json()["count"], 2)
+        self.pavement.name = "Stephen Malkmus"
+        self.pavement.save()
+        response = self.client.get(f"/api/artists/{self.pavement.pk}")
+        self.assertEqual(response.json()["name"], "Stephen Malkmus")
+
+    def test_changes_from_other_processes_are_visible(self):
+        response = self.client.get("/api/artists")
+        # The versions are saved in the database, so they are not lost when a cache is cleared...
+        cache.clear()
+        self.assertEqual(self.client.get("/api/artists")["ETag"], response["ETag"])
+        # ...and changes made by other processes (which do not change this process's cache) are seen
+        Artist.objects.bulk_create([Artist(name="Silver Jews")])  # (sends no signals)
+        set_version(Artist)
+        self.assertEqual(self.client.get("/api/artists").json()["count"], 2)
+
+    def test_responses_are_cached_per_host(self):
+        Artist.objects.bulk_create([Artist(name="Silver Jews")])
+        for host in ["example.com", "api.example.com"]:
+            with self.subTest(host=host):
+                response = self.client.get("/api/artists?limit=1", HTTP_HOST=host)
+                self.assertTrue(response.json()["next"].startswith(f"http://{host}/"))
+
+
+class BackgroundJobTests(TestCase):
+    """Checks that jobs are queued once per album when artists are added, and how they are run."""
+
+    def setUp(self):
+        self.pavement = Artist.objects.create(name="Pavement")
+        # (jobs are submitted to the threads when the transaction is committed, which never happens in tests)
+        self.album = Album.objects.bulk_create([Album(name="Slanted and Enchanted")])[0]
+
+    def test_jobs_are_queued_once(self):
+        self.album.artists.add(self.pavement)
+        self.album.artists.add(Artist.objects.create(name="Silver Jews"))
+        self.assertEqual(
+            set(BackgroundJob.objects.values_list("name", "album", "status")),
+            {
+                ("retrieve_cover_url", self.album.pk, BackgroundJob.Status.QUEUED),
+                ("retrieve_spotify_uid", self.album.pk, BackgroundJob.Status.QUEUED),
+            },
+        )
+        # Albums that already have a cover do not need one
+        album_with_cover = Album.objects.bulk_create(
+            [Album(name="Wowee Zowee", cover_url="https://example.com/cover.png")]
+        )[0]
+        self.pavement.album_artists.add(album_with_cover)
+        self.assertEqual(
+            list(
+                BackgroundJob.objects.filter(album=album_with_cover).values_list(
+                    "name", flat=True
+                )
+            ),
+            ["retrieve_spotify_uid"],
+        )
+
+    def test_run_jobs(self):
+        def fail(album: Album):
+            raise ValueError("Not found")
+
+        self.album.artists.add(self.pavement)
+        jobs = {job.name: job for job in BackgroundJob.objects.all()}
+        with patch.dict(
+            JOB_FUNCTIONS,
+            {"retrieve_cover_url": lambda album: None, "retrieve_spotify_uid": fail},
+        ):
+            for job in jobs.values():
+                run_job(job.pk)
+            # Jobs only run once
+            run_job(jobs["retrieve_spotify_uid"].pk)
+        self.assertFalse(
+            BackgroundJob.objects.filter(pk=jobs["retrieve_cover_url"].pk).exists()
+        )
+        failed_job = BackgroundJob.objects.get(pk=jobs["retrieve_spotify_uid"].pk)
+        self.assertEqual(failed_job.status, BackgroundJob.Status.FAILED)
+        self.assertEqual(failed_job.attempts, 1)
+        self.assertEqual(failed_job.error, "Not found")
+        # Failed jobs are queued again
+        self.assertEqual(queue_jobs([self.album]), 2)
+
+    def test_resume_jobs(self):
+        self.album.artists.add(self.pavement)
+        BackgroundJob.objects.filter(name="retrieve_cover_url").update(
+            status=BackgroundJob.Status.RUNNING
+        )
+        with patch.dict(
+            JOB_FUNCTIONS,
+            {
+                "retrieve_cover_url": lambda album: None,
+                "retrieve_spotify_uid": lambda album: None,
+            },
+        ):
+            # Running jobs might be run by another process, so they are only run when resuming
+            call_command("run_background_jobs", stdout=io.StringIO())
+            self.assertEqual(
+                list(BackgroundJob.objects.values_list("name", "status")),
+                [("retrieve_cover_url", BackgroundJob.Status.RUNNING)],
+            )
+            call_command("run_background_jobs", "--resume", stdout=io.StringIO())
+        self.assertFalse(BackgroundJob.objects.exists())
+
+
+class CoverCheckTests(TestCase):
+    """Checks how albums are scheduled for cover checks."""
+
+    def setUp(self):
+        self.pavement = Artist.objects.create(name="Pavement")
+        self.now = timezone.now()
+
+    def create_album(self, name: str, **fields) -> Album:
+        album = Album.objects.bulk_create([Album(name=name, **fields)])[0]
+        Album.artists.through.objects.create(album=album, artist=self.pavement)
+        return album
+
+    def test_albums_to_check(self):
+        checked_with_cover = self.create_album(
+            "Wowee Zowee",
+            cover_url="https://example.com/cover.png",
+            cover_next_check_at=self.now - datetime.timedelta(days=2),
+        )
+        checked_without_cover = self.create_album(
+            "Terror Twilight", cover_next_check_at=self.now - datetime.timedelta(days=1)
+        )
+        new = self.create_album("Brighten the Corners")
+        self.create_album(
+            "Crooked Rain, Crooked Rain",
+            cover_next_check_at=self.now + datetime.timedelta(days=1),
+        )
+        Album.objects.bulk_create([Album(name="Westing")])  # (has no artists)
+        self.assertEqual(
+            get_albums_to_check(10), [new, checked_without_cover, checked_with_cover]
+        )
+        self.assertEqual(get_albums_to_check(1), [new])
+
+    def test_back_off(self):
+        album = self.create_album("Slanted and Enchanted")
+        for failures, delay in [(1, 1), (2, 2), (3, 4), (100, 30 * 24)]:
+            album.cover_check_failures = failures - 1
+            record_cover_check(album, False)
+            album.refresh_from_db()
+            self.assertEqual(album.cover_check_failures, failures)
+            self.assertEqual(
+                album.cover_next_check_at - album.cover_checked_at,
+                datetime.timedelta(hours=delay),
+            )
+        record_cover_check(album, True)
+        album.refresh_from_db()
+        self.assertEqual(album.cover_check_failures, 0)
+        self.assertEqual(
+            album.cover_next_check_at - album.cover_checked_at,
+            datetime.timedelta(days=30),
+        )
+
+    def test_changed_albums_are_checked_first(self):
+        album = self.create_album("Slanted and Enchanted")
+        record_cover_check(album, True)
+        album.refresh_from_db()
+        album.save()
+        self.assertIsNotNone(Album.objects.get(pk=album.pk).cover_next_check_at)
+        album.name = "Slanted & Enchanted"
+        album.save()
+        self.assertIsNone(Album.objects.get(pk=album.pk).cover_next_check_at)
+        record_cover_check(album, True)
+        album.artists.add(Artist.objects.create(name="Silver Jews"))
+        self.assertIsNone(Album.objects.get(pk=album.pk).cover_next_check_at)
+
+
+class SpotifyResolutionTests(TestCase):
+    """Checks how albums are looked up on Spotify and scheduled for Spotify checks."""
+
+    def setUp(self):
+        self.pavement = Artist.objects.create(name="Pavement")
+        self.album = Album.objects.bulk_create([Album(name="Wowee Zowee")])[0]
+        Album.artists.through.objects.create(album=self.album, artist=self.pavement)
+        self.client = MagicMock()
+        self.client.get_album_tracklist.return_value = [{"uri": "spotify:track:1"}]
+
+    def resolve(self):
+        with patch(
+            "website.models.get_spotify_client", return_value=(self.client, None)
+        ):
+            retrieve_and_update_spotify_uid_for_instance(self.album)
+        self.album.refresh_from_db()
+
+    def test_find_spotify_album(self):
+        deluxe = {
+            "id": "1",
+            "name": "Wowee Zowee: Sordid Sentinels Edition",
+            "artists": [{"name": "Pavement"}],
+        }
+        album = {"id": "2", "name": "wowee  zowee", "artists": [{"name": "PAVEMENT"}]}
+        self.assertEqual(
+            find_spotify_album("Wowee Zowee", "Pavement", [deluxe, album]),
+            (album, True),
+        )
+        self.assertEqual(
+            find_spotify_album("Wowee Zowee", "Pavement", [deluxe]), (deluxe, False)
+        )
+
+    def test_resolve(self):
+        self.client.search.return_value = [
+            {"id": "1", "name": "Wowee Zowee", "artists": [{"name": "Pavement"}]}
+        ]
+        self.resolve()
+        self.assertEqual(self.album.spotify_status, Album.SpotifyStatus.RESOLVED)
+        self.assertEqual(self.album.spotify_uid, "1")
+        self.assertEqual(self.album.spotify_track_uris, ["spotify:track:1"])
+        self.assertEqual(
+            self.album.spotify_next_check_at - self.album.spotify_checked_at,
+            datetime.timedelta(days=30),
+        )
+        # Albums that have been found are not searched for again
+        self.client.search.reset_mock()
+        self.resolve()
+        self.client.search.assert_not_called()
+        self.assertEqual(self.client.get_album_tracklist.call_count, 2)
+
+    def test_long_track_lists(self):
+        # (track lists used to be stored as a string of at most 5000 characters)
+        track_uris = [f"spotify:track:{i:022d}" for i in range(200)]
+        self.client.get_album_tracklist.return_value = [
+            {"uri": track_uri} for track_uri in track_uris
+        ]
+        self.client.search.return_value = [
+            {"id": "1", "name": "Wowee Zowee", "artists": [{"name": "Pavement"}]}
+        ]
+        self.resolve()
+        self.assertEqual(self.album.spotify_track_uris, track_uris)
+        self.assertEqual(
+            AlbumSerializer(self.album).data["spotify_track_uris"], track_uris
+        )
+
+    def test_not_found_and_ambiguous(self):
+        self.client.search.side_effect = SpotifyDataNotFound()
+        self.resolve()
+        self.assertEqual(self.album.spotify_status, Album.SpotifyStatus.NOT_FOUND)
+        self.assertIsNone(self.album.spotify_uid)
+        self.assertEqual(
+            self.album.spotify_next_check_at - self.album.spotify_checked_at,
+            datetime.timedelta(hours=1),
+        )
+        self.client.search.side_effect = None
+        self.client.search.return_value = [
+            {"id": "1", "name": "Terror Twilight", "artists": [{"name": "Pavement"}]}
+        ]
+        self.resolve()
+        self.assertEqual(self.album.spotify_status, Album.SpotifyStatus.AMBIGUOUS)
+        self.assertEqual(self.album.spotify_uid, "1")
+        self.assertEqual(
+            self.album.spotify_next_check_at - self.album.spotify_checked_at,
+            datetime.timedelta(hours=2),
+        )
+        # Ambiguous albums are searched for again
+        self.resolve()
+        self.assertEqual(self.client.search.call_count, 3)
+
+    def test_albums_to_check(self):
+        now = timezone.now()
+        resolved = Album.objects.bulk_create(
+            [
+                Album(
+                    name="Terror Twilight",
+                    spotify_status=Album.SpotifyStatus.RESOLVED,
+                    spotify_next_check_at=now - datetime.timedelta(days=2),
+                ),
+                Album(
+                    name="Brighten the Corners",
+                    spotify_status=Album.SpotifyStatus.NOT_FOUND,
+                    spotify_next_check_at=now - datetime.timedelta(days=1),
+                ),
+                Album(
+                    name="Westing",
+                    spotify_status=Album.SpotifyStatus.RESOLVED,
+                    spotify_next_check_at=now + datetime.timedelta(days=1),
+                ),
+            ]
+        )
+        for album in resolved:
+            Album.artists.through.objects.create(album=album, artist=self.pavement)
+        self.assertEqual(
+            get_albums_to_check_on_spotify(10),
+            [self.album, resolved[1], resolved[0]],
+        )
+        # Renamed albums are looked up again
+        resolved[0].name = "Terror Twilight: Farewell Horizontal"
+        resolved[0].save()
+        self.assertEqual(get_albums_to_check_on_spotify(2), [self.album, resolved[0]])
+
+    def test_bulk_track_list_updates(self):
+        found, missing = Album.objects.bulk_create(
+            [
+                Album(name="Terror Twilight", spotify_uid="1"),
+                Album(
+                    name="Westing",
+                    spotify_uid="2",
+                    spotify_status=Album.SpotifyStatus.RESOLVED,
+                ),
+            ]
+        )
+        self.assertTrue(has_spotify_album(found))
+        self.client.get_albums.return_value = [
+            {"id": "1", "tracks": {"items": [{"uri": "spotify:track:2"}]}},
+            None,
+        ]
+        with patch(
+            "website.models.get_spotify_client", return_value=(self.client, None)
+        ):
+            update_spotify_track_uris_for_instances([found, missing])
+        self.assertEqual(self.client.get_albums.call_count, 1)
+        found.refresh_from_db()
+        missing.refresh_from_db()
+        self.assertEqual(found.spotify_status, Album.SpotifyStatus.RESOLVED)
+        self.assertEqual(found.spotify_track_uris, ["spotify:track:2"])
+        # Albums that were not found are searched for again
+        self.assertEqual(missing.spotify_status, Album.SpotifyStatus.UNRESOLVED)
+        self.assertFalse(has_spotify_album(missing))
+
+
+class SpotifyTrackURIConversionTests(TestCase):
+    """Checks that track URIs that were saved when spotify_track_uris was a CharField can be converted to JSON."""
+
+    def test_invalid_values_are_normalized(self):
+        # (the albums table checks that the values are valid JSON, so a table like the one before the conversion is used)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TABLE old_album (id INTEGER PRIMARY KEY, spotify_track_uris VARCHAR(5000) NOT NULL)"
+            )
+            cursor.executemany(
+                "INSERT INTO old_album (id, spotify_track_uris) VALUES (%s, %s)",
+                enumerate(["", "not JSON", "{}", '["spotify:track:1"]']),
+            )
+        with patch.object(Album._meta, "db_table", "old_album"):
+            self.assertEqual(normalize_spotify_track_uris_in_database(connection), 3)
+            self.assertEqual(normalize_spotify_track_uris_in_database(connection), 0)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT spotify_track_uris FROM old_album ORDER BY id")
+            self.assertEqual(
+                [row[0] for row in cursor.fetchall()],
+                ["[]", "[]", "[]", '["spotify:track:1"]'],
+            )
+
+
+class SpotifyPlaylistCacheTests(TestCase):
+    """Checks that the items of users' linked playlists are cached and kept up to date."""
+
+    def setUp(self):
+        cache.clear()
+        spotify_sessions.clear()
+        self.user = SavedSpotifyUser.objects.create(
+            cookie_token="token",
+            access_token="access",
+            refresh_token="refresh",
+            token_expires_at=timezone.now() + datetime.timedelta(hours=1),
+            spotify_username="user",
+            spotify_user_id="user",
+            connected_playlist_id="playlist",
+        )
+        self.album = Album.objects.bulk_create(
+            [
+                Album(
+                    name="Wowee Zowee",
+                    spotify_uid="album",
+                    spotify_track_uris=["spotify:track:1"],
+                )
+            ]
+        )[0]
+        self.playlist = {"id": "playlist", "snapshot_id": "1"}
+        self.playlist_items = [{"track": {"uri": "spotify:track:2"}}]
+        self.item_requests = 0
+        self.spotify = MagicMock()
+        self.spotify.get_user_playlist_with_items = AsyncMock(
+            side_effect=self.get_user_playlist_with_items
+        )
+        self.spotify.add_items_to_playlist = AsyncMock()
+        self.spotify.remove_items_from_playlist = AsyncMock()
+        for patcher in [
+            patch("website.views.async_spotify_client", self.spotify),
+            patch("website.views.aget_spotify_user_from_saved"),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def get_user_playlist_with_items(
+        self,
+        user,
+        playlist_id,
+        fields=None,
+        item_fields=None,
+        only_if_changed_from=None,
+    ):
+        """Fake version of AsyncSpotifyClient.get_user_playlist_with_items."""
+        if only_if_changed_from == self.playlist["snapshot_id"]:
+            return dict(self.playlist), None
+        self.item_requests += 1
+        return dict(self.playlist), self.playlist_items
+
+    def is_added(self) -> bool:
+        response = self.client.get(
+            f"/spotify/album/status?spotify_token=token&album_id={self.album.id}"
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()["is_added_to_playlist"]
+
+    def test_status_is_cached(self):
+        self.assertFalse(self.is_added())
+        self.assertFalse(self.is_added())
+        self.assertEqual(self.spotify.get_user_playlist_with_items.call_count, 1)
+        self.assertEqual(self.item_requests, 1)
+        # Old cached items are used if the snapshot ID is the same...
+        with patch("website.views.SPOTIFY_PLAYLIST_CACHE_MAX_AGE", 0):
+            self.assertFalse(self.is_added())
+            self.assertEqual(self.spotify.get_user_playlist_with_items.call_count, 2)
+            self.assertEqual(self.item_requests, 1)
+            # ...and retrieved again if the playlist has changed
+            self.playlist["snapshot_id"] = "2"
+            self.playlist_items = [{"track": {"uri": "spotify:track:1"}}]
+            self.assertTrue(self.is_added())
+            self.assertEqual(self.item_requests, 2)
+
+    def test_toggle_updates_cache(self):
+        self.spotify.add_items_to_playlist.return_value = {"snapshot_id": "2"}
+        self.spotify.remove_items_from_playlist.return_value = {"snapshot_id": "3"}
+        self.assertFalse(self.is_added())
+        response = self.client.post(
+            "/spotify/toggle?spotify_token=token&items=spotify:track:1"
+        )
+        self.assertEqual(response.json()["number_of_added_items"], 1)
+        self.assertTrue(self.is_added())
+        # The toggle checks the snapshot ID, which has changed to the one that adding the items returned
+        self.playlist["snapshot_id"] = "2"
+        response = self.client.post(
+            "/spotify/toggle?spotify_token=token&items=spotify:track:1"
+        )
+        self.assertEqual(response.json()["number_of_removed_items"], 1)
+        self.assertFalse(self.is_added())
+        self.assertEqual(self.item_requests, 1)
+
+    def test_toggle_adds_and_removes_items(self):
+        self.spotify.add_items_to_playlist.return_value = {"snapshot_id": "2"}
+        self.spotify.remove_items_from_playlist.side_effect = SpotifyDataNotFound()
+        response = self.client.post(
+            "/spotify/toggle?spotify_token=token&items=spotify:track:1,spotify:track:2"
+        )
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json()["status"], "error")
+        self.spotify.remove_items_from_playlist.side_effect = None
+        self.spotify.remove_items_from_playlist.return_value = {"snapshot_id": "3"}
+        response = self.client.post(
+            "/spotify/toggle?spotify_token=token&items=spotify:track:1,spotify:track:2"
+        )
+        self.assertEqual(response.json()["number_of_added_items"], 1)
+        self.assertEqual(response.json()["number_of_removed_items"], 1)
+        self.assertEqual(self.spotify.add_items_to_playlist.call_count, 2)
+        self.assertTrue(self.is_added())
+        self.assertEqual(self.item_requests, 2)
+        # The order of the changes is not known, so the items are retrieved again when the snapshot ID is checked
+        self.playlist["snapshot_id"] = "3"
+        self.client.post("/spotify/toggle?spotify_token=token&items=spotify:track:1")
+        self.assertEqual(self.item_requests, 3)
+
+    def test_deleted_playlist(self):
+        self.spotify.get_user_playlist_with_items.side_effect = SpotifyDataNotFound()
+        self.spotify.create_playlist = AsyncMock(
+            return_value={"id": "new_playlist", "snapshot_id": "1"}
+        )
+        self.spotify.add_items_to_playlist.return_value = {"snapshot_id": "2"}
+        # Checking the status does not create a new playlist...
+        self.assertFalse(self.is_added())
+        self.spotify.create_playlist.assert_not_called()
+        # ...but changing the playlist does
+        response = self.client.post(
+            "/spotify/toggle?spotify_token=token&items=spotify:track:1"
+        )
+        self.assertEqual(response.json()["number_of_added_items"], 1)
+        self.spotify.create_playlist.assert_called_once()
+        self.assertEqual(
+            self.spotify.add_items_to_playlist.call_args.kwargs["playlist_id"],
+            "new_playlist",
+        )
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.connected_playlist_id, "new_playlist")
+
+    def test_errors_do_not_create_playlist(self):
+        self.spotify.get_user_playlist_with_items.side_effect = SpotifyAPIException()
+        self.spotify.create_playlist = AsyncMock()
+        with self.assertRaises(SpotifyAPIException):
+            self.client.get(
+                f"/spotify/album/status?spotify_token=token&album_id={self.album.id}"
+            )
+        with self.assertRaises(SpotifyAPIException):
+            self.client.post(
+                "/spotify/toggle?spotify_token=token&items=spotify:track:1"
+            )
+        self.spotify.create_playlist.assert_not_called()
+        self.spotify.add_items_to_playlist.assert_not_called()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.connected_playlist_id, "playlist")
+
+    def test_batch_status(self):
+        other_album, album_without_uid = Album.objects.bulk_create(
+            [
+                Album(
+                    name="Brighten the Corners",
+                    spotify_uid="other_album",
+                    spotify_track_uris=["spotify:track:2"],
+                ),
+                Album(name="Terror Twilight"),
+            ]
+        )
+        album_ids = [self.album.id, other_album.id, album_without_uid.id, 0]
+        with self.assertNumQueries(2):  # (the user and the albums)
+            response = self.client.get(
+                f"/spotify/albums/status?spotify_token=token&album_ids={','.join(map(str, album_ids))}"
+            )
+        self.assertEqual(
+            response.json()["albums"],
+            {
+                str(self.album.id): {
+                    "is_added_to_playlist": False,
+                    "spotify_uid": "album",
+                },
+                str(other_album.id): {
+                    "is_added_to_playlist": True,
+                    "spotify_uid": "other_album",
+                },
+                str(album_without_uid.id): {
+                    "is_added_to_playlist": False,
+                    "spotify_uid": None,
+                },
+            },
+        )
+        self.assertEqual(self.item_requests, 1)
+        response = self.client.get(
+            "/spotify/albums/status?spotify_token=token&album_ids=1,a"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class SpotifySessionTests(TestCase):
+    """Checks that Spotify users are reused between requests and that token refreshes are saved."""
+
+    def setUp(self):
+        spotify_sessions.clear()
+        self.addCleanup(spotify_sessions.clear)
+        self.user = SavedSpotifyUser.objects.create(
+            cookie_token="token",
+            access_token="access",
+            refresh_token="refresh",
+            token_expires_at=timezone.now() + datetime.timedelta(hours=1),
+            spotify_username="user",
+            spotify_user_id="user",
+            connected_playlist_id="playlist",
+        )
+        self.request = RequestFactory().get("/spotify?spotify_token=token")
+
+    def test_sessions_are_reused(self):
+        with patch("website.views.create_spotify_user_from_saved") as create:
+            self.assertEqual(
+                get_saved_spotify_profile_from_request(self.request, source="url"),
+                self.user,
+            )
+            with self.assertNumQueries(0):
+                self.assertEqual(
+                    get_saved_spotify_profile_from_request(self.request, source="url"),
+                    self.user,
+                )
+            self.assertEqual(create.call_count, 1)
+            # Sessions expire
+            with patch("website.views.SPOTIFY_SESSION_TTL", -1):
+                get_saved_spotify_profile_from_request(self.request, source="url")
+            self.assertEqual(create.call_count, 2)
+
+    def test_updated_tokens_are_saved(self):
+        spotify_user = MagicMock(
+            linked_database_id=self.user.id,
+            access_token="new_access",
+            expires_datetime=timezone.now() + datetime.timedelta(hours=2),
+        )
+        with self.assertNumQueries(1):
+            on_updated_tokens(spotify_user)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.access_token, "new_access")
+
+    def test_async_sessions_are_reused(self):
+        with patch("website.views.acreate_spotify_user_from_saved") as create:
+            user, spotify_user = async_to_sync(get_saved_spotify_user_from_request)(
+                self.request
+            )
+            self.assertEqual(user, self.user)
+            with self.assertNumQueries(0):
+                self.assertEqual(
+                    async_to_sync(get_saved_spotify_user_from_request)(self.request),
+                    (user, spotify_user),
+                )
+        self.assertEqual(create.call_count, 1)
+
+    def test_async_token_refresh_is_saved(self):
+        """Tokens that the asyncio client refreshes are saved without any synchronous requests."""
+        self.user.token_expires_at = timezone.now() - datetime.timedelta(minutes=1)
+        self.user.save()
+        spotify_user = SpotifyUser(
+            client_id=async_spotify_client.client_id,
+            authorization_header=async_spotify_client.authorization_header,
+            user_agent=async_spotify_client.user_agent,
+            retrieve_user_information=False,
+            **get_spotify_user_arguments(self.user),
+        )
+        with patch.object(
+            async_spotify_client,
+            "send_unauthorized_request",
+            AsyncMock(
+                return_value={
+                    "token_type": "Bearer",
+                    "access_token": "new_access",
+                    "expires_in": 3600,
+                }
+            ),
+        ) as send_request, patch(
+            "spotify_api_client.client.send_request"
+        ) as send_synchronous_request:
+            self.assertEqual(
+                async_to_sync(async_spotify_client.get_access_token)(spotify_user),
+                "new_access",
+            )
+        send_request.assert_awaited_once()
+        send_synchronous_request.assert_not_called()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.access_token, "new_access")
+        self.assertGreater(self.user.token_expires_at, timezone.now())
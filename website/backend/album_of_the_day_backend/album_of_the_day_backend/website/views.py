@@ -1,13 +1,25 @@
+import asyncio
 import datetime
 import logging
 import secrets, sys
+import threading
+import time
 
 import pytz
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
 from .models import *
 from .permissions import IsAllowedToEdit
+from album_of_the_day.rest_framework_settings import OptionalKeysetPaginationSettings
+from .search import (
+    OBJECT_TO_SEARCHABLE_FIELDS,
+    SEARCH_DOCUMENT_FIELDS,
+    SearchDocumentFilter,
+)
+from .caching import CachedResponseMixin, ConditionalResponseMixin, VERSIONED_MODELS
+from .statistics import get_available_months, get_statistics
 from rest_framework.response import Response
-from rest_framework import mixins, generics, views, permissions
+from rest_framework import mixins, generics, views
 from rest_framework.exceptions import APIException
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from django_filters.rest_framework import DjangoFilterBackend
@@ -15,18 +27,22 @@ from django_filters.rest_framework import DjangoFilterBackend
 # from url_filter.integrations.drf import DjangoFilterBackend
 from filters.mixins import FiltersMixin
 from rest_framework.filters import SearchFilter, OrderingFilter
-from typing import List, Dict, Optional, Type
+from typing import Iterable, List, Dict, NamedTuple, Optional, Set, Tuple, Type, Union
+from django.core.cache import cache
 from django.db.models import Model, Prefetch
 from django.http import HttpRequest, HttpResponse, JsonResponse
 from django.shortcuts import redirect
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from spotify_api_client.client import (
     SpotifyClient,
     SpotifyUser,
     SpotifyScope,
-    SpotifyAPIException,
-    SpotifyDataNotFound,
     SpotifyAuthenticationRevoked,
+    SpotifyDataNotFound,
 )
+from spotify_api_client.async_client import AsyncSpotifyClient
 from django.utils.crypto import get_random_string
 from enum import Enum
 from .api_exceptions import (
@@ -38,46 +54,6 @@ from .api_exceptions import (
 logger = logging.getLogger(__name__)
 
 
-OBJECT_TO_SEARCHABLE_FIELDS = {  # Mapping: object --> searchable field
-    Album: ["name", "id", ("genres", Genre)],
-    Artist: ["name", "id"],
-    Genre: ["name", "id"],
-    AlbumList: ["name", "id", "description", ("items", AlbumListItem)],
-    AlbumListItem: [("album", Album), "comments", "heading", "body"],
-    DailyRotation: ["day", "id", "description"],
-}
-
-
-def generate_searchable_parameters(
-    internal_fields: List, external_fields: Dict[str, Model]
-):
-    """For the Django search API, you can not specify searchable fields
-    that are ManyToManyField or ForeignKeys without setting what the searchable attributes of those
-    fields are. Since I'm reusing relationships, this function will be able to generate
-    and centralize what the searchable parameters for each model are and generate a list with
-    these parameters.
-
-    :param internal_fields The internal fields that should be searchable in a view.
-
-    :param external_fields The IDs of any external fields that should be searchable in a view.
-    For example, if a model has a list of Genre(s) under the key "genre", you can pass
-    {"genres": Genre} to generate the searchable parameters."""
-    searchable_parameters = internal_fields
-    for external_key, external_object_type in external_fields.items():
-        # Get the searchable fields for each object type
-        for searchable_field in OBJECT_TO_SEARCHABLE_FIELDS[external_object_type]:
-            if isinstance(searchable_field, str):
-                searchable_parameters.append(f"{external_key}__{searchable_field}")
-            else:  # Allow nesting relationships - somewhat hacky, but whatever:)
-                searchable_parameters.extend(
-                    generate_searchable_parameters(
-                        [],
-                        {f"{external_key}__{searchable_field[0]}": searchable_field[1]},
-                    )
-                )
-    return searchable_parameters
-
-
 def generate_filter_mappings_from_searchable_parameters(
     searchable_parameters: List[str], extensions: Optional[Dict[str, List[str]]] = None
 ) -> Dict[str, str]:
@@ -127,27 +103,25 @@ def attrs_to_prefetches(attrs):
     return prefetches
 
 
-class AlbumView(FiltersMixin, generics.ListCreateAPIView):
+class AlbumView(CachedResponseMixin, FiltersMixin, generics.ListCreateAPIView):
     """Lists all albums that are in the database."""
 
-    queryset = Album.objects.prefetch_related(*(ALBUM_RELATED_FIELDS))
+    queryset = Album.objects.prefetch_related(*generate_album_prefetches())
     serializer_class = AlbumSerializer
-    filter_backends = [SearchFilter, OrderingFilter]
+    filter_backends = [SearchDocumentFilter, OrderingFilter]
     filterset_fields = ["artists", "genres"]
-    search_fields = generate_searchable_parameters(
-        ["name", "id"], {"artists": Artist, "genres": Genre}
-    )
+    search_fields = SEARCH_DOCUMENT_FIELDS[Album]
     filter_mappings = generate_filter_mappings_from_searchable_parameters(search_fields)
 
 
-class IndividualAlbumView(generics.RetrieveUpdateDestroyAPIView):
+class IndividualAlbumView(CachedResponseMixin, generics.RetrieveUpdateDestroyAPIView):
     """Retrieves an individual album."""
 
-    queryset = Album.objects.prefetch_related(*(ALBUM_RELATED_FIELDS))
+    queryset = Album.objects.prefetch_related(*generate_album_prefetches())
     serializer_class = AlbumSerializer
 
 
-class ArtistView(generics.ListCreateAPIView):
+class ArtistView(CachedResponseMixin, generics.ListCreateAPIView):
     """Lists all artists that are in the database."""
 
     queryset = Artist.objects.all()
@@ -157,14 +131,14 @@ class ArtistView(generics.ListCreateAPIView):
     search_fields = OBJECT_TO_SEARCHABLE_FIELDS[Artist]
 
 
-class IndividualArtistView(generics.RetrieveUpdateDestroyAPIView):
+class IndividualArtistView(CachedResponseMixin, generics.RetrieveUpdateDestroyAPIView):
     """Retrieves an individual artist."""
 
     queryset = Artist.objects.all()
     serializer_class = ArtistSerializer
 
 
-class GenreView(generics.ListCreateAPIView):
+class GenreView(CachedResponseMixin, generics.ListCreateAPIView):
     """Lists all genres that are in the database."""
 
     queryset = Genre.objects.all()
@@ -174,103 +148,104 @@ class GenreView(generics.ListCreateAPIView):
     search_fields = OBJECT_TO_SEARCHABLE_FIELDS[Genre]
 
 
-class IndividualGenreView(generics.RetrieveUpdateDestroyAPIView):
+class IndividualGenreView(CachedResponseMixin, generics.RetrieveUpdateDestroyAPIView):
     """Retrieves an individual genre."""
 
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
 
 
-class AlbumOfTheDayView(FiltersMixin, generics.ListCreateAPIView):
+class AlbumOfTheDayView(CachedResponseMixin, FiltersMixin, generics.ListCreateAPIView):
     """Lists all albums of the day that are in the database."""
 
-    queryset = AlbumOfTheDay.objects.prefetch_related(*ALBUM_OF_THE_DAY_RELATED_FIELDS)
+    queryset = generate_album_of_the_day_queryset()
     serializer_class = AlbumOfTheDaySerializer
-    filter_backends = [SearchFilter, OrderingFilter]
+    filter_backends = [SearchDocumentFilter, OrderingFilter]
     ordering = ["-date"]
-    search_fields = generate_searchable_parameters(
-        ["date", "comments"], {"album": Album}
-    )
+    # Opt-in keyset pagination (see rest_framework_settings.py)
+    pagination_class = OptionalKeysetPaginationSettings
+    keyset_ordering = ("-date", "-id")
+    search_fields = SEARCH_DOCUMENT_FIELDS[AlbumOfTheDay]
     filter_mappings = generate_filter_mappings_from_searchable_parameters(
         search_fields, {"date": ["gte", "lte", "exact"]}
     )
 
 
-class IndividualAlbumOfTheDayView(generics.RetrieveUpdateDestroyAPIView):
+class IndividualAlbumOfTheDayView(
+    CachedResponseMixin, generics.RetrieveUpdateDestroyAPIView
+):
     """Retrieves an individual album of the day."""
 
-    queryset = AlbumOfTheDay.objects.prefetch_related(*ALBUM_OF_THE_DAY_RELATED_FIELDS)
+    queryset = generate_album_of_the_day_queryset()
     serializer_class = AlbumOfTheDaySerializer
 
 
-class AlbumListView(FiltersMixin, generics.ListCreateAPIView):
+class AlbumListView(CachedResponseMixin, FiltersMixin, generics.ListCreateAPIView):
     """Lists all album lists that are in the database."""
 
-    queryset = AlbumList.objects.prefetch_related(*ALBUM_LIST_RELATED_FIELDS)
+    queryset = AlbumList.objects.prefetch_related(*generate_album_list_prefetches())
     serializer_class = AlbumListSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, SearchDocumentFilter, OrderingFilter]
     filterset_fields = ["name", "id"]
-    search_fields = generate_searchable_parameters(
-        ["name", "id"], {"items": AlbumListItem}
-    )
+    search_fields = SEARCH_DOCUMENT_FIELDS[AlbumList]
     filter_mappings = generate_filter_mappings_from_searchable_parameters(search_fields)
 
 
-class IndividualAlbumListView(generics.RetrieveUpdateDestroyAPIView):
+class IndividualAlbumListView(
+    CachedResponseMixin, generics.RetrieveUpdateDestroyAPIView
+):
     """Retrieves an individual album list."""
 
-    queryset = AlbumList.objects.all()
+    queryset = AlbumList.objects.prefetch_related(*generate_album_list_prefetches())
     serializer_class = AlbumListSerializer
 
 
-class DailyRotationView(FiltersMixin, generics.ListCreateAPIView):
+class DailyRotationView(CachedResponseMixin, FiltersMixin, generics.ListCreateAPIView):
     """Lists all daily rotations that are in the database."""
 
-    queryset = DailyRotation.objects.prefetch_related(*DAILY_ROTATION_RELATED_FIELDS)
+    queryset = DailyRotation.objects.prefetch_related(
+        *generate_daily_rotation_prefetches()
+    )
     serializer_class = DailyRotationSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, SearchDocumentFilter, OrderingFilter]
+    # Opt-in keyset pagination (see rest_framework_settings.py)
+    pagination_class = OptionalKeysetPaginationSettings
+    keyset_ordering = ("-day", "-id")
     filterset_fields = ["day", "id"]
-    search_fields = generate_searchable_parameters(
-        ["day", "id"], {"genres": Genre, "albums": Album}
-    )
+    search_fields = SEARCH_DOCUMENT_FIELDS[DailyRotation]
     filter_mappings = generate_filter_mappings_from_searchable_parameters(
         search_fields, {"day": ["gte", "lte", "exact"]}
     )
 
 
-class IndividualDailyRotationView(generics.RetrieveUpdateDestroyAPIView):
+class IndividualDailyRotationView(
+    CachedResponseMixin, generics.RetrieveUpdateDestroyAPIView
+):
     """Retrieves an individual daily rotation."""
 
-    queryset = DailyRotation.objects.all()
+    queryset = DailyRotation.objects.prefetch_related(
+        *generate_daily_rotation_prefetches()
+    )
     serializer_class = DailyRotationSerializer
 
 
-class AllTimeStatisticsView(views.APIView):
+class AllTimeStatisticsView(ConditionalResponseMixin, views.APIView):
     """Shows an overview of statistics of all time, such as how many albums that
     is in the database etc."""
 
+    version_models = VERSIONED_MODELS
+
     def get(self, *args, **kwargs):
-        """Respond with the all time statistics."""
-        entries = [
-            ("album_of_the_day", AlbumOfTheDay),  # Mapping: ID --> model
-            ("album", Album),
-            ("list", AlbumList),
-            ("genre", Genre),
-            ("artist", Artist),
-            ("daily_rotation", DailyRotation),
-        ]
-        # Generate the counts
-        logger.info("Generating counts for all-time statistics...")
-        response_json = {"count": {}}
-        for entry_id, entry_object in entries:
-            response_json["count"][entry_id] = len(entry_object.objects.all())
-        return Response(response_json)
-
-
-class ItemAvailableMonthsView(views.APIView):
+        """Respond with the all time statistics. See statistics.py."""
+        return Response(get_statistics())
+
+
+class ItemAvailableMonthsView(ConditionalResponseMixin, views.APIView):
     """Get all the years and months that there are available album of the days
     or daily rotations for."""
 
+    version_models = [AlbumOfTheDay, DailyRotation]
+
     def get(self, request, item, *args, **kwargs):
         ITEMS_TO_MODEL: Dict[
             str, Type[Model]
@@ -286,48 +261,18 @@ class ItemAvailableMonthsView(views.APIView):
                 f"Invalid \"item\" key: please use one of {','.join(ITEMS_TO_MODEL)}"
             )
         requested_model = ITEMS_TO_MODEL[requested_item]
-        requested_items = requested_model.objects.all()
-        response_json: Dict[str, List[int]] = {}
-        response_json_ordered: OrderedDict[str, List[int]] = OrderedDict()
-        # Create the response JSON: unordered
-        for item in requested_items:
-            if requested_model == AlbumOfTheDay:
-                model_date = item.date
-            elif requested_model == DailyRotation:
-                model_date = item.day
-            model_year = str(model_date.year)
-            model_month = model_date.month
-            if model_year not in response_json:
-                response_json[model_year] = []
-            if model_month not in response_json[model_year]:
-                response_json[model_year].append(model_month)
-        # Order the response JSON
-        year_order = list(response_json.keys())
-        year_order.sort(key=lambda year: int(year), reverse=True)
-        for year in year_order:
-            response_json_ordered[year] = response_json[year]
-            response_json_ordered[year].sort(reverse=True)
-        return Response(response_json_ordered)
+        return Response(get_available_months(requested_model))
 
 
 # Custom views created for "save to Spotify"
 # This is a function where the user can save any album to their Spotify
 # profile for later.
-def get_saved_spotify_profile_from_request(
+def get_spotify_cookie_token_from_request(
     request: HttpRequest, source: Optional[str] = None
-) -> Optional[SavedSpotifyUser]:
-    """Retrieves a profile based of a token that is connected to a Spotify account (if any).
-    Token is set as a URL query parameter.
-    If the token is not set or does not link to an active account, None is returned.
-    NOTE: You have to prevalidate that spotify_token exists in request.GET before calling this function.
-
-    :param request The incoming request from Django.
-
-    :param source: Where to get the token from. "cookies" to get it in cookies, "url" to get it from the URL parameter. Optional
-    value, default is "cookies"
-    """
-    logger.info("Checking for saved Spotify token from request...")
-    # The "source" argument allows us to get the token from a certain source (see above).
+) -> Optional[str]:
+    """Gets the token that is connected to a Spotify account from a request, if any.
+    See get_saved_spotify_profile_from_request for the parameters."""
+    # The "source" argument allows us to get the token from a certain source (see get_saved_spotify_profile_from_request).
     # Here, we retrieve it.
     VALID_SOURCE_ARGUMENT_VALUES = ["cookies", "url"]
     if source is None:
@@ -344,9 +289,31 @@ def get_saved_spotify_profile_from_request(
         raise ValueError(
             f"Invalid source type requested: \"{source}\" (must be one of: {','.join(VALID_SOURCE_ARGUMENT_VALUES)}"
         )
+    return cookie_token
+
+
+def get_saved_spotify_profile_from_request(
+    request: HttpRequest, source: Optional[str] = None
+) -> Optional[SavedSpotifyUser]:
+    """Retrieves a profile based of a token that is connected to a Spotify account (if any).
+    Token is set as a URL query parameter.
+    If the token is not set or does not link to an active account, None is returned.
+    NOTE: You have to prevalidate that spotify_token exists in request.GET before calling this function.
+
+    :param request The incoming request from Django.
+
+    :param source: Where to get the token from. "cookies" to get it in cookies, "url" to get it from the URL parameter. Optional
+    value, default is "cookies"
+    """
+    logger.info("Checking for saved Spotify token from request...")
+    cookie_token = get_spotify_cookie_token_from_request(request, source)
     if cookie_token is None:
         logger.info("Did not find Spotify profile: no cookie token included/passed.")
         return None
+    spotify_session = get_spotify_session(cookie_token)
+    if spotify_session is not None:
+        logger.info("Found Spotify profile in the session registry.")
+        return spotify_session.saved_user
     spotify_profile = SavedSpotifyUser.objects.filter(cookie_token=cookie_token).first()
     spotify_user = None
     if spotify_profile is not None:
@@ -358,6 +325,7 @@ def get_saved_spotify_profile_from_request(
             logger.warning(
                 "Authentication was revoked. Removing the user from the database..."
             )
+            remove_spotify_session(cookie_token)
             spotify_profile.delete()
             logger.info("The user was deleted.")
     else:
@@ -367,7 +335,7 @@ def get_saved_spotify_profile_from_request(
     return None
 
 
-def create_user_album_of_the_day_playlist(
+async def create_user_album_of_the_day_playlist(
     spotify_user: SpotifyUser, database_instance: SavedSpotifyUser
 ):
     """Each user has a playlist where everything they save end up. This function creates this playlist, with
@@ -380,7 +348,7 @@ def create_user_album_of_the_day_playlist(
     logger.info(
         f"Creating album of the day for playlist for Spotify user {spotify_user.username}..."
     )
-    new_playlist = spotify_client.create_playlist(
+    new_playlist = await async_spotify_client.create_playlist(
         user=spotify_user,
         name="🔖 Album of the day: sparat",
         description="Hemsidan Album of the day samlar tankar skrivna om album, ett nytt, varje dag. I denna spellista hamnar den första låten på alla album som har sparats av mig när jag valt att trycka på en knapp för att spara ett album till min Spotify.",
@@ -390,12 +358,12 @@ def create_user_album_of_the_day_playlist(
         f"New playlist created for Spotify user {spotify_user.username}. Saving in database..."
     )
     database_instance.connected_playlist_id = new_playlist["id"]
-    database_instance.save()
+    await database_instance.asave()
     logger.info("Database updated with new playlist.")
     return new_playlist  # Return the new playlist
 
 
-def get_user_album_of_the_day_playlist(
+async def get_user_album_of_the_day_playlist(
     spotify_user: SpotifyUser, database_instance: SavedSpotifyUser
 ):
     """Each user has a playlist where everything they save end up. This function retrieves this playlist, with
@@ -408,8 +376,11 @@ def get_user_album_of_the_day_playlist(
     """
     logger.info(f"Checking for playlist for Spotify user {spotify_user.username}...")
     try:
-        playlist_data = spotify_client.get_user_playlist(
-            spotify_user, database_instance.connected_playlist_id
+        # (only the ID and the snapshot ID are used, so the tracks are not retrieved)
+        playlist_data = await async_spotify_client.get_user_playlist(
+            spotify_user,
+            database_instance.connected_playlist_id,
+            fields="id,snapshot_id",
         )
         logger.info(
             f"Succeeded to retrieve connected playlist data for {spotify_user.username} ({playlist_data})."
@@ -422,7 +393,9 @@ def get_user_album_of_the_day_playlist(
         )
         # Here, we create a new playlist
         logger.info("Creating a new playlist for the user...")
-        return create_user_album_of_the_day_playlist(spotify_user, database_instance)
+        return await create_user_album_of_the_day_playlist(
+            spotify_user, database_instance
+        )
 
 
 def on_updated_tokens(spotify_user: SpotifyUser):
@@ -432,90 +405,337 @@ def on_updated_tokens(spotify_user: SpotifyUser):
 
     :param spotify_user: The Spotify user with the correct tokens."""
     logger.info("Updating Spotify tokens for saved Spotify user...")
-    saved_spotify_user = SavedSpotifyUser.objects.filter(
-        id=spotify_user.linked_database_id
-    ).first()  # Note: I do not catch the None case because it should not be expected.
-    saved_spotify_user.token_expires_at = spotify_user.expires_datetime
-    saved_spotify_user.access_token = spotify_user.access_token
-    logger.info("Access tokens have been updated in memory. Updating database...")
-    saved_spotify_user.save()
+    # (updated with one query, without retrieving the user first)
+    SavedSpotifyUser.objects.filter(id=spotify_user.linked_database_id).update(
+        token_expires_at=spotify_user.expires_datetime,
+        access_token=spotify_user.access_token,
+    )
     logger.info("Spotify user has been updated in database. Tokens have been saved.")
 
 
-def get_spotify_user_from_saved(database_instance: SavedSpotifyUser):
-    """Creates a SpotifyUser (for use with the API client) from a saved Spotify user (SavedSpotifyUser).
+# Spotify users are kept in memory (per process) for a short time after they have been looked up, so that requests
+# from the same user do not have to look up their saved profile and retrieve their Spotify profile again.
+# Since the same SpotifyUser is shared, concurrent requests also share its token refreshes.
+SPOTIFY_SESSION_TTL = int(os.environ.get("SPOTIFY_SESSION_TTL", 5 * 60))
+
+
+class SpotifySession(NamedTuple):
+    """A saved Spotify user and the SpotifyUser that is used to send requests as them."""
+
+    saved_user: SavedSpotifyUser
+    spotify_user: SpotifyUser
+    created_at: float  # A UNIX timestamp
+
+
+# Mapping: cookie token --> session
+spotify_sessions: Dict[str, SpotifySession] = {}
+# Mapping: cookie token --> lock that is held while the user's session is created. The asynchronous views use
+# asyncio locks (see aget_spotify_user_from_saved), which only work within one event loop (as when served using ASGI).
+spotify_session_locks: Dict[str, threading.Lock] = {}
+async_spotify_session_locks: Dict[str, asyncio.Lock] = {}
+spotify_sessions_lock = threading.Lock()
+
+
+def get_spotify_session(cookie_token: str) -> Optional[SpotifySession]:
+    """Gets the session of a user from the session registry.
+
+    :param cookie_token: The cookie token of the saved Spotify user.
+
+    :returns The session, or None if the user does not have a session or if it has expired.
+    """
+    with spotify_sessions_lock:
+        spotify_session = spotify_sessions.get(cookie_token)
+    if (
+        spotify_session is None
+        or time.time() - spotify_session.created_at > SPOTIFY_SESSION_TTL
+    ):
+        return None
+    return spotify_session
+
+
+def remove_spotify_session(cookie_token: str) -> None:
+    """Removes the session of a user from the session registry, if any.
+
+    :param cookie_token: The cookie token of the saved Spotify user."""
+    with spotify_sessions_lock:
+        spotify_sessions.pop(cookie_token, None)
+
+
+def get_spotify_session_lock(
+    cookie_token: str, asynchronous: bool = False
+) -> Union[threading.Lock, asyncio.Lock]:
+    """Returns the lock that is held while the session of a user is created, so that only one
+    request at a time creates it. Removes the sessions and locks of other users that have expired.
+
+    :param cookie_token: The cookie token of the saved Spotify user.
+
+    :param asynchronous: True to return an asyncio lock, False to return a lock for threads.
+    """
+    locks = async_spotify_session_locks if asynchronous else spotify_session_locks
+    with spotify_sessions_lock:
+        now = time.time()
+        for expired_cookie_token in [
+            other_cookie_token
+            for other_cookie_token, spotify_session in spotify_sessions.items()
+            if now - spotify_session.created_at > SPOTIFY_SESSION_TTL
+        ]:
+            del spotify_sessions[expired_cookie_token]
+            for expired_locks in [spotify_session_locks, async_spotify_session_locks]:
+                expired_lock = expired_locks.get(expired_cookie_token)
+                if expired_lock is not None and not expired_lock.locked():
+                    del expired_locks[expired_cookie_token]
+        if cookie_token not in locks:
+            locks[cookie_token] = asyncio.Lock() if asynchronous else threading.Lock()
+        return locks[cookie_token]
+
+
+def get_spotify_user_from_saved(database_instance: SavedSpotifyUser) -> SpotifyUser:
+    """Gets a SpotifyUser (for use with the API client) for a saved Spotify user (SavedSpotifyUser).
+    SpotifyUsers are kept in the session registry for SPOTIFY_SESSION_TTL seconds, see get_spotify_session.
+
+    :param database_instance:  A database object that the user's Spotify user is saved in.
+    """
+    cookie_token = database_instance.cookie_token
+    with get_spotify_session_lock(cookie_token):
+        # (another request might have created the session while we waited for the lock)
+        spotify_session = get_spotify_session(cookie_token)
+        if (
+            spotify_session is not None
+            and spotify_session.saved_user.id == database_instance.id
+        ):
+            return spotify_session.spotify_user
+        spotify_user = create_spotify_user_from_saved(database_instance)
+        with spotify_sessions_lock:
+            spotify_sessions[cookie_token] = SpotifySession(
+                database_instance, spotify_user, time.time()
+            )
+        return spotify_user
+
+
+async def aget_spotify_user_from_saved(
+    database_instance: SavedSpotifyUser,
+) -> SpotifyUser:
+    """Asynchronous version of get_spotify_user_from_saved.
+
+    :param database_instance:  A database object that the user's Spotify user is saved in.
+    """
+    cookie_token = database_instance.cookie_token
+    async with get_spotify_session_lock(cookie_token, asynchronous=True):
+        # (another request might have created the session while we waited for the lock)
+        spotify_session = get_spotify_session(cookie_token)
+        if (
+            spotify_session is not None
+            and spotify_session.saved_user.id == database_instance.id
+        ):
+            return spotify_session.spotify_user
+        spotify_user = await acreate_spotify_user_from_saved(database_instance)
+        with spotify_sessions_lock:
+            spotify_sessions[cookie_token] = SpotifySession(
+                database_instance, spotify_user, time.time()
+            )
+        return spotify_user
+
+
+def get_spotify_user_arguments(database_instance: SavedSpotifyUser) -> Dict:
+    """Returns the arguments to create a SpotifyUser from a saved Spotify user (SavedSpotifyUser) with.
+    Refreshed tokens are saved to the database both when they are refreshed by the synchronous and by the asynchronous client.
 
     :param database_instance:  A database object that the user's Spotify user is saved in.
     """
     token_expires_in_seconds = round(
         (
-            datetime.datetime.now().astimezone(pytz.UTC)
-            - database_instance.token_expires_at.astimezone(pytz.UTC)
+            database_instance.token_expires_at.astimezone(pytz.UTC)
+            - datetime.datetime.now().astimezone(pytz.UTC)
         ).total_seconds()
     )
+    return {
+        "access_token": database_instance.access_token,
+        "refresh_token": database_instance.refresh_token,
+        "expires_in": token_expires_in_seconds,
+        "on_token_refresh": on_updated_tokens,
+        "on_token_refresh_async": sync_to_async(on_updated_tokens),
+        "linked_database_id": database_instance.id,
+    }
+
+
+def create_spotify_user_from_saved(database_instance: SavedSpotifyUser) -> SpotifyUser:
+    """Creates a SpotifyUser (for use with the API client) from a saved Spotify user (SavedSpotifyUser).
+    Use get_spotify_user_from_saved to reuse SpotifyUsers that have already been created.
+
+    :param database_instance:  A database object that the user's Spotify user is saved in.
+    """
     return SpotifyUser(
-        access_token=database_instance.access_token,
         client_id=spotify_client.client_id,
-        refresh_token=database_instance.refresh_token,
-        expires_in=token_expires_in_seconds,
         authorization_header=spotify_client.authorization_header,
         user_agent=spotify_client.user_agent,
-        on_token_refresh=on_updated_tokens,
-        linked_database_id=database_instance.id,
+        **get_spotify_user_arguments(database_instance),
     )
 
 
-def get_playlist_items(
+async def acreate_spotify_user_from_saved(
+    database_instance: SavedSpotifyUser,
+) -> SpotifyUser:
+    """Asynchronous version of create_spotify_user_from_saved, which retrieves the user's details using the asyncio client.
+
+    :param database_instance:  A database object that the user's Spotify user is saved in.
+    """
+    return await async_spotify_client.create_user(
+        **get_spotify_user_arguments(database_instance)
+    )
+
+
+async def get_playlist_items(
     spotify_user: SpotifyUser,
     database_instance: SavedSpotifyUser,
-    playlist_id: str,
-    recalled_times: Optional[int] = None,
-) -> Tuple[List[Dict], List[str]]:
-    """Gets all playlist items for a certain playlist. Also parses and returns all UIDs in it (thus I created a new function)
+    only_if_changed_from: Optional[str] = None,
+    create_if_deleted: bool = False,
+) -> Tuple[Dict, Optional[List[str]]]:
+    """Gets a user's linked playlist and the URIs of all items in it. The playlist and the first page of its items are
+    retrieved in one request, and the other pages at the same time.
 
     :param spotify_user: The Spotify user to authenticate with.
 
     :param database_instance:  A database object that the user's Spotify user is saved in.
 
-    :param playlist_id: The playlist ID to retrieve.
+    :param only_if_changed_from: Optional. A snapshot ID of the playlist. If the playlist still has it, the items are
+    not retrieved and None is returned instead of the URIs.
 
-    :param recalled_times: Used for recursion to avoid spamming spotify.
+    :param create_if_deleted: If a new playlist should be created (and linked to the user) if the playlist has been deleted.
+    Otherwise, a deleted playlist is returned as empty. Only pass True when the playlist is about to be changed.
 
-    :returns A tuple in the format of (<playlist items (raw return from API client function), playlist items UIDs>
+    :returns A tuple in the format of (<playlist (only the ID and the snapshot ID)>, <playlist items URIs>)
     """
-    if recalled_times is None:
-        recalled_times = 0
+    logger.info(f"Retrieving playlist items for {spotify_user.username}...")
     try:
-        playlist_items = spotify_client.get_user_playlist_items(
-            spotify_user, playlist_id
+        (
+            playlist,
+            playlist_items,
+        ) = await async_spotify_client.get_user_playlist_with_items(
+            spotify_user,
+            database_instance.connected_playlist_id,
+            fields="id,snapshot_id",
+            item_fields="track(uri)",
+            only_if_changed_from=only_if_changed_from,
         )
     except SpotifyDataNotFound:
         # This was interesting. The Spotify API did not give 404 when I tried to retrieve a deleted playlist!
         # In fact, it even gave me the playlist data...
-        # But when I got to this state, I got a 404. So here, we handle that case that the user deleted the playlist
+        # But when I got to its items, I got a 404. So here, we handle that case that the user deleted the playlist
         # in case Spotify's API does not catch it earlier.
         logger.warning(
             f"Seems like {spotify_user.username} deleted their playlist (handled by track list)."
         )
-        if recalled_times < 3:
-            logger.info("Creating a new one...")
-            new_playlist = create_user_album_of_the_day_playlist(
-                spotify_user, database_instance
-            )
-            return get_playlist_items(
-                spotify_user=spotify_user,
-                database_instance=database_instance,
-                playlist_id=new_playlist["id"],
-                recalled_times=recalled_times + 1,
-            )
-        else:
-            raise SpotifyAPIException(
-                "Failed to create a Spotify playlist multiple times."
-            )
+        if not create_if_deleted:
+            return {"id": database_instance.connected_playlist_id}, []
+        logger.info("Creating a new one...")
+        new_playlist = await create_user_album_of_the_day_playlist(
+            spotify_user, database_instance
+        )
+        return new_playlist, []  # (a new playlist is empty)
+    if playlist_items is None:
+        return playlist, None
     playlist_items_uris = [
-        playlist_item["track"]["uri"] for playlist_item in playlist_items
+        playlist_item["track"]["uri"]
+        for playlist_item in playlist_items
+        if playlist_item.get("track") is not None  # (removed tracks have no data)
     ]  # Create a list of all URIs
-    return playlist_items, playlist_items_uris
+    return playlist, playlist_items_uris
+
+
+# The track URIs of each user's linked playlist are cached, so that checking if an album has been added to it does not
+# require retrieving the whole playlist. The cached URIs are used without any requests for SPOTIFY_PLAYLIST_CACHE_MAX_AGE
+# seconds. After that, they are used as long as the snapshot ID (which changes whenever the playlist changes) is the same.
+SPOTIFY_PLAYLIST_CACHE_MAX_AGE = int(
+    os.environ.get("SPOTIFY_PLAYLIST_CACHE_MAX_AGE", 5 * 60)
+)
+SPOTIFY_PLAYLIST_CACHE_TIMEOUT = int(
+    os.environ.get("SPOTIFY_PLAYLIST_CACHE_TIMEOUT", 24 * 60 * 60)
+)
+
+
+def get_playlist_cache_key(database_instance: SavedSpotifyUser) -> str:
+    """Returns the cache key for the track URIs of a user's linked playlist."""
+    return f"spotify_playlist_uris_{database_instance.id}"
+
+
+async def set_cached_playlist_uris(
+    database_instance: SavedSpotifyUser,
+    playlist_id: str,
+    snapshot_id: Optional[str],
+    playlist_items_uris: Iterable[str],
+) -> None:
+    """Caches the track URIs of a user's linked playlist.
+
+    :param database_instance: A database object that the user's Spotify user is saved in.
+
+    :param playlist_id: The ID of the playlist.
+
+    :param snapshot_id: The snapshot ID of the playlist when it had the track URIs.
+
+    :param playlist_items_uris: The track URIs in the playlist."""
+    await cache.aset(
+        get_playlist_cache_key(database_instance),
+        {
+            "playlist_id": playlist_id,
+            "snapshot_id": snapshot_id,
+            "uris": list(set(playlist_items_uris)),
+            "checked_at": time.time(),
+        },
+        SPOTIFY_PLAYLIST_CACHE_TIMEOUT,
+    )
+
+
+async def get_linked_playlist_uris(
+    spotify_user: SpotifyUser,
+    database_instance: SavedSpotifyUser,
+    max_age: Optional[float] = None,
+    create_if_deleted: bool = False,
+) -> Tuple[str, Set[str]]:
+    """Gets the ID and the track URIs of a user's linked playlist. The track URIs are cached, see SPOTIFY_PLAYLIST_CACHE_MAX_AGE.
+
+    :param spotify_user: The Spotify user to authenticate with.
+
+    :param database_instance: A database object that the user's Spotify user is saved in.
+
+    :param max_age: Optional. For how many seconds cached track URIs can be used without checking the snapshot ID of the
+    playlist. Default is SPOTIFY_PLAYLIST_CACHE_MAX_AGE. Pass 0 to always check it.
+
+    :param create_if_deleted: If a new playlist should be created if the playlist has been deleted. See get_playlist_items.
+
+    :returns A tuple in the format of (<playlist ID>, <playlist item URIs>)"""
+    if max_age is None:
+        max_age = SPOTIFY_PLAYLIST_CACHE_MAX_AGE
+    cached_playlist = await cache.aget(get_playlist_cache_key(database_instance))
+    if (
+        cached_playlist is None
+        or cached_playlist["playlist_id"] != database_instance.connected_playlist_id
+    ):
+        cached_playlist = None
+    elif time.time() - cached_playlist["checked_at"] <= max_age:
+        logger.debug(f"Using cached playlist items for {spotify_user.username}.")
+        return cached_playlist["playlist_id"], set(cached_playlist["uris"])
+    # (the items are only retrieved if the snapshot ID of the playlist has changed)
+    linked_playlist, playlist_items_uris = await get_playlist_items(
+        spotify_user,
+        database_instance,
+        only_if_changed_from=cached_playlist["snapshot_id"]
+        if cached_playlist is not None
+        else None,
+        create_if_deleted=create_if_deleted,
+    )
+    if playlist_items_uris is None:
+        logger.info(
+            f"The playlist of {spotify_user.username} has not changed. Using cached playlist items..."
+        )
+        playlist_items_uris = cached_playlist["uris"]
+    playlist_id = linked_playlist["id"]
+    await set_cached_playlist_uris(
+        database_instance,
+        playlist_id,
+        linked_playlist.get("snapshot_id"),
+        playlist_items_uris,
+    )
+    return playlist_id, set(playlist_items_uris)
 
 
 # Views related to Spotify saving
@@ -537,9 +757,72 @@ spotify_client = SpotifyClient(
     os.environ["SPOTIFY_CLIENT_SECRET"],
     os.environ["SPOTIFY_USER_AGENT"],
 )  # Create a Spotify client
+# The playlist endpoints are served asynchronously (see AsyncSpotifyView), and use an asyncio client
+async_spotify_client = AsyncSpotifyClient(
+    os.environ["SPOTIFY_CLIENT_ID"],
+    os.environ["SPOTIFY_CLIENT_SECRET"],
+    os.environ["SPOTIFY_USER_AGENT"],
+)
 SPOTIFY_REDIRECT_URL = f"{os.environ['BASE_URL']}/spotify/callback"
 
 
+@method_decorator(
+    csrf_exempt, name="dispatch"
+)  # (like for the views of the REST framework)
+class AsyncSpotifyView(View):
+    """Base class for the views that send requests to Spotify. They are served asynchronously, so that waiting for
+    Spotify does not block a worker, and so that independent requests to Spotify can be sent at the same time.
+    The REST framework does not support asynchronous views, so errors from .api_exceptions are turned into responses here.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as e:
+            detail = (
+                e.detail if isinstance(e.detail, (dict, list)) else {"detail": e.detail}
+            )
+            return JsonResponse(detail, status=e.status_code, safe=False)
+
+
+async def get_saved_spotify_user_from_request(
+    request: HttpRequest,
+) -> Tuple[Optional[SavedSpotifyUser], Optional[SpotifyUser]]:
+    """Asynchronous version of get_saved_spotify_profile_from_request (with the token in the URL) that also
+    returns the SpotifyUser of the saved profile.
+
+    :param request The incoming request from Django.
+
+    :returns A tuple in the format of (<saved profile>, <Spotify user>). Both are None if no profile was found.
+    """
+    logger.info("Checking for saved Spotify token from request...")
+    cookie_token = get_spotify_cookie_token_from_request(request, source="url")
+    if cookie_token is None:
+        logger.info("Did not find Spotify profile: no cookie token included/passed.")
+        return None, None
+    spotify_session = get_spotify_session(cookie_token)
+    if spotify_session is not None:
+        logger.info("Found Spotify profile in the session registry.")
+        return spotify_session.saved_user, spotify_session.spotify_user
+    user = await SavedSpotifyUser.objects.filter(cookie_token=cookie_token).afirst()
+    if user is None:
+        logger.warning(
+            f"A Spotify token was found in the cookies/URL, but it did not match a public profile! (token: {cookie_token})"
+        )
+        return None, None
+    logger.info("Found Spotify profile. Validating that it exists...")
+    try:
+        return user, await aget_spotify_user_from_saved(user)
+    except SpotifyAuthenticationRevoked:
+        logger.warning(
+            "Authentication was revoked. Removing the user from the database..."
+        )
+        remove_spotify_session(cookie_token)
+        await user.adelete()
+        logger.info("The user was deleted.")
+    return None, None
+
+
 class GetSpotifyAuthenticationStatusView(views.APIView):
     """Returns the user's authentication status with Spotify. It exposes
     an API endpoint that can be requested by the frontend to ensure that it has the correct authentication status
@@ -609,7 +892,7 @@ def spotify_authentication_view(request):
     return response
 
 
-def spotify_callback_view(request):
+async def spotify_callback_view(request):
     """Handles redirects from Spotify authentication and sets and saves a user in the database."""
     logger.info(
         f"Handling a callback redirect from Spotify with parameters: {request.GET}"
@@ -633,13 +916,13 @@ def spotify_callback_view(request):
             return redirect(
                 f"{FRONTEND_SPOTIFY_STATUS_URL}?status=error&type={SpotifyAuthenticationErrors.MISSING_PERMISSIONS.value}"
             )
-    spotify_user = spotify_client.get_user_from_redirect(
+    spotify_user = await async_spotify_client.get_user_from_redirect(
         redirect_uri=SPOTIFY_REDIRECT_URL, response_parameters=request.GET
     )
     # Check if user previously exists
-    previous_spotify_user = SavedSpotifyUser.objects.filter(
+    previous_spotify_user = await SavedSpotifyUser.objects.filter(
         spotify_user_id=spotify_user.id
-    ).first()
+    ).afirst()
     if previous_spotify_user:
         logger.info("A previous Spotify user already exists.")
         cookie_token = previous_spotify_user.cookie_token
@@ -657,10 +940,10 @@ def spotify_callback_view(request):
             spotify_username=spotify_user.username,
             spotify_user_id=spotify_user.id,
         )
-        user.save()
+        await user.asave()
         logger.info("Saved Spotify user in database.")
     logger.info("Ensuring a playlist has been created...")
-    get_user_album_of_the_day_playlist(
+    await get_user_album_of_the_day_playlist(
         spotify_user, user
     )  # (retrieving the "Album of the day" playlist will create a new one if it fails
     logger.info("Setting cookie and returning response...")
@@ -672,16 +955,13 @@ def spotify_callback_view(request):
     return response
 
 
-class ToggleAlbumStatusInSpotifyView(generics.CreateAPIView):
+class ToggleAlbumStatusInSpotifyView(AsyncSpotifyView):
     """Endpoint for adding or removing an album to a user's linked Album of the day Spotify playlist.
     This action will be determined automatically.
     Usage: Pass a URL parameter called ?items with Spotify URIs to add to playlist inside of it.
     Multiple items can be added with a comma-delimiter between each."""
 
-    permission_classes = [permissions.AllowAny]
-    schema = None  # Do not include this endpoint in the documentation
-
-    def post(self, request):
+    async def post(self, request):
         logger.info("Got a request to add an album to a user's linked playlist.")
         # Validate parameters
         items_raw = request.GET.get("items", None)
@@ -700,7 +980,7 @@ class ToggleAlbumStatusInSpotifyView(generics.CreateAPIView):
                     "message": '"items" key not present in the request.',
                 }
             )
-        user = get_saved_spotify_profile_from_request(request, source="url")
+        user, spotify_user = await get_saved_spotify_user_from_request(request)
         if user is None:  # Ensure a user was found
             logger.info("Did not find a linked user. Returning error...")
             raise NotFoundException(
@@ -720,11 +1000,10 @@ class ToggleAlbumStatusInSpotifyView(generics.CreateAPIView):
                     "message": "No items to add. Please check the items key.",
                 }
             )
-        spotify_user = get_spotify_user_from_saved(user)
-        linked_playlist = get_user_album_of_the_day_playlist(spotify_user, user)
-        linked_playlist_id = linked_playlist["id"]
-        linked_playlist_items, linked_playlist_items_uris = get_playlist_items(
-            spotify_user, user, linked_playlist_id
+        # (the snapshot ID of the playlist is always checked, so that the right items are added or removed.
+        # Only this endpoint creates a new playlist if the linked one has been deleted)
+        linked_playlist_id, linked_playlist_items_uris = await get_linked_playlist_uris(
+            spotify_user, user, max_age=0, create_if_deleted=True
         )
         # For each URI, check if the item is already in the playlist.
         # If it is, remove it
@@ -740,56 +1019,58 @@ class ToggleAlbumStatusInSpotifyView(generics.CreateAPIView):
         logger.info(
             f"Found {len(items_to_add)} items to add to the playlist, and {len(items_to_remove)} items to remove."
         )
+        # The items are added and removed at the same time. Mapping: action --> request
+        playlist_changes = {}
         if len(items_to_add) > 0:
-            # Perform request
             logger.info("Sending request to Spotify to add items...")
-            try:
-                response_json = spotify_client.add_items_to_playlist(
-                    user=spotify_user,
-                    playlist_id=linked_playlist_id,
-                    uris_to_insert=items_to_add,
-                )
-                logger.info("Request to add items sent.")
-            except Exception as e:
-                logger.critical(
-                    f"Failed to add items from Spotify playlist! The request failed with the exception {e}. Returning error...",
-                    exc_info=True,
-                )
-                raise InternalServerErrorException(
-                    {
-                        "status": "error",
-                        "message": "The request to Spotify to add playlist items failed.",
-                    }
-                )
+            playlist_changes["add"] = async_spotify_client.add_items_to_playlist(
+                user=spotify_user,
+                playlist_id=linked_playlist_id,
+                uris_to_insert=items_to_add,
+            )
         else:
             logger.info("No items to add.  No request will be sent.")
         if len(items_to_remove) > 0:
-            # Perform request
             logger.info("Sending request to Spotify to remove items...")
-            try:
-                response_json = spotify_client.remove_items_from_playlist(
-                    user=spotify_user,
-                    playlist_id=linked_playlist_id,
-                    uris_to_remove=items_to_remove,
-                )
-                logger.info("Request to remove items sent.")
-            except Exception as e:
+            playlist_changes[
+                "remove"
+            ] = async_spotify_client.remove_items_from_playlist(
+                user=spotify_user,
+                playlist_id=linked_playlist_id,
+                uris_to_remove=items_to_remove,
+            )
+        else:
+            logger.info("No items to remove. No request will be sent.")
+        responses = await asyncio.gather(
+            *playlist_changes.values(), return_exceptions=True
+        )
+        for action, response in zip(playlist_changes.keys(), responses):
+            if isinstance(response, Exception):
+                await cache.adelete(get_playlist_cache_key(user))
                 logger.critical(
-                    f"Failed to remove items from Spotify playlist! The request failed with the exception {e}. Returning error...",
-                    exc_info=True,
+                    f"Failed to {action} items in Spotify playlist! The request failed with the exception {response}. Returning error...",
+                    exc_info=response,
                 )
                 raise InternalServerErrorException(
                     {
                         "status": "error",
-                        "message": "The request to Spotify to remove playlist items failed.",
+                        "message": f"The request to Spotify to {action} playlist items failed.",
                     }
                 )
-        else:
-            logger.info("No items to remove. No request will be sent.")
+        logger.info("Requests to add or remove items sent.")
+        # (if items were both added and removed, it is not known which of the snapshot IDs that is the latest one)
+        snapshot_id = responses[0].get("snapshot_id") if len(responses) == 1 else None
+        # Keep the cached playlist items up to date with the changes
+        await set_cached_playlist_uris(
+            user,
+            linked_playlist_id,
+            snapshot_id,
+            linked_playlist_items_uris.union(items_to_add).difference(items_to_remove),
+        )
         logger.info(
             "Request sent and the item(s) were added or removed. Returning ok..."
         )
-        return Response(
+        return JsonResponse(
             {
                 "status": "success",
                 "message": "Items were added/removed.",
@@ -805,6 +1086,7 @@ class AlbumAddedToSpotifyResponses(Enum):
     # (this is the cookie token, not the actual Spotify token. See the model for more information)
     no_album_id_provided = "no_album_id_provided"
     album_id_not_a_number = "album_id_is_nan"
+    too_many_album_ids = "too_many_album_ids"
     requested_album_not_found = "album_not_found"
     spotify_uid_not_available = "no_spotify_uid"
     spotify_track_uris_not_available = (
@@ -812,14 +1094,12 @@ class AlbumAddedToSpotifyResponses(Enum):
     )
 
 
-class GetAlbumAddedToSpotifyView(views.APIView):
+class GetAlbumAddedToSpotifyView(AsyncSpotifyView):
     """Checks if an album has been added to a user's linked Spotify playlist.
     Returns a response that includes such details. Usage: include ?album_id as a URL parameter
     where the album_id is the ID that an album has in the database."""
 
-    schema = None  # Do not include this endpoint in the documentation
-
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         logger.info(
             "Got a response to check if an album is added to Spotify playlist. Validating parameters"
         )
@@ -856,7 +1136,7 @@ class GetAlbumAddedToSpotifyView(views.APIView):
                     "type": AlbumAddedToSpotifyResponses.album_id_not_a_number.value,
                 }
             )
-        user = get_saved_spotify_profile_from_request(request, source="url")
+        user, spotify_user = await get_saved_spotify_user_from_request(request)
         if user is None:
             logger.info("Did not find a linked user. Returning error...")
             raise NotFoundException(
@@ -867,7 +1147,7 @@ class GetAlbumAddedToSpotifyView(views.APIView):
                 }
             )
 
-        album = Album.objects.filter(id=album_id).first()
+        album = await Album.objects.filter(id=album_id).afirst()
         if album is None:  # Check that the album was found
             logger.info(f"Did not find a album for ID {album_id}. Returning error...")
             raise NotFoundException(
@@ -888,12 +1168,10 @@ class GetAlbumAddedToSpotifyView(views.APIView):
                     "type": AlbumAddedToSpotifyResponses.spotify_uid_not_available.value,
                 }
             )
-        try:
-            spotify_track_uris = json.loads(album.spotify_track_uris)
-        except Exception as e:
+        spotify_track_uris = album.spotify_track_uris
+        if not isinstance(spotify_track_uris, list):
             logger.critical(
-                f"Failed to descerialize track URI json for album {album_id}: the exception {e} occurred.",
-                exc_info=True,
+                f"The track URIs of album {album_id} are not a list: {spotify_track_uris}."
             )
             raise InternalServerErrorException(
                 detail={
@@ -902,14 +1180,10 @@ class GetAlbumAddedToSpotifyView(views.APIView):
                     "type": AlbumAddedToSpotifyResponses.spotify_track_uris_not_available.value,
                 }
             )
-        spotify_user = get_spotify_user_from_saved(user)
-        linked_playlist_id = get_user_album_of_the_day_playlist(spotify_user, user)[
-            "id"
-        ]
-        linked_playlist_items, linked_playlist_items_uris = get_playlist_items(
-            spotify_user, user, linked_playlist_id
+        linked_playlist_id, linked_playlist_items_uris = await get_linked_playlist_uris(
+            spotify_user, user
         )
-        return Response(
+        return JsonResponse(
             {
                 "status": "success",
                 "is_added_to_playlist": any(
@@ -921,3 +1195,112 @@ class GetAlbumAddedToSpotifyView(views.APIView):
                 "spotify_uid": album.spotify_uid,
             }
         )
+
+
+# The maximum number of albums that GetAlbumsAddedToSpotifyView can check at once
+MAX_ALBUMS_PER_SPOTIFY_STATUS_REQUEST = 100
+
+
+class GetAlbumsAddedToSpotifyView(AsyncSpotifyView):
+    """Checks if several albums have been added to a user's linked Spotify playlist, with one lookup of the playlist
+    for all of them. Usage: include ?album_ids as a URL parameter with the IDs of the albums in the database, separated by commas.
+    Returns the same details as GetAlbumAddedToSpotifyView for each album, keyed by album ID. Albums that do not exist are left out.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        logger.info(
+            "Got a request to check if several albums are added to Spotify playlist. Validating parameters..."
+        )
+        spotify_token = request.GET.get("spotify_token", None)
+        if spotify_token is None:
+            logger.info("User did not pass a Spotify token. Returning error...")
+            raise BadRequestException(
+                detail={
+                    "status": "error",
+                    "message": "You did not provide an Spotify token in your request.",
+                    "type": AlbumAddedToSpotifyResponses.no_spotify_user_token_provided.value,
+                }
+            )
+        album_ids_raw = request.GET.get("album_ids", "")
+        if len(album_ids_raw) == 0:
+            logger.info("User did not pass any album IDs. Returning error...")
+            raise BadRequestException(
+                detail={
+                    "status": "error",
+                    "message": "You did not provide any album IDs in your request.",
+                    "type": AlbumAddedToSpotifyResponses.no_album_id_provided.value,
+                }
+            )
+        try:  # Ensure that the album IDs are valid.
+            album_ids = set(int(album_id) for album_id in album_ids_raw.split(","))
+        except Exception as e:
+            logger.info("Invalid album ID. Returning error...")
+            raise BadRequestException(
+                detail={
+                    "status": "error",
+                    "message": "One of the provided album IDs is not a valid integer.",
+                    "type": AlbumAddedToSpotifyResponses.album_id_not_a_number.value,
+                }
+            )
+        if len(album_ids) > MAX_ALBUMS_PER_SPOTIFY_STATUS_REQUEST:
+            logger.info("Too many album IDs. Returning error...")
+            raise BadRequestException(
+                detail={
+                    "status": "error",
+                    "message": f"You can check at most {MAX_ALBUMS_PER_SPOTIFY_STATUS_REQUEST} albums at once.",
+                    "type": AlbumAddedToSpotifyResponses.too_many_album_ids.value,
+                }
+            )
+        user, spotify_user = await get_saved_spotify_user_from_request(request)
+        if user is None:
+            logger.info("Did not find a linked user. Returning error...")
+            raise NotFoundException(
+                detail={
+                    "status": "error",
+                    "message": "Did not find a linked Spotify user. Please reload the page and try again.",
+                    "type": AlbumAddedToSpotifyResponses.linked_user_not_found.value,
+                }
+            )
+        # Get the track URIs of all albums in one query
+        albums_track_uris: Dict[int, List[str]] = {}
+        album_spotify_uids: Dict[int, Optional[str]] = {}
+        async for album_id, spotify_uid, spotify_track_uris in Album.objects.filter(
+            id__in=album_ids
+        ).values_list("id", "spotify_uid", "spotify_track_uris"):
+            album_spotify_uids[album_id] = (
+                spotify_uid
+                if spotify_uid is not None and len(spotify_uid) > 0
+                else None
+            )
+            if album_spotify_uids[album_id] is None:
+                continue
+            if not isinstance(spotify_track_uris, list):
+                logger.warning(
+                    f"The track URIs of album {album_id} are not a list: {spotify_track_uris}. It will be returned as not added."
+                )
+                continue
+            albums_track_uris[album_id] = spotify_track_uris
+        # The playlist is only looked up if any of the albums can have been added to it
+        linked_playlist_items_uris = set()
+        if len(albums_track_uris) > 0:
+            _, linked_playlist_items_uris = await get_linked_playlist_uris(
+                spotify_user, user
+            )
+        logger.info(
+            f"Returning Spotify status for {len(album_spotify_uids)} album(s)..."
+        )
+        return JsonResponse(
+            {
+                "status": "success",
+                "albums": {
+                    album_id: {
+                        "is_added_to_playlist": any(
+                            track_uri in linked_playlist_items_uris
+                            for track_uri in albums_track_uris.get(album_id, [])
+                        ),
+                        "spotify_uid": spotify_uid,
+                    }
+                    for album_id, spotify_uid in album_spotify_uids.items()
+                },
+            }
+        )
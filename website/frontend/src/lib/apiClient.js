@@ -520,10 +520,53 @@ export async function toggleAlbumOnSpotify(spotifyUIDs, storedToken) {
 	};
 	return await sendRequest(`/spotify/toggle`, 'POST', null, queryArguments, null, null);
 }
-export async function getAlbumSpotifyStatus(albumId, storedToken) {
+// The maximum number of albums that the API can return the Spotify status of in one request
+const MAX_ALBUMS_PER_SPOTIFY_STATUS_REQUEST = 100;
+export async function getAlbumsSpotifyStatus(albumIds, storedToken) {
 	const queryArguments = {
-		album_id: albumId, // Add the album ID to get the status from to the query
+		album_ids: albumIds.join(','), // Album IDs are included in the "album_ids" query parameter.
 		spotify_token: storedToken
 	};
-	return await sendRequest(`/spotify/album/status`, 'GET', null, queryArguments, null, null);
+	return await sendRequest(`/spotify/albums/status`, 'GET', null, queryArguments, null, null);
+}
+// Statuses that are requested at the same time (for example by every album on a page) are sent as one
+// request to the API. Mapping: Spotify token --> album ID --> functions that receive the status of the album.
+let pendingAlbumSpotifyStatusRequests = {};
+const sendPendingAlbumSpotifyStatusRequests = async (storedToken) => {
+	const pendingRequests = pendingAlbumSpotifyStatusRequests[storedToken];
+	delete pendingAlbumSpotifyStatusRequests[storedToken];
+	const albumIds = Object.keys(pendingRequests);
+	for (let i = 0; i < albumIds.length; i += MAX_ALBUMS_PER_SPOTIFY_STATUS_REQUEST) {
+		const batchAlbumIds = albumIds.slice(i, i + MAX_ALBUMS_PER_SPOTIFY_STATUS_REQUEST);
+		console.log(`Getting the Spotify status of ${batchAlbumIds.length} album(s)...`);
+		const [requestSucceeded, responseData] = await getAlbumsSpotifyStatus(
+			batchAlbumIds,
+			storedToken
+		);
+		for (const albumId of batchAlbumIds) {
+			const albumStatus = requestSucceeded ? responseData.albums[albumId] : undefined;
+			// Return the same format as the API endpoint for a single album
+			const result =
+				albumStatus !== undefined
+					? [true, { status: 'success', ...albumStatus }]
+					: [false, responseData];
+			for (const receiveStatus of pendingRequests[albumId]) {
+				receiveStatus(result);
+			}
+		}
+	}
+};
+export function getAlbumSpotifyStatus(albumId, storedToken) {
+	return new Promise((resolve) => {
+		if (pendingAlbumSpotifyStatusRequests[storedToken] === undefined) {
+			pendingAlbumSpotifyStatusRequests[storedToken] = {};
+			// Send the request when the statuses that are requested right now have been added to it
+			setTimeout(() => sendPendingAlbumSpotifyStatusRequests(storedToken), 0);
+		}
+		const pendingRequests = pendingAlbumSpotifyStatusRequests[storedToken];
+		if (pendingRequests[albumId] === undefined) {
+			pendingRequests[albumId] = [];
+		}
+		pendingRequests[albumId].push(resolve);
+	});
 }